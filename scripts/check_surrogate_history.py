@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from price_monitor.runs import run_files
+from price_monitor.surrogate import Surrogate, observations
+
+
+# Chequeo: el surrogate tiene que poder ajustarse sobre la historia guardada en output/
+# (finaer_*.jsonl viejos incluidos, sin quotes ni normalized.alq_exp). Si los JSONL
+# cambian de forma y observations() deja de leerlos, esto falla.
+
+
+def main():
+    files = run_files(Path("output"))
+    if not files:
+        raise SystemExit("No hay output/finaer_*.jsonl")
+
+    bad = []
+    for f in files:
+        obs = observations([f])
+        if not obs:
+            bad.append(f.name)
+            print(f"ERROR {f.name}: sin observaciones")
+            continue
+        s = Surrogate.fit(obs)
+        n = sum(m.n for m in s.models.values())
+        print(f"OK {f.name}: {len(s.models)} modelos, {n} puntos")
+    if bad:
+        raise SystemExit(f"observations() no lee {len(bad)}/{len(files)} archivos")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ from __future__ import annotations
 from pathlib import Path
 import pandas as pd
 
+from price_monitor import rules
+
 IN = Path("output/finaer_2026-02-11T135228Z.xlsx")   # <-- tu archivo real
 OUT = Path("output/finaer_clean_cmp.xlsx")
 
@@ -11,12 +13,14 @@ TARGET_MESES = {24, 36}
 TARGET_CUOTAS = {1, 3}
 
 
+# mismas etiquetas que compare_finaer_vs_hoggax_borders.py, bordes de rules.SEGMENT_BORDERS
+SEGMENTOS = rules.segment_labels(
+    first="hasta_{hi}k", middle="{lo}_{hi}k", last="mayor_{lo}k", unit=lambda b: f"{b / 1000:g}"
+)
+
+
 def seg(x: float) -> str:
-    if x <= 500_000:
-        return "hasta_500k"
-    if x <= 800_000:
-        return "500_800k"
-    return "mayor_800k"
+    return SEGMENTOS[int(rules.segment_index(x))]
 
 
 def main():
@@ -51,9 +55,11 @@ def main():
     df["segmento"] = df["alq_exp"].astype(float).apply(seg)
     df["finaer_lista"] = df["honorario_sin_desc"]
 
-    # transferencia 15% SOLO contado
+    # transferencia (rules.TRANSFER_DESC_PCT) SOLO contado
     df["finaer_total_transfer"] = df["finaer_lista"]
-    df.loc[df["cuotas"] == 1, "finaer_total_transfer"] = df.loc[df["cuotas"] == 1, "finaer_lista"] * 0.85
+    df.loc[df["cuotas"] == 1, "finaer_total_transfer"] = df.loc[df["cuotas"] == 1, "finaer_lista"] * (
+        1.0 - rules.TRANSFER_DESC_PCT / 100.0
+    )
 
     df["finaer_cuota_equiv"] = df["finaer_total_transfer"] / df["cuotas"].astype(float)
 
@@ -1,6 +1,7 @@
 # scripts/compare_finaer_vs_hoggax_borders.py
 from __future__ import annotations
 
+import json
 from pathlib import Path
 from typing import Optional, cast
 
@@ -12,6 +13,9 @@ from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.worksheet import Worksheet
 
+from price_monitor import rules
+from price_monitor.breakpoints import border_alq_exp
+
 
 # ---------------- Config ----------------
 # Si querés fijar el archivo de Finaer, dejalo así.
@@ -26,20 +30,25 @@ HOGGAX_API_LONG = Path("output/hoggax_rates_long.csv")
 OUT = Path("output/compare_borders_finaer_vs_hoggax.xlsx")
 
 TARGET_ALQ_EXP = {499_999, 799_999, 801_000}
+# cortes encontrados con `price-monitor breakpoints` (se suman a TARGET_ALQ_EXP si existe)
+BREAKPOINTS_JSON = Path("output/breakpoints.json")
 TARGET_MESES = {12, 24, 36}
 TARGET_CUOTAS = {1, 3}
 
-# Finaer: 20% off SOLO contado (1 pago)
-FINAER_CONTADO_DESC_PCT = 20.0
+# Finaer: % off SOLO contado (1 pago), ver rules.FINAER_CONTADO_DESC_PCT
+FINAER_CONTADO_DESC_PCT = rules.FINAER_CONTADO_DESC_PCT
 
 
 # ---------------- Helpers ----------------
+# etiquetas propias de este comparador ("hasta_500k", "500_800k", "mayor_800k"); los
+# bordes son rules.SEGMENT_BORDERS
+SEGMENTOS = rules.segment_labels(
+    first="hasta_{hi}k", middle="{lo}_{hi}k", last="mayor_{lo}k", unit=lambda b: f"{b / 1000:g}"
+)
+
+
 def seg_label(alq_exp: float) -> str:
-    if alq_exp <= 500_000:
-        return "hasta_500k"
-    if alq_exp <= 800_000:
-        return "500_800k"
-    return "mayor_800k"
+    return SEGMENTOS[int(rules.segment_index(alq_exp))]
 
 
 def parse_num(x) -> Optional[float]:
@@ -76,6 +85,14 @@ def parse_num(x) -> Optional[float]:
         return None
 
 
+def load_border_targets() -> set[int]:
+    """TARGET_ALQ_EXP + ambos lados de cada corte de BREAKPOINTS_JSON."""
+    targets = set(TARGET_ALQ_EXP)
+    if BREAKPOINTS_JSON.exists():
+        targets |= border_alq_exp(json.loads(BREAKPOINTS_JSON.read_text(encoding="utf-8")))
+    return targets
+
+
 def pick_latest_finaer_xlsx() -> Path:
     out_dir = Path("output")
     cands = []
@@ -167,7 +184,7 @@ def main():
             df[c] = df[c].apply(parse_num)
 
     # filtros bordes
-    df = df[df["alq_exp"].isin(TARGET_ALQ_EXP)]
+    df = df[df["alq_exp"].isin(load_border_targets())]
     df = df[df["meses"].isin(TARGET_MESES)]
     df = df[df["cuotas"].isin(TARGET_CUOTAS)].copy()
 
@@ -339,7 +356,7 @@ def main():
                 pct(cell)
 
         seg = ws.cell(row, col_idx["segmento"]).value
-        fill = fill_b if seg in ("hasta_500k", "mayor_800k") else fill_a
+        fill = fill_b if seg in (SEGMENTOS[0], SEGMENTOS[-1]) else fill_a
         for c in range(1, len(out_cols) + 1):
             ws.cell(row, c).fill = fill
 
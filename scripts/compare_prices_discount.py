@@ -1,11 +1,9 @@
 # scripts/compare_prices_discount.py
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Optional, cast
 
-import numpy as np
 import pandas as pd
 from openpyxl import Workbook
 from openpyxl.cell.cell import Cell, MergedCell
@@ -13,6 +11,10 @@ from openpyxl.formatting.rule import ColorScaleRule
 from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.worksheet.worksheet import Worksheet
 
+from price_monitor import rules
+from price_monitor.fingerprints import resolved_records
+from price_monitor.runs import latest_run
+from price_monitor.sampling import segmento
 
 
 # ---------------- Config ----------------
@@ -20,7 +22,7 @@ PLAZOS_ALL = [3, 6, 12, 24, 36]
 PLAZOS_FINAER = [12, 24, 36]  # tu crawler de Finaer hoy corre estos
 
 # regla transferencia: 15% OFF SOLO para 1 pago
-TRANSFER_DESC_PCT = 15.0
+TRANSFER_DESC_PCT = rules.TRANSFER_DESC_PCT
 
 # CSV "por web" de Hoggax (24/36). Ruta real en tu repo:
 HOGGAX_WEB_CSV_LONG = Path("src/price_monitor/data/hoggax_rates_long.csv")
@@ -36,14 +38,6 @@ def to_float(x) -> Optional[float]:
         return None
 
 
-def segmento(alq_exp: float) -> str:
-    if alq_exp <= 500_000:
-        return "hasta 500k"
-    if alq_exp <= 800_000:
-        return "500k-800k"
-    return "mayor_800k"
-
-
 def resolve_repo_relative(p: str | Path) -> Path:
     # scripts/compare_prices_discount.py -> repo_root = parents[1]
     base_dir = Path(__file__).resolve().parents[1]
@@ -52,10 +46,7 @@ def resolve_repo_relative(p: str | Path) -> Path:
 
 
 def load_latest_jsonl() -> Path:
-    files = sorted(Path("output").glob("finaer_*.jsonl"))
-    if not files:
-        raise SystemExit("No hay output/finaer_*.jsonl. Corré primero: python -m price_monitor.cli")
-    return files[-1]
+    return latest_run(Path("output"))
 
 
 def as_int(x, default: int = 0) -> int:
@@ -137,59 +128,56 @@ def main():
 
     # 1) FINaer: construir tabla por MISMA ENTRADA (alquiler, expensas, meses) y por PLAN (cuotas)
     finaer_rows: list[dict] = []
-    with open(jsonl_path, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            rec = json.loads(line)
-            s = rec.get("scenario") or {}
-
-            alquiler = float(s.get("alquiler") or 0)
-            expensas = float(s.get("expensas") or 0)
-            meses = int(s.get("meses") or 0)
-            alq_exp = alquiler + expensas
-
-            if alq_exp <= 0 or meses not in PLAZOS_FINAER:
+    # --skip-unchanged: los unchanged_record vienen completos (su última corrida)
+    for rec in resolved_records(jsonl_path):
+        s = rec.get("scenario") or {}
+
+        alquiler = float(s.get("alquiler") or 0)
+        expensas = float(s.get("expensas") or 0)
+        meses = int(s.get("meses") or 0)
+        alq_exp = alquiler + expensas
+
+        if alq_exp <= 0 or meses not in PLAZOS_FINAER:
+            continue
+
+        seg = segmento(alq_exp)
+        planes = (rec.get("normalized") or {}).get("planes") or []
+        if not isinstance(planes, list) or not planes:
+            continue
+
+        for p in planes:
+            cuotas = as_int(p.get("cantidad_de_cuotas", p.get("cuotas")), default=0)
+            if cuotas <= 0:
                 continue
 
-            seg = segmento(alq_exp)
-            planes = (rec.get("normalized") or {}).get("planes") or []
-            if not isinstance(planes, list) or not planes:
+            lista = as_money(p.get("honorario_sin_descuentos"))
+            if lista is None or lista <= 0:
                 continue
 
-            for p in planes:
-                cuotas = as_int(p.get("cantidad_de_cuotas", p.get("cuotas")), default=0)
-                if cuotas <= 0:
-                    continue
-
-                lista = as_money(p.get("honorario_sin_descuentos"))
-                if lista is None or lista <= 0:
-                    continue
-
-                finaer_total_web = as_money(p.get("monto_final"))
-                finaer_anticipo_web = as_money(p.get("anticipo"))
-                finaer_monto_cuota_web = as_money(p.get("monto_cuotas"))
-
-                # regla transferencia 15% SOLO para 1 pago:
-                finaer_transfer_desc_pct = TRANSFER_DESC_PCT if cuotas == 1 else 0.0
-                finaer_total_transfer = lista * (1.0 - finaer_transfer_desc_pct / 100.0) if cuotas == 1 else finaer_total_web
-
-                finaer_rows.append(
-                    dict(
-                        alquiler=alquiler,
-                        expensas=expensas,
-                        alq_exp=alq_exp,
-                        segmento=seg,
-                        plazo_meses=meses,
-                        cuotas=cuotas,
-                        finaer_precio_lista=lista,
-                        finaer_total_web=finaer_total_web,
-                        finaer_anticipo_web=finaer_anticipo_web,
-                        finaer_monto_cuota_web=finaer_monto_cuota_web,
-                        finaer_transfer_desc_pct=finaer_transfer_desc_pct,
-                        finaer_total_transfer=finaer_total_transfer,
-                    )
+            finaer_total_web = as_money(p.get("monto_final"))
+            finaer_anticipo_web = as_money(p.get("anticipo"))
+            finaer_monto_cuota_web = as_money(p.get("monto_cuotas"))
+
+            # regla transferencia 15% SOLO para 1 pago:
+            finaer_transfer_desc_pct = TRANSFER_DESC_PCT if cuotas == 1 else 0.0
+            finaer_total_transfer = lista * (1.0 - finaer_transfer_desc_pct / 100.0) if cuotas == 1 else finaer_total_web
+
+            finaer_rows.append(
+                dict(
+                    alquiler=alquiler,
+                    expensas=expensas,
+                    alq_exp=alq_exp,
+                    segmento=seg,
+                    plazo_meses=meses,
+                    cuotas=cuotas,
+                    finaer_precio_lista=lista,
+                    finaer_total_web=finaer_total_web,
+                    finaer_anticipo_web=finaer_anticipo_web,
+                    finaer_monto_cuota_web=finaer_monto_cuota_web,
+                    finaer_transfer_desc_pct=finaer_transfer_desc_pct,
+                    finaer_total_transfer=finaer_total_transfer,
                 )
+            )
 
     df_f = pd.DataFrame(finaer_rows)
     if df_f.empty:
@@ -221,12 +209,7 @@ def main():
     plazo = pd.to_numeric(df["plazo_meses"], errors="coerce").astype("Int64")
 
     # reglas Pablo (lista) para 3/6/12
-    hoggax_lista_regla = np.where(
-        plazo.eq(12),
-        alq / 0.9,
-        np.where(plazo.isin([3, 6]), alq * 0.8, np.nan),
-    )
-    df["hoggax_precio_lista_regla"] = hoggax_lista_regla
+    df["hoggax_precio_lista_regla"] = rules.hoggax_lista_regla(alq.to_numpy(), plazo.fillna(-1).to_numpy("int64"))
 
     # merge web (24/36)
     df = df.merge(df_h_web, on=["segmento", "plazo_meses"], how="left")
@@ -235,21 +218,14 @@ def main():
     df.loc[df["hoggax_precio_lista"].isna(), "hoggax_precio_lista"] = df["hoggax_precio_lista_web"]
 
     # transferencia 15% solo 1 pago
-    cuotas = pd.to_numeric(df["cuotas"], errors="coerce").astype("Int64")
-    df["hoggax_transfer_desc_pct"] = np.where(cuotas.eq(1), TRANSFER_DESC_PCT, 0.0)
-    df["hoggax_total_transfer"] = df["hoggax_precio_lista"] * (1.0 - (df["hoggax_transfer_desc_pct"] / 100.0))
+    cuotas = pd.to_numeric(df["cuotas"], errors="coerce").fillna(0).to_numpy("int64")
+    lista = df["hoggax_precio_lista"].to_numpy(float)
+    df["hoggax_transfer_desc_pct"] = rules.transfer_desc_pct(cuotas, TRANSFER_DESC_PCT)
+    df["hoggax_total_transfer"] = rules.total_transfer(lista, cuotas, TRANSFER_DESC_PCT)
 
     # desglose simple (si no tenés financiamiento real de Hoggax en cuotas)
-    df["hoggax_monto_cuota_teorico"] = np.where(
-        cuotas.gt(1) & pd.notna(df["hoggax_total_transfer"]),
-        df["hoggax_total_transfer"] / cuotas.astype(float),
-        0.0,
-    )
-    df["hoggax_anticipo_teorico"] = np.where(
-        cuotas.gt(0) & pd.notna(df["hoggax_total_transfer"]),
-        df["hoggax_total_transfer"] / cuotas.astype(float),
-        np.nan,
-    )
+    df["hoggax_monto_cuota_teorico"] = rules.cuota_teorica(df["hoggax_total_transfer"].to_numpy(float), cuotas)
+    df["hoggax_anticipo_teorico"] = rules.anticipo_teorico(df["hoggax_total_transfer"].to_numpy(float), cuotas)
 
     # 3) Diferencias (comparables)
     df["dif_lista_$"] = df["finaer_precio_lista"] - df["hoggax_precio_lista"]
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Optional
 
@@ -10,16 +9,12 @@ from openpyxl.styles import Font, PatternFill
 from openpyxl.formatting.rule import ColorScaleRule
 from openpyxl.cell.cell import MergedCell
 
-
-PLAZOS = [3, 6, 12, 24, 36]
+from price_monitor.fingerprints import resolved_records
+from price_monitor.runs import latest_run
+from price_monitor.sampling import SamplePlan, cell_stats, segmento
 
 
-def segmento(alq_exp: float) -> str:
-    if alq_exp <= 500_000:
-        return "hasta 500k"
-    if alq_exp <= 800_000:
-        return "500k-800k"
-    return "mayor_800k"
+PLAZOS = [3, 6, 12, 24, 36]
 
 
 def pick_plan(planes: list[dict], mode: str) -> dict:
@@ -36,11 +31,7 @@ def pick_plan(planes: list[dict], mode: str) -> dict:
 
 
 def load_latest_jsonl() -> Path:
-    out = Path("output")
-    files = sorted(out.glob("finaer_*.jsonl"))
-    if not files:
-        raise SystemExit("No hay output/finaer_*.jsonl (corré primero: python -m price_monitor.cli)")
-    return files[-1]
+    return latest_run(Path("output"))
 
 
 def to_float(x) -> Optional[float]:
@@ -56,46 +47,43 @@ def main(mode: str = "contado"):
     jsonl_path = load_latest_jsonl()
     rows = []
 
-    with open(jsonl_path, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            rec = json.loads(line)
-
-            s = rec["scenario"]
-            alq = float(s["alquiler"])
-            exp = float(s.get("expensas") or 0)
-            meses = int(s["meses"])
-            alq_exp = alq + exp
-
-            planes = rec["normalized"]["planes"]
-            p = pick_plan(planes, mode=mode)
-            if not p:
-                continue
-
-            monto_final = to_float(p.get("monto_final"))
-            if monto_final is None or alq_exp <= 0:
-                continue
-
-            # fracción: monto_final / (alq+exp)
-            pct_ae = monto_final / alq_exp
-
-            # porcentaje (0-100+)
-            pct_ae_pct = pct_ae * 100.0
-
-            # descuento real si viene (lo normalizamos a %)
-            pct_desc = to_float(p.get("pct_descuento_real"))
-            if pct_desc is not None and pct_desc <= 1:
-                pct_desc = pct_desc * 100.0
-
-            rows.append({
-                "segmento": segmento(alq_exp),
-                "meses": meses,
-                "alq_exp": alq_exp,
-                "monto_final": monto_final,
-                "pct_ae_pct": pct_ae_pct,     # para matriz
-                "pct_desc_pct": pct_desc,     # para hoja descuentos
-            })
+    # --skip-unchanged: los unchanged_record vienen con los planes de su última corrida completa
+    for rec in resolved_records(jsonl_path):
+        s = rec["scenario"]
+        alq = float(s["alquiler"])
+        exp = float(s.get("expensas") or 0)
+        meses = int(s["meses"])
+        alq_exp = alq + exp
+
+        planes = (rec.get("normalized") or {}).get("planes") or []
+        p = pick_plan(planes, mode=mode)
+        if not p:
+            continue
+
+        monto_final = to_float(p.get("monto_final"))
+        if monto_final is None or alq_exp <= 0:
+            continue
+
+        # fracción: monto_final / (alq+exp)
+        pct_ae = monto_final / alq_exp
+
+        # porcentaje (0-100+)
+        pct_ae_pct = pct_ae * 100.0
+
+        # descuento real si viene (lo normalizamos a %)
+        pct_desc = to_float(p.get("pct_descuento_real"))
+        if pct_desc is not None and pct_desc <= 1:
+            pct_desc = pct_desc * 100.0
+
+        rows.append({
+            "segmento": segmento(alq_exp),
+            "meses": meses,
+            "tipo_garantia": bool(s.get("tipo_garantia", False)),
+            "alq_exp": alq_exp,
+            "monto_final": monto_final,
+            "pct_ae_pct": pct_ae_pct,     # para matriz
+            "pct_desc_pct": pct_desc,     # para hoja descuentos
+        })
 
     df = pd.DataFrame(rows)
     df = df[df["meses"].isin(PLAZOS)].copy()
@@ -109,6 +97,22 @@ def main(mode: str = "contado"):
         n=("monto_final", "count"),
     )
 
+    # corrida muestreada (--sample): media estratificada y error estándar por celda
+    plan = SamplePlan.for_run(jsonl_path)
+    se_mat = None
+    if plan is not None:
+        st = cell_stats(df, "pct_ae_pct", ["segmento", "meses"], plan)
+        g = g.drop(columns="pct_ae_prom").merge(
+            st.rename(columns={"mean": "pct_ae_prom", "se": "pct_ae_se"})[["segmento", "meses", "pct_ae_prom", "pct_ae_se"]],
+            on=["segmento", "meses"],
+        )
+        se_mat = (
+            g.pivot(index="segmento", columns="meses", values="pct_ae_se")
+            .reindex(columns=PLAZOS)
+            .reset_index()
+        )
+        print(f"Muestra seed={plan.seed}: {plan.fraction:.1%} de los escenarios; error estándar en hoja Error_Std_%AE")
+
     mat = (
         g.pivot(index="segmento", columns="meses", values="pct_ae_prom")
         .reindex(columns=PLAZOS)
@@ -126,31 +130,37 @@ def main(mode: str = "contado"):
     with pd.ExcelWriter(out_xlsx, engine="openpyxl") as w:
         mat.to_excel(w, index=False, sheet_name="Matriz_Finaer_%AE")
         des_df.to_excel(w, index=False, sheet_name="Descuentos_Finaer")
+        if se_mat is not None:
+            se_mat.to_excel(w, index=False, sheet_name="Error_Std_%AE")
         df.to_excel(w, index=False, sheet_name="Base")
 
     # formato Excel: encabezado + porcentajes sin romper merged cells
     wb = load_workbook(out_xlsx)
     ws = wb["Matriz_Finaer_%AE"]
 
-    for c in ws[1]:
-        c.font = Font(bold=True)
-        c.fill = PatternFill("solid", fgColor="D9E1F2")
-    ws.freeze_panes = "A2"
-    ws.auto_filter.ref = ws.dimensions
-
-    # Convertir valores (ej 60) -> fracción (0.60) y aplicar formato %
-    for row in range(2, ws.max_row + 1):
-        for col in range(2, ws.max_column + 1):
-            cell = ws.cell(row=row, column=col)
-
-            # saltar celdas merged (read-only)
-            if isinstance(cell, MergedCell) or cell.coordinate in ws.merged_cells:
-                continue
-
-            val = cell.value
-            if isinstance(val, (int, float)):
-                cell.value = float(val) / 100.0
-                cell.number_format = "0.00%"
+    for name in ["Matriz_Finaer_%AE", "Error_Std_%AE"]:
+        if name not in wb.sheetnames:
+            continue
+        wsx = wb[name]
+        for c in wsx[1]:
+            c.font = Font(bold=True)
+            c.fill = PatternFill("solid", fgColor="D9E1F2")
+        wsx.freeze_panes = "A2"
+        wsx.auto_filter.ref = wsx.dimensions
+
+        # Convertir valores (ej 60) -> fracción (0.60) y aplicar formato %
+        for row in range(2, wsx.max_row + 1):
+            for col in range(2, wsx.max_column + 1):
+                cell = wsx.cell(row=row, column=col)
+
+                # saltar celdas merged (read-only)
+                if isinstance(cell, MergedCell) or cell.coordinate in wsx.merged_cells:
+                    continue
+
+                val = cell.value
+                if isinstance(val, (int, float)):
+                    cell.value = float(val) / 100.0
+                    cell.number_format = "0.00%"
 
     # color scale
     max_row = ws.max_row
@@ -1,39 +1,37 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from price_monitor.fingerprints import resolved_records
+from price_monitor.runs import run_files
+
 
 def load_all_jsonl(output_dir: Path) -> pd.DataFrame:
     rows = []
-    for p in sorted(output_dir.glob("finaer_*.jsonl")):
-        with open(p, "r", encoding="utf-8") as f:
-            for line in f:
-                if not line.strip():
-                    continue
-                rec = json.loads(line)
-
-                scen = rec["scenario"]
-                for plan in rec.get("normalized", {}).get("planes", []):
-                    rows.append({
-                        "ts": rec.get("ts_utc"),
-                        "scenario_id": rec.get("scenario_id"),
-                        "alquiler": scen.get("alquiler"),
-                        "expensas": scen.get("expensas"),
-                        "alquiler_mas_expensas": (scen.get("alquiler") or 0) + (scen.get("expensas") or 0),
-                        "meses": scen.get("meses"),
-                        "cuotas": plan.get("cuotas"),
-                        "monto_final": plan.get("monto_final"),
-                        "anticipo": plan.get("anticipo"),
-                        "monto_cuotas": plan.get("monto_cuotas"),
-                        "honorario_sin_descuentos": plan.get("honorario_sin_descuentos"),
-                        "descuento_aplicado": plan.get("descuento_aplicado"),
-                        "pct_descuento_real": plan.get("pct_descuento_real"),
-                        "costo_mensual_equiv": plan.get("costo_mensual_equiv"),
-                        "pct_sobre_total_alq_exp": plan.get("pct_sobre_total_alq_exp"),
-                    })
+    for p in run_files(output_dir):
+        # --skip-unchanged: los unchanged_record vienen con los planes de su última corrida completa
+        for rec in resolved_records(p):
+            scen = rec["scenario"]
+            for plan in (rec.get("normalized") or {}).get("planes", []):
+                rows.append({
+                    "ts": rec.get("ts_utc"),
+                    "scenario_id": rec.get("scenario_id"),
+                    "alquiler": scen.get("alquiler"),
+                    "expensas": scen.get("expensas"),
+                    "alquiler_mas_expensas": (scen.get("alquiler") or 0) + (scen.get("expensas") or 0),
+                    "meses": scen.get("meses"),
+                    "cuotas": plan.get("cuotas"),
+                    "monto_final": plan.get("monto_final"),
+                    "anticipo": plan.get("anticipo"),
+                    "monto_cuotas": plan.get("monto_cuotas"),
+                    "honorario_sin_descuentos": plan.get("honorario_sin_descuentos"),
+                    "descuento_aplicado": plan.get("descuento_aplicado"),
+                    "pct_descuento_real": plan.get("pct_descuento_real"),
+                    "costo_mensual_equiv": plan.get("costo_mensual_equiv"),
+                    "pct_sobre_total_alq_exp": plan.get("pct_sobre_total_alq_exp"),
+                })
     return pd.DataFrame(rows)
 
 
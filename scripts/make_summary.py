@@ -1,16 +1,19 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 import pandas as pd
 
+from price_monitor import rules
+from price_monitor.fingerprints import resolved_records
+from price_monitor.runs import latest_run
+
+
+# "hasta 500000", "500000-800000", "mayor a 800000" con los bordes de rules.SEGMENT_BORDERS
+SEGMENTOS_ALQUILER = rules.segment_labels(last="mayor a {lo}", unit=lambda b: f"{b:g}")
+
 
 def segment_alquiler(alquiler: float) -> str:
-    if alquiler <= 500_000:
-        return "hasta 500000"
-    if alquiler <= 800_000:
-        return "500000-800000"
-    return "mayor a 800000"
+    return SEGMENTOS_ALQUILER[int(rules.segment_index(alquiler))]
 
 
 def pick_main_plan(df: pd.DataFrame) -> pd.DataFrame:
@@ -24,36 +27,29 @@ def pick_main_plan(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def load_latest_jsonl(output_dir: Path) -> pd.DataFrame:
-    files = sorted(output_dir.glob("finaer_*.jsonl"))
-    if not files:
-        raise SystemExit("No hay output/finaer_*.jsonl")
-
-    latest = files[-1]
+    latest = latest_run(output_dir)
     rows = []
-    with open(latest, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            rec = json.loads(line)
-            scen = rec["scenario"]
-            for p in rec.get("normalized", {}).get("planes", []):
-                rows.append({
-                    "ts": rec.get("ts_utc"),
-                    "competitor": rec.get("competitor"),
-                    "scenario_id": rec.get("scenario_id"),
-                    "alquiler": float(scen.get("alquiler") or 0),
-                    "expensas": float(scen.get("expensas") or 0),
-                    "alquiler_mas_expensas": float(scen.get("alquiler") or 0) + float(scen.get("expensas") or 0),
-                    "meses": int(scen.get("meses") or 0),
-
-                    "cuotas": int(p.get("cuotas") or 0),
-                    "monto_final": float(p.get("monto_final") or 0),
-                    "honorario_sin_descuentos": float(p.get("honorario_sin_descuentos") or 0),
-                    "descuento_aplicado": float(p.get("descuento_aplicado") or 0),
-                    "pct_descuento_real": p.get("pct_descuento_real"),
-                    "costo_mensual_equiv": p.get("costo_mensual_equiv"),
-                    "pct_sobre_total_alq_exp": p.get("pct_sobre_total_alq_exp"),
-                })
+    # --skip-unchanged: los unchanged_record vienen completos (su última corrida)
+    for rec in resolved_records(latest):
+        scen = rec["scenario"]
+        for p in rec.get("normalized", {}).get("planes", []):
+            rows.append({
+                "ts": rec.get("ts_utc"),
+                "competitor": rec.get("competitor"),
+                "scenario_id": rec.get("scenario_id"),
+                "alquiler": float(scen.get("alquiler") or 0),
+                "expensas": float(scen.get("expensas") or 0),
+                "alquiler_mas_expensas": float(scen.get("alquiler") or 0) + float(scen.get("expensas") or 0),
+                "meses": int(scen.get("meses") or 0),
+
+                "cuotas": int(p.get("cuotas") or 0),
+                "monto_final": float(p.get("monto_final") or 0),
+                "honorario_sin_descuentos": float(p.get("honorario_sin_descuentos") or 0),
+                "descuento_aplicado": float(p.get("descuento_aplicado") or 0),
+                "pct_descuento_real": p.get("pct_descuento_real"),
+                "costo_mensual_equiv": p.get("costo_mensual_equiv"),
+                "pct_sobre_total_alq_exp": p.get("pct_sobre_total_alq_exp"),
+            })
 
     df = pd.DataFrame(rows)
     df["pct_descuento_real"] = pd.to_numeric(df["pct_descuento_real"], errors="coerce")
@@ -1,7 +1,6 @@
 # scripts/make_summary_compare.py
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Optional, cast
 
@@ -14,6 +13,10 @@ from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.worksheet import Worksheet
 from typing import Any, Mapping
 
+from price_monitor import rules
+from price_monitor.fingerprints import resolved_records
+from price_monitor.runs import latest_run
+from price_monitor.sampling import SEGMENTOS, SamplePlan, cell_stats, segmento
 
 
 # Hoggax: 3/6/12/24/36 (según tu CSV manual)
@@ -21,8 +24,6 @@ PLAZOS_HOGGAX = [3, 6, 12, 24, 36]
 # Finaer: NO existe 3/6 (según tu aclaración)
 PLAZOS_FINAER = [12, 24, 36]
 
-SEGMENTOS = ["hasta 500k", "500k-800k", "mayor_800k"]
-
 SENTINEL_CUOTAS = 10**9
 
 
@@ -35,19 +36,8 @@ def to_float(x) -> Optional[float]:
         return None
 
 
-def segmento(alq_exp: float) -> str:
-    if alq_exp <= 500_000:
-        return "hasta 500k"
-    if alq_exp <= 800_000:
-        return "500k-800k"
-    return "mayor_800k"
-
-
 def load_latest_jsonl(prefix: str = "finaer_") -> Path:
-    files = sorted(Path("output").glob(f"{prefix}*.jsonl"))
-    if not files:
-        raise SystemExit(f"No hay output/{prefix}*.jsonl. Corré primero: python -m price_monitor.cli")
-    return files[-1]
+    return latest_run(Path("output"), prefix)
 
 
 def cuotas_of(p: Mapping[str, Any]) -> int:
@@ -285,63 +275,61 @@ def main():
 
     df_h_long = load_hoggax_rates_long(str(hoggax_path))
 
-    # ---------- HOGGAX: descuento fijo 15% ----------
-    df_h_long["hoggax_desc_pct"] = df_h_long["hoggax_desc_pct"].fillna(15.0)
+    # ---------- HOGGAX: descuento fijo (rules.TRANSFER_DESC_PCT) ----------
+    df_h_long["hoggax_desc_pct"] = df_h_long["hoggax_desc_pct"].fillna(rules.TRANSFER_DESC_PCT)
 
     # ---------- FINAER (desde JSONL) ----------
     finaer_rows = []
-    with open(finaer_jsonl, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            rec = json.loads(line)
-
-            s = rec.get("scenario") or {}
-            alq = float(s.get("alquiler") or 0)
-            exp = float(s.get("expensas") or 0)
-            plazo_meses = int(s.get("meses") or 0)
-
-            if plazo_meses not in PLAZOS_FINAER:
-                continue
-
-            total_base = alq + exp
-            if total_base <= 0:
-                continue
-
-            planes = ((rec.get("normalized") or {}).get("planes")) or []
-            p = pick_plan_contado(planes)
-
-            monto_final = to_float(p.get("monto_final"))
-            honorario = to_float(p.get("honorario_sin_descuentos"))
-            desc_abs = to_float(p.get("descuento_aplicado"))
-            fecha_desc = p.get("fecha_limite_descuento")
-
-            if monto_final is None:
-                continue
-
-            # % sobre total (Alq+Exp) * plazo
-            pct_sobre_total = (monto_final / (total_base * plazo_meses)) * 100.0
-
-            # descuento % real
-            desc_pct = None
-            if honorario and honorario > 0 and desc_abs is not None:
-                desc_pct = (desc_abs / honorario) * 100.0
-
-            finaer_rows.append(
-                {
-                    "segmento": segmento(total_base),
-                    "plazo_meses": plazo_meses,
-                    "alquiler": alq,
-                    "expensas": exp,
-                    "total_base_$": total_base,
-                    "finaer_precio_$": monto_final,
-                    "finaer_pct_sobre_total": pct_sobre_total,
-                    "finaer_honorario_sin_desc_$": honorario,
-                    "finaer_desc_$": desc_abs,
-                    "finaer_desc_pct": desc_pct,
-                    "finaer_fecha_desc": fecha_desc,
-                }
-            )
+    # --skip-unchanged: los unchanged_record vienen completos (su última corrida)
+    for rec in resolved_records(finaer_jsonl):
+
+        s = rec.get("scenario") or {}
+        alq = float(s.get("alquiler") or 0)
+        exp = float(s.get("expensas") or 0)
+        plazo_meses = int(s.get("meses") or 0)
+
+        if plazo_meses not in PLAZOS_FINAER:
+            continue
+
+        total_base = alq + exp
+        if total_base <= 0:
+            continue
+
+        planes = ((rec.get("normalized") or {}).get("planes")) or []
+        p = pick_plan_contado(planes)
+
+        monto_final = to_float(p.get("monto_final"))
+        honorario = to_float(p.get("honorario_sin_descuentos"))
+        desc_abs = to_float(p.get("descuento_aplicado"))
+        fecha_desc = p.get("fecha_limite_descuento")
+
+        if monto_final is None:
+            continue
+
+        # % sobre total (Alq+Exp) * plazo
+        pct_sobre_total = (monto_final / (total_base * plazo_meses)) * 100.0
+
+        # descuento % real
+        desc_pct = None
+        if honorario and honorario > 0 and desc_abs is not None:
+            desc_pct = (desc_abs / honorario) * 100.0
+
+        finaer_rows.append(
+            {
+                "segmento": segmento(total_base),
+                "plazo_meses": plazo_meses,
+                "tipo_garantia": bool(s.get("tipo_garantia", False)),
+                "alquiler": alq,
+                "expensas": exp,
+                "total_base_$": total_base,
+                "finaer_precio_$": monto_final,
+                "finaer_pct_sobre_total": pct_sobre_total,
+                "finaer_honorario_sin_desc_$": honorario,
+                "finaer_desc_$": desc_abs,
+                "finaer_desc_pct": desc_pct,
+                "finaer_fecha_desc": fecha_desc,
+            }
+        )
 
     df_f = pd.DataFrame(finaer_rows)
     if df_f.empty:
@@ -382,6 +370,27 @@ def main():
         )
     )
 
+    # ---------- MUESTRA (--sample): media estratificada + error estándar ----------
+    plan = SamplePlan.for_run(finaer_jsonl)
+    finaer_se_mat = None
+    if plan is not None:
+        st = cell_stats(
+            df_f.assign(meses=df_f["plazo_meses"]), "finaer_pct_sobre_total", ["segmento", "plazo_meses"], plan
+        )
+        df_f_avg = df_f_avg.drop(columns="finaer_pct_sobre_total").merge(
+            st.rename(columns={"mean": "finaer_pct_sobre_total", "se": "finaer_pct_se"})[
+                ["segmento", "plazo_meses", "finaer_pct_sobre_total", "finaer_pct_se"]
+            ],
+            on=["segmento", "plazo_meses"],
+        )
+        finaer_se_mat = (
+            df_f_avg.pivot(index="segmento", columns="plazo_meses", values="finaer_pct_se")
+            .reindex(index=SEGMENTOS, columns=PLAZOS_HOGGAX)
+            .reset_index()
+        )
+        finaer_se_mat.columns = ["segmento"] + [str(m) for m in PLAZOS_HOGGAX]
+        print(f"Muestra seed={plan.seed}: {plan.fraction:.1%} de los escenarios Finaer")
+
     # ---------- HOGGAX (desde CSV manual) ----------
     df_h_avg = (
         df_h_long.groupby(["segmento", "plazo_meses"], as_index=False)
@@ -440,6 +449,15 @@ def main():
         start_row=1,
         start_col=8,
     )
+    if finaer_se_mat is not None:
+        write_matrix_percent(
+            ws_m,
+            "Finaer error estándar (muestra)",
+            finaer_se_mat,
+            PLAZOS_HOGGAX,
+            start_row=1,
+            start_col=15,
+        )
     ws_m.freeze_panes = "A3"
 
     # Sheet 2: Comparativa (enfocada en monto_final y honorario_sin_descuentos)
@@ -1,33 +1,29 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 import pandas as pd
 from openpyxl import load_workbook
 from openpyxl.formatting.rule import ColorScaleRule
 from openpyxl.styles import PatternFill
 
+from price_monitor import rules
+from price_monitor.fingerprints import resolved_records
+from price_monitor.runs import latest_run
+
+
+SEGMENTOS = rules.segment_labels()
+
 
 def seg(a: float) -> str:
-    if a <= 500_000:
-        return "hasta 500k"
-    if a <= 800_000:
-        return "500k-800k"
-    return "mayor_800k"
+    return SEGMENTOS[int(rules.segment_index(a))]
 
 
 def load_latest():
-    out = Path("output")
-    files = sorted(out.glob("*.jsonl"))
-    if not files:
-        raise SystemExit("No hay jsonl en output/")
-    f = files[-1]
+    f = latest_run(Path("output"), prefix="")
 
     rows = []
-    for line in open(f, encoding="utf-8"):
-        if not line.strip():
-            continue
-        r = json.loads(line)
+    # --skip-unchanged: los unchanged_record vienen completos (su última corrida)
+    for r in resolved_records(f):
         s = r["scenario"]
         for p in r["normalized"]["planes"]:
             rows.append({
@@ -69,11 +65,8 @@ def apply_formatting(xlsx_path: Path):
     ws.conditional_formatting.add("D2:D200", desc_rule)
 
     # pintar segmentos
-    fills = {
-        "hasta 500k": PatternFill("solid", fgColor="D9E1F2"),
-        "500k-800k": PatternFill("solid", fgColor="E2EFDA"),
-        "mayor_800k": PatternFill("solid", fgColor="FCE4D6"),
-    }
+    colors = ["D9E1F2", "E2EFDA", "FCE4D6"]
+    fills = {s: PatternFill("solid", fgColor=c) for s, c in zip(SEGMENTOS, colors)}
 
     for row in ws.iter_rows(min_row=2, max_col=1):
         val = row[0].value
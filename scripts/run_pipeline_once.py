@@ -1,12 +1,14 @@
 # scripts/run_pipeline_once.py
 from __future__ import annotations
 
-import subprocess
-import sys
+import argparse
+import asyncio
 from datetime import datetime
 from pathlib import Path
 
-import pandas as pd
+from price_monitor import tracing
+from price_monitor.pipeline import Pipeline, Stage, print_result, python
+from price_monitor.scenario_grid import GridSpec
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
@@ -18,55 +20,85 @@ MESES = [12 ,24, 36]          # 24/36 “por web” para Hoggax, Finaer también
 TIPO_GARANTIA = False     # mantené igual a tu pipeline actual
 
 
-def run(cmd: list[str]) -> None:
-    print("\n>>", " ".join(cmd))
-    p = subprocess.run(cmd, cwd=REPO_ROOT, text=True, capture_output=True)
-    if p.stdout:
-        print(p.stdout)
-    if p.returncode != 0:
-        if p.stderr:
-            print(p.stderr)
-        raise SystemExit(p.returncode)
-
-
 def write_scenarios_csv() -> Path:
     out = REPO_ROOT / "data" / "scenarios.csv"
-    out.parent.mkdir(parents=True, exist_ok=True)
-
-    rows = []
-    i = 1
-    for alq in ALQ_EXP_VALUES:
-        for m in MESES:
-            rows.append(
-                {
-                    "scenario_id": f"S_{alq}_{m}",
-                    "alquiler": alq,
-                    "expensas": EXPENSAS,
-                    "meses": m,
-                    "tipo_garantia": TIPO_GARANTIA,
-                    "run": True,
-                }
-            )
-            i += 1
-
-    pd.DataFrame(rows).to_csv(out, index=False)
-    print(f"Wrote {len(rows)} scenarios -> {out}")
+    grid = GridSpec(
+        alquiler=ALQ_EXP_VALUES,
+        expensas=[EXPENSAS],
+        meses=MESES,
+        tipo_garantia=[TIPO_GARANTIA],
+        id_format="S_{alquiler}_{meses}",
+    )
+    n = grid.write_csv(out)
+    print(f"Wrote {n} scenarios -> {out}")
     return out
 
 
-def main() -> None:
-    # 0) escenarios minimalistas (evita “ruido”)
-    write_scenarios_csv()
-
-    # 1) FINaer una sola corrida (usa data/scenarios.csv)
-    # Asume que tu CLI ya lee data/scenarios.csv y genera output/finaer_*.xlsx y/o output/finaer_*.jsonl
-    run([sys.executable, "-m", "price_monitor.cli"])
+# DAG: las dependencias salen de inputs/outputs; finaer y hoggax corren en paralelo.
+# Una stage con los mismos inputs (por contenido) que la última vez se saltea:
+# cambiar solo el formato del compare no vuelve a crawlear. --force finaer hoggax para refrescar.
+# El Excel de Finaer es uno por corrida: el pipeline guarda cuál escribió la última
+# corrida de "finaer" y compare hashea solo ese (no los de corridas viejas).
+FINAER_XLSX = "output/finaer_????-??-??T??????Z.xlsx"
 
+STAGES = [
+    # 0) escenarios minimalistas (evita “ruido”)
+    Stage(
+        "scenarios",
+        write_scenarios_csv,
+        inputs=["scripts/run_pipeline_once.py"],
+        outputs=["data/scenarios.csv"],
+    ),
+    # 1) FINaer una sola corrida (usa data/scenarios.csv) -> output/finaer_*.jsonl / .xlsx
+    Stage(
+        "finaer",
+        python("-m", "price_monitor.cli"),
+        inputs=["data/scenarios.csv"],
+        outputs=[FINAER_XLSX],
+    ),
     # 2) Hoggax por API (usa data/scenarios.csv)
-    run([sys.executable, "scripts/fetch_hoggax_quotes.py"])
-
+    Stage(
+        "hoggax",
+        python("scripts/fetch_hoggax_quotes.py"),
+        inputs=["data/scenarios.csv", "scripts/fetch_hoggax_quotes.py"],
+        outputs=["output/hoggax_rates_long.csv"],
+    ),
     # 3) Comparativa final (Excel con formato + heatmap)
-    run([sys.executable, "scripts/compare_finaer_vs_hoggax_borders.py"])
+    Stage(
+        "compare",
+        python("scripts/compare_finaer_vs_hoggax_borders.py"),
+        inputs=[
+            FINAER_XLSX,
+            "output/hoggax_rates_long.csv",
+            "output/breakpoints.json",
+            "scripts/compare_finaer_vs_hoggax_borders.py",
+        ],
+        outputs=["output/compare_borders_finaer_vs_hoggax.xlsx"],
+    ),
+]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pipeline completo (escenarios -> Finaer + Hoggax -> comparativa)")
+    ap.add_argument("--force", nargs="*", default=[], metavar="STAGE", help="correr igual estas stages (o all)")
+    ap.add_argument("--jobs", type=int, default=4, help="stages en paralelo como máximo (default: 4)")
+    ap.add_argument("--dry-run", action="store_true", help="solo mostrar qué correría")
+    ap.add_argument("--trace", type=Path, default=None, metavar="JSON", help="traza Chrome trace-event de todas las stages (Perfetto)")
+    args = ap.parse_args()
+
+    if args.trace is not None:
+        tracing.enable(args.trace, process_name="pipeline")
+    pipeline = Pipeline(STAGES, REPO_ROOT)
+    try:
+        results = asyncio.run(pipeline.run(force=args.force, jobs=args.jobs, dry_run=args.dry_run, on_result=print_result))
+    finally:
+        trace_path = tracing.finish()
+        if trace_path is not None:
+            print(f"Wrote trace -> {trace_path}")
+
+    failed = [r.name for r in results.values() if r.status in ("error", "blocked")]
+    if failed:
+        raise SystemExit(f"Fallaron: {', '.join(failed)}")
 
     stamp = datetime.utcnow().strftime("%Y-%m-%dT%H%M%SZ")
     print("\nDONE:", stamp)
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import runpy
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from price_monitor import providers, tracing
+from price_monitor.cli import _run_name
+from price_monitor.cassette import Cassette, ReplayTransport, cassette_from_jsonl
+from price_monitor.clients.finaer import FINAER_URL
+from price_monitor.clients.hoggax import HOGGAX_URL, MESES_TO_PLAZO
+from price_monitor.io.excel import jsonl_to_excel
+from price_monitor.io.files import JsonlWriter, repo_root, utc_stamp
+from price_monitor.scheduler import run_providers
+
+
+# "crawl" es el path del CLI (scheduler.run_providers: fetch + normalize + JSONL) con las
+# respuestas servidas por un ReplayTransport; normalize y jsonl_write son la parte de
+# crawl que se fue en cada cosa (suma de los spans del tracer, no se suman al total).
+STAGES = ["crawl", "excel", "compare"]
+CRAWL_PARTS = ["normalize", "local_records", "jsonl_write"]
+
+COMPARE_SCRIPT = Path("scripts") / "compare_finaer_vs_hoggax_borders.py"
+
+# url del request grabado -> proveedor
+_URL_PROVIDER = {FINAER_URL: "finaer", HOGGAX_URL: "hoggax"}
+
+
+def scenarios_from_cassette(cassette: Cassette) -> dict[str, list[dict]]:
+    """Escenarios únicos de los requests grabados, por proveedor (solo lo que se puede re-servir)."""
+    plazo_to_meses = {v: k for k, v in MESES_TO_PLAZO.items()}
+    seen: dict[str, dict[tuple, dict]] = {}
+
+    for e in cassette.entries.values():
+        body = e.get("request") or {}
+        name = _URL_PROVIDER.get(e["url"])
+        if name == "finaer":
+            key = (int(body["alquiler"]), int(body["expensas"]), int(body["duracion_contrato"]), bool(body["tipo_garantia"]))
+        elif name == "hoggax":
+            cot = body.get("cotizacion") or {}
+            meses = plazo_to_meses.get(cot.get("plazo"))
+            if meses is None:
+                continue
+            key = (int(cot["alquiler"]), int(cot["expensas"]), meses, False)
+        else:
+            continue
+        by_key = seen.setdefault(name, {})
+        if key not in by_key:
+            a, x, m, tg = key
+            by_key[key] = {
+                "scenario_id": f"B_{a}_{x}_{m}_{int(tg)}",
+                "alquiler": a,
+                "expensas": x,
+                "meses": m,
+                "tipo_garantia": tg,
+            }
+    return {
+        name: sorted(by_key.values(), key=lambda s: (s["alquiler"], s["expensas"], s["meses"], s["tipo_garantia"]))
+        for name, by_key in seen.items()
+    }
+
+
+@contextlib.contextmanager
+def _timed(stages: dict[str, float], name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = time.perf_counter() - t0
+
+
+async def _crawl(
+    selected: list[providers.Provider],
+    scenarios: dict[str, list[dict]],
+    ts: str,
+    transport: ReplayTransport,
+    concurrency: int,
+    emit,
+    emit_error,
+):
+    """Como cli._crawl, sin cache ni control adaptativo y sin límite de rps (rps=0)."""
+    async with contextlib.AsyncExitStack() as stack:
+        clients = {}
+        for p in selected:
+            client = p.client(transport=transport, max_connections=min(concurrency, p.max_concurrency))
+            clients[p.name] = await stack.enter_async_context(client)
+        return await run_providers(
+            selected, scenarios, ts=ts, clients=clients, emit=emit, emit_error=emit_error, concurrency=concurrency, rps=0
+        )
+
+
+def _span_seconds(tracer: tracing.Tracer, names: list[str]) -> dict[str, float]:
+    out = dict.fromkeys(names, 0.0)
+    for ev in tracer.events:
+        if ev.get("ph") == "X" and ev["name"] in out:
+            out[ev["name"]] += ev["dur"] / 1e6
+    return out
+
+
+def run_once(
+    cassette: Cassette,
+    scenarios: dict[str, list[dict]],
+    workdir: Path,
+    *,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    concurrency: int = 32,
+    compare_script: Optional[Path] = None,
+) -> dict[str, Any]:
+    """Una corrida completa en `workdir`. Devuelve segundos por etapa + contadores."""
+    out_dir = workdir / "output"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ts = utc_stamp()
+    stages: dict[str, float] = {}
+    info: dict[str, Any] = {}
+
+    selected = [p for p in providers.REGISTRY.values() if scenarios.get(p.name)]
+    transport = ReplayTransport(cassette, latency_ms=latency_ms, jitter_ms=jitter_ms)
+    quiet = io.StringIO()
+    jsonl_path = out_dir / f"{_run_name(selected)}_{ts}.jsonl"
+
+    # 1) crawl: mismo scheduler, normalizadores y JsonlWriter que el CLI
+    counts = {p.name: {"ok": 0, "errors": 0} for p in selected}
+    tracer = tracing.enable(process_name="price-monitor bench")
+    try:
+        with _timed(stages, "crawl"), contextlib.redirect_stdout(quiet), JsonlWriter(jsonl_path) as w:
+
+            def emit(rec: dict) -> None:
+                counts[rec["competitor"]]["ok"] += 1
+                w.write(rec)
+
+            def emit_error(rec: dict) -> None:
+                counts[rec["competitor"]]["errors"] += 1
+
+            asyncio.run(_crawl(selected, scenarios, ts, transport, concurrency, emit, emit_error))
+    finally:
+        tracing.finish()
+    info["crawl_parts"] = _span_seconds(tracer, CRAWL_PARTS)
+    for name, c in counts.items():
+        info[f"{name}_ok"] = c["ok"]
+        info[f"{name}_errors"] = c["errors"]
+
+    # 2) Excel
+    with _timed(stages, "excel"):
+        jsonl_to_excel(jsonl_path, jsonl_path.with_suffix(".xlsx"))
+
+    # 3) compare (script del repo, corre con cwd = workdir)
+    if compare_script is not None and compare_script.exists():
+        cwd = os.getcwd()
+        with _timed(stages, "compare"), contextlib.redirect_stdout(quiet):
+            os.chdir(workdir)
+            try:
+                runpy.run_path(str(compare_script), run_name="__main__")
+            except SystemExit as e:
+                info["compare_error"] = str(e)
+            finally:
+                os.chdir(cwd)
+
+    stages["total"] = sum(stages.values())
+    info["stages"] = stages
+    info["scenarios"] = sum(len(scenarios[p.name]) for p in selected)
+    return info
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="price-monitor bench",
+        description="Benchmark offline del path del CLI: crawl (replay: fetch + normalize + JSONL) -> Excel -> compare",
+    )
+    p.add_argument("--cassette", type=Path, default=None, help="cassette JSONL (grabado con --record)")
+    p.add_argument(
+        "--from-output",
+        type=Path,
+        nargs="+",
+        default=None,
+        metavar="JSONL",
+        help="armar el cassette desde el campo raw de los JSONL de output (se guarda en --cassette si se indica)",
+    )
+    p.add_argument("--latency-ms", type=float, default=0.0, help="latencia simulada por request (default: 0)")
+    p.add_argument("--jitter-ms", type=float, default=0.0, help="jitter uniforme extra por request (default: 0)")
+    p.add_argument("--concurrency", type=int, default=32, help="requests en vuelo (default: 32)")
+    p.add_argument("--repeat", type=int, default=3, help="corridas (se reporta la mediana, default: 3)")
+    p.add_argument("--json", type=Path, default=None, help="guardar resultados en JSON")
+    p.add_argument("--keep", type=Path, default=None, help="dejar los outputs de la última corrida en esta carpeta")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _parse_args(argv)
+
+    if args.from_output:
+        cassette = cassette_from_jsonl(args.from_output)
+        if args.cassette is not None:
+            cassette.save(args.cassette)
+            print(f"Wrote cassette ({len(cassette)} requests) -> {args.cassette}")
+    elif args.cassette is not None:
+        cassette = Cassette.load(args.cassette)
+    else:
+        raise SystemExit("Indicá --cassette o --from-output")
+
+    scenarios = scenarios_from_cassette(cassette)
+    if not scenarios:
+        raise SystemExit("El cassette no tiene requests de Finaer/Hoggax")
+    for name in providers.names():
+        if name not in scenarios:
+            print(f"{name}: sin respuestas en el cassette, se saltea")
+
+    compare_script = repo_root() / COMPARE_SCRIPT
+
+    runs = []
+    for i in range(max(1, args.repeat)):
+        workdir = Path(tempfile.mkdtemp(prefix="pm_bench_"))
+        try:
+            info = run_once(
+                cassette,
+                scenarios,
+                workdir,
+                latency_ms=args.latency_ms,
+                jitter_ms=args.jitter_ms,
+                concurrency=args.concurrency,
+                compare_script=compare_script,
+            )
+            if args.keep is not None and i == args.repeat - 1:
+                shutil.copytree(workdir / "output", args.keep, dirs_exist_ok=True)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        runs.append(info)
+        print(f"run {i + 1}: total {info['stages']['total']:.3f}s")
+
+    last = runs[-1]
+    counts = " | ".join(f"{n} ok={last[f'{n}_ok']} err={last[f'{n}_errors']}" for n in scenarios)
+    print(f"\n{last['scenarios']} escenarios | {counts}")
+    if "compare_error" in last:
+        print(f"compare: {last['compare_error']}")
+
+    medians = {}
+    for name in STAGES + ["total"]:
+        vals = [r["stages"][name] for r in runs if name in r["stages"]]
+        if vals:
+            medians[name] = statistics.median(vals)
+            print(f"  {name:<13} {medians[name]:8.3f}s")
+        if name == "crawl":
+            for part in CRAWL_PARTS:
+                vals = [r["crawl_parts"][part] for r in runs]
+                if any(vals):
+                    medians[part] = statistics.median(vals)
+                    print(f"    {part:<11} {medians[part]:8.3f}s (dentro de crawl)")
+    if medians.get("total"):
+        print(f"  throughput    {last['scenarios'] / medians['total']:8.1f} escenarios/s")
+
+    if args.json is not None:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps({"median": medians, "runs": runs}, indent=2), encoding="utf-8")
+        print(f"Wrote -> {args.json}")
+
+
+if __name__ == "__main__":
+    main()
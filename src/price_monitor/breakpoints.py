@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import math
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Optional
+
+from price_monitor.cache import ResponseCache
+from price_monitor.clients.finaer import FinaerClient
+from price_monitor.clients.hoggax import MESES_TO_PLAZO, HoggaxClient, rows_12m, rows_from_response
+from price_monitor.normalize.finaer import normalize_finaer
+
+
+# cuotas -> total del plan para un escenario
+Quote = Callable[[int, int, int], Awaitable[dict[int, float]]]
+# cuotas -> tasa = total / (alq_exp * meses). Dentro de un mismo tramo la tasa es constante.
+Signature = dict[int, float]
+
+DEFAULT_OUT = Path("output") / "breakpoints.json"
+
+
+@dataclass
+class Breakpoint:
+    """`alquiler` es el primer valor del tramo nuevo (alquiler - step es el último del anterior)."""
+
+    provider: str
+    meses: int
+    cuotas: int
+    expensas: int
+    alquiler: int
+    step: int
+    rate_before: Optional[float]
+    rate_after: Optional[float]
+
+    @property
+    def alq_exp(self) -> int:
+        return self.alquiler + self.expensas
+
+    def to_dict(self) -> dict:
+        return asdict(self) | {"alq_exp": self.alq_exp}
+
+
+@dataclass
+class SearchResult:
+    provider: str
+    meses: int
+    expensas: int
+    lo: int
+    hi: int
+    step: int
+    calls: int
+    breakpoints: list[Breakpoint]
+
+
+def signature(totals: dict[int, float], alq_exp: int, meses: int) -> Signature:
+    denom = alq_exp * meses
+    return {c: round(t / denom, 8) for c, t in totals.items() if t is not None and denom}
+
+
+def same_regime(a: Signature, b: Signature, rel_tol: float = 1e-4) -> bool:
+    if a.keys() != b.keys():
+        return False
+    return all(math.isclose(a[c], b[c], rel_tol=rel_tol) for c in a)
+
+
+def _changed(a: Signature, b: Signature, rel_tol: float) -> list[int]:
+    out = []
+    for c in sorted(a.keys() | b.keys()):
+        if c not in a or c not in b or not math.isclose(a[c], b[c], rel_tol=rel_tol):
+            out.append(c)
+    return out
+
+
+async def search_breakpoints(
+    quote: Quote,
+    *,
+    provider: str,
+    meses: int,
+    expensas: int = 0,
+    lo: int,
+    hi: int,
+    step: int = 1,
+    probes: int = 16,
+    rel_tol: float = 1e-4,
+    concurrency: int = 8,
+) -> SearchResult:
+    """
+    Busca los alquileres donde cambia el tramo de la tarifa en [lo, hi].
+
+    Primero cotiza `probes` puntos equiespaciados y después bisecta cada par vecino
+    con firma distinta hasta `step`: O(k · log(rango/step)) cotizaciones para k cortes.
+    Un tramo angosto que empieza y termina entre dos probes vecinos (A -> B -> A) no se ve:
+    para eso, más `probes`.
+    """
+    if hi <= lo:
+        raise ValueError(f"rango inválido: [{lo}, {hi}]")
+    step = max(1, int(step))
+    sem = asyncio.Semaphore(max(1, concurrency))
+    memo: dict[int, asyncio.Future] = {}
+    found: list[Breakpoint] = []
+
+    async def _sig(alquiler: int) -> Signature:
+        async with sem:
+            totals = await quote(alquiler, expensas, meses)
+        return signature(totals, alquiler + expensas, meses)
+
+    async def sig(alquiler: int) -> Signature:
+        if alquiler not in memo:
+            memo[alquiler] = asyncio.ensure_future(_sig(alquiler))
+        return await memo[alquiler]
+
+    async def bisect(a: int, sa: Signature, b: int, sb: Signature) -> None:
+        if same_regime(sa, sb, rel_tol):
+            return
+        if b - a <= step:
+            for c in _changed(sa, sb, rel_tol):
+                found.append(Breakpoint(provider, meses, c, expensas, b, step, sa.get(c), sb.get(c)))
+            return
+        mid = a + max(1, (b - a) // (2 * step)) * step
+        sm = await sig(mid)
+        await asyncio.gather(bisect(a, sa, mid, sm), bisect(mid, sm, b, sb))
+
+    n = max(2, probes)
+    points = sorted({lo + round((hi - lo) * i / (n - 1) / step) * step for i in range(n)} | {hi})
+    sigs = await asyncio.gather(*(sig(p) for p in points))
+    await asyncio.gather(
+        *(bisect(points[i], sigs[i], points[i + 1], sigs[i + 1]) for i in range(len(points) - 1))
+    )
+
+    found.sort(key=lambda bp: (bp.cuotas, bp.alquiler))
+    return SearchResult(provider, meses, expensas, lo, hi, step, len(memo), found)
+
+
+# ---------------- cotizadores por proveedor ----------------
+def finaer_quote(client: FinaerClient, *, tipo_garantia: bool = False) -> Quote:
+    async def quote(alquiler: int, expensas: int, meses: int) -> dict[int, float]:
+        norm = normalize_finaer(await client.aquote(alquiler, expensas, meses, tipo_garantia))
+        return {int(p["cuotas"]): p["monto_final"] for p in norm["planes"] if p["monto_final"] is not None}
+
+    return quote
+
+
+def hoggax_quote(client: HoggaxClient) -> Quote:
+    async def quote(alquiler: int, expensas: int, meses: int) -> dict[int, float]:
+        s = {"scenario_id": "breakpoint", "alquiler": alquiler, "expensas": expensas, "meses": meses}
+        rows = rows_12m(s) if meses == 12 else rows_from_response(await client.aquote(alquiler, expensas, meses), s)
+        return {int(r["cuotas"]): r["hoggax_total_web"] for r in rows if r["hoggax_total_web"] is not None}
+
+    return quote
+
+
+def _only_cuotas(quote: Quote, cuotas: set[int]) -> Quote:
+    async def q(alquiler: int, expensas: int, meses: int) -> dict[int, float]:
+        return {c: t for c, t in (await quote(alquiler, expensas, meses)).items() if c in cuotas}
+
+    return q
+
+
+# ---------------- persistencia ----------------
+def load_breakpoints(path: Path = DEFAULT_OUT) -> dict:
+    if not path.exists():
+        return {"updated": None, "searches": [], "breakpoints": []}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_breakpoints(path: Path, results: Iterable[SearchResult]) -> dict:
+    """
+    Mergea con lo que ya había en `path`: los cortes viejos dentro de un rango
+    re-buscado (mismo provider/meses/expensas) se reemplazan por los nuevos.
+    """
+    data = load_breakpoints(path)
+    now = datetime.now(timezone.utc).isoformat()
+
+    for r in results:
+        def covered(bp: dict) -> bool:
+            return (
+                bp["provider"] == r.provider
+                and int(bp["meses"]) == r.meses
+                and int(bp["expensas"]) == r.expensas
+                and r.lo < int(bp["alquiler"]) <= r.hi
+            )
+
+        data["breakpoints"] = [bp for bp in data["breakpoints"] if not covered(bp)]
+        data["breakpoints"].extend(bp.to_dict() for bp in r.breakpoints)
+        data["searches"].append(
+            {
+                "provider": r.provider,
+                "meses": r.meses,
+                "expensas": r.expensas,
+                "lo": r.lo,
+                "hi": r.hi,
+                "step": r.step,
+                "calls": r.calls,
+                "found": len(r.breakpoints),
+                "ts_utc": now,
+            }
+        )
+
+    data["breakpoints"].sort(key=lambda bp: (bp["provider"], bp["meses"], bp["cuotas"], bp["alquiler"]))
+    data["updated"] = now
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    return data
+
+
+def border_alq_exp(data: dict) -> set[int]:
+    """Para cada corte: el último alq_exp del tramo anterior y el primero del nuevo."""
+    out: set[int] = set()
+    for bp in data.get("breakpoints") or []:
+        out.add(int(bp["alq_exp"]) - int(bp.get("step") or 1))
+        out.add(int(bp["alq_exp"]))
+    return out
+
+
+def write_border_scenarios(path: Path, data: dict, meses: Iterable[int]) -> int:
+    """CSV de escenarios (formato data/scenarios.csv) en ambos lados de cada corte, para crawlear."""
+    rows = []
+    for ae in sorted(border_alq_exp(data)):
+        for m in sorted(set(meses)):
+            rows.append(
+                {
+                    "scenario_id": f"BP_{ae}_{m}",
+                    "alquiler": ae,
+                    "expensas": 0,
+                    "meses": m,
+                    "tipo_garantia": False,
+                    "run": True,
+                }
+            )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=["scenario_id", "alquiler", "expensas", "meses", "tipo_garantia", "run"])
+        w.writeheader()
+        w.writerows(rows)
+    return len(rows)
+
+
+# ---------------- CLI ----------------
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="price-monitor breakpoints",
+        description="Busca por bisección los alquileres donde cambia el tramo de tarifa (por proveedor/meses/cuotas)",
+    )
+    p.add_argument("--provider", nargs="+", choices=["finaer", "hoggax"], default=["finaer", "hoggax"])
+    p.add_argument("--meses", nargs="+", type=int, default=[12, 24, 36])
+    p.add_argument("--cuotas", nargs="+", type=int, default=[1, 3], help="planes a comparar (default: 1 3)")
+    p.add_argument("--expensas", type=int, default=0, help="expensas fijas durante la búsqueda (default: 0)")
+    p.add_argument("--min", dest="lo", type=int, default=50_000, help="alquiler mínimo (default: 50000)")
+    p.add_argument("--max", dest="hi", type=int, default=2_000_000, help="alquiler máximo (default: 2000000)")
+    p.add_argument("--step", type=int, default=1, help="resolución en pesos (default: 1)")
+    p.add_argument("--probes", type=int, default=16, help="puntos iniciales equiespaciados (default: 16)")
+    p.add_argument("--rel-tol", type=float, default=1e-4, help="tolerancia relativa para 'misma tasa' (default: 1e-4)")
+    p.add_argument("--concurrency", type=int, default=8, help="cotizaciones en vuelo por búsqueda (default: 8)")
+    p.add_argument("--out", type=Path, default=DEFAULT_OUT, help=f"JSON de cortes (default: {DEFAULT_OUT})")
+    p.add_argument("--scenarios-out", type=Path, default=None, help="además, CSV de escenarios en ambos lados de cada corte")
+    p.add_argument("--no-cache", action="store_true", help="no usar la cache de respuestas")
+    return p.parse_args(argv)
+
+
+async def _run(args: argparse.Namespace, cache: Optional[ResponseCache]) -> list[SearchResult]:
+    cuotas = set(args.cuotas)
+    results: list[SearchResult] = []
+
+    async with FinaerClient(cache=cache, max_connections=args.concurrency) as fc, HoggaxClient(
+        cache=cache, max_connections=args.concurrency
+    ) as hc:
+        quotes = {"finaer": finaer_quote(fc), "hoggax": hoggax_quote(hc)}
+
+        for provider in args.provider:
+            for meses in args.meses:
+                if provider == "hoggax" and meses != 12 and meses not in MESES_TO_PLAZO:
+                    print(f"SKIP hoggax {meses}m: plazo sin cotizador")
+                    continue
+                try:
+                    r = await search_breakpoints(
+                        _only_cuotas(quotes[provider], cuotas),
+                        provider=provider,
+                        meses=meses,
+                        expensas=args.expensas,
+                        lo=args.lo,
+                        hi=args.hi,
+                        step=args.step,
+                        probes=args.probes,
+                        rel_tol=args.rel_tol,
+                        concurrency=args.concurrency,
+                    )
+                except Exception as e:
+                    print(f"ERROR {provider} {meses}m: {e}")
+                    continue
+                results.append(r)
+                print(f"OK {provider} {meses}m -> {len(r.breakpoints)} cortes en {r.calls} cotizaciones")
+                for bp in r.breakpoints:
+                    print(
+                        f"   {bp.cuotas} cuota(s): alq_exp {bp.alq_exp - bp.step:,} -> {bp.alq_exp:,} "
+                        f"tasa {bp.rate_before} -> {bp.rate_after}"
+                    )
+    return results
+
+
+def main(argv: list[str] | None = None):
+    args = _parse_args(argv)
+    cache = None if args.no_cache else ResponseCache.default()
+    try:
+        results = asyncio.run(_run(args, cache))
+    finally:
+        if cache is not None:
+            print(f"Cache: {cache.stats.summary()}")
+            cache.close()
+
+    if not results:
+        print("No se completó ninguna búsqueda")
+        return
+
+    data = save_breakpoints(args.out, results)
+    print(f"Wrote breakpoints ({len(data['breakpoints'])}) -> {args.out}")
+
+    if args.scenarios_out is not None:
+        n = write_border_scenarios(args.scenarios_out, data, args.meses)
+        print(f"Wrote scenarios ({n}) -> {args.scenarios_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+
+from price_monitor import tracing
+from price_monitor.io.files import repo_root
+
+
+# TTL por proveedor (segundos). Un proveedor sin entrada usa DEFAULT_TTL.
+DEFAULT_TTL = 6 * 3600
+DEFAULT_TTLS: Dict[str, float] = {
+    "finaer": 6 * 3600,
+    "hoggax": 6 * 3600,
+}
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# modos
+NORMAL = "normal"          # usa cache y va a la red si no hay hit
+CACHE_ONLY = "cache_only"  # nunca va a la red: un miss es error (CacheMiss)
+REFRESH = "refresh"        # ignora lo cacheado, va a la red y pisa la entrada
+MODES = (NORMAL, CACHE_ONLY, REFRESH)
+
+
+class CacheMiss(LookupError):
+    """Miss en modo cache_only."""
+
+
+def payload_key(provider: str, payload: Mapping[str, Any]) -> str:
+    """Clave content-addressed: sha256 del proveedor + payload en JSON canónico."""
+    blob = json.dumps({"provider": provider, "payload": payload}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def default_cache_dir() -> Path:
+    """$PRICE_MONITOR_CACHE_DIR, o <repo>/.cache (la misma que usa el CLI), sin importar el cwd."""
+    env = os.environ.get("PRICE_MONITOR_CACHE_DIR")
+    return Path(env) if env else repo_root() / ".cache"
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        ratio = (self.hits / total) if total else 0.0
+        return (
+            f"hits={self.hits} misses={self.misses} (hit ratio {ratio:.0%}) "
+            f"expired={self.expired} stores={self.stores} evictions={self.evictions}"
+        )
+
+
+class ResponseCache:
+    """
+    Cache en disco (sqlite) de respuestas de proveedores, keyed por payload_key().
+    - TTL por proveedor (`ttls`)
+    - tope de tamaño (`max_bytes`) con evicción LRU por último uso
+    - modos NORMAL / CACHE_ONLY / REFRESH
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        ttls: Optional[Mapping[str, float]] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        mode: str = NORMAL,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Modo de cache inválido: {mode!r}. Opciones: {MODES}")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttls = dict(DEFAULT_TTLS) | dict(ttls or {})
+        self.max_bytes = int(max_bytes)
+        self.mode = mode
+        self.stats = CacheStats()
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                size INTEGER NOT NULL,
+                body BLOB NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._db.commit()
+        self._size = int(self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0])
+
+    @classmethod
+    def default(cls, **kw) -> "ResponseCache":
+        return cls(default_cache_dir() / "responses.sqlite", **kw)
+
+    def ttl(self, provider: str) -> float:
+        return float(self.ttls.get(provider, DEFAULT_TTL))
+
+    # ---- lectura / escritura ----
+    def get(self, provider: str, payload: Mapping[str, Any]) -> Optional[dict]:
+        if self.mode == REFRESH:
+            self.stats.misses += 1
+            return None
+
+        key = payload_key(provider, payload)
+        row = self._db.execute("SELECT created, body FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self.stats.misses += 1
+            return None
+
+        created, body = row
+        if now - created > self.ttl(provider):
+            self.stats.expired += 1
+            self.stats.misses += 1
+            return None
+
+        self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        self.stats.hits += 1
+        return json.loads(zlib.decompress(body))
+
+    def put(self, provider: str, payload: Mapping[str, Any], response: Any) -> None:
+        key = payload_key(provider, payload)
+        body = zlib.compress(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+
+        old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if old is not None:
+            self._size -= int(old[0])
+
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, provider, created, last_used, size, body) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, provider, now, now, len(body), body),
+        )
+        self._size += len(body)
+        self.stats.stores += 1
+        self._evict()
+        self._db.commit()
+
+    def _evict(self) -> None:
+        """LRU: borra por last_used más viejo hasta quedar en ~90% del tope."""
+        if self._size <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        cur = self._db.execute("SELECT key, size FROM responses ORDER BY last_used ASC")
+        victims = []
+        for key, size in cur:
+            if self._size <= target:
+                break
+            victims.append((key,))
+            self._size -= int(size)
+        self._db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.stats.evictions += len(victims)
+
+    # ---- get-or-fetch ----
+    async def afetch(
+        self, provider: str, payload: Mapping[str, Any], fetcher: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        with tracing.span("cache_get", "cache"):
+            hit = self.get(provider, payload)
+        if hit is not None:
+            return hit
+        if self.mode == CACHE_ONLY:
+            raise CacheMiss(f"{provider}: sin respuesta cacheada para {dict(payload)}")
+        resp = await fetcher()
+        with tracing.span("cache_put", "cache"):
+            self.put(provider, payload, resp)
+        return resp
+
+    def fetch(self, provider: str, payload: Mapping[str, Any], fetcher: Callable[[], Any]) -> Any:
+        hit = self.get(provider, payload)
+        if hit is not None:
+            return hit
+        if self.mode == CACHE_ONLY:
+            raise CacheMiss(f"{provider}: sin respuesta cacheada para {dict(payload)}")
+        resp = fetcher()
+        self.put(provider, payload, resp)
+        return resp
+
+    def close(self) -> None:
+        self._db.close()
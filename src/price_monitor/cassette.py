@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import httpx
+
+
+class CassetteMiss(LookupError):
+    """Replay de un request que no está en el cassette."""
+
+
+def _canonical_body(content: bytes) -> Any:
+    if not content:
+        return None
+    try:
+        return json.loads(content)
+    except ValueError:
+        return content.decode("utf-8", errors="replace")
+
+
+def request_key(method: str, url: str, body: Any) -> str:
+    blob = json.dumps([method.upper(), str(url), body], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Pares request/response grabados, keyed por (método, url, body JSON canónico).
+    Se guarda como JSONL: una interacción por línea.
+    """
+
+    def __init__(self, path: Optional[str | Path] = None):
+        self.path = Path(path) if path is not None else None
+        self.entries: dict[str, dict] = {}
+
+    @classmethod
+    def load(cls, path: str | Path) -> "Cassette":
+        c = cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    e = json.loads(line)
+                    c.entries[e["key"]] = e
+        return c
+
+    def save(self, path: Optional[str | Path] = None) -> Path:
+        out = Path(path) if path is not None else self.path
+        if out is None:
+            raise ValueError("Cassette sin path")
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with out.open("w", encoding="utf-8") as f:
+            for e in self.entries.values():
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+        return out
+
+    def add(self, method: str, url: str, body: Any, status: int, response: Any, content_type: str = "application/json") -> None:
+        key = request_key(method, url, body)
+        self.entries[key] = {
+            "key": key,
+            "method": method.upper(),
+            "url": str(url),
+            "request": body,
+            "status": status,
+            "content_type": content_type,
+            "response": response,
+        }
+
+    def record(self, request: httpx.Request, response: httpx.Response) -> None:
+        ctype = response.headers.get("content-type", "application/json")
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        self.add(request.method, str(request.url), _canonical_body(request.content), response.status_code, body, ctype)
+
+    def lookup(self, request: httpx.Request) -> dict:
+        key = request_key(request.method, str(request.url), _canonical_body(request.content))
+        e = self.entries.get(key)
+        if e is None:
+            raise CassetteMiss(f"{request.method} {request.url}: no está en el cassette")
+        return e
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def _response_from(entry: dict, request: httpx.Request) -> httpx.Response:
+    body = entry["response"]
+    if isinstance(body, str) and "json" not in entry.get("content_type", ""):
+        return httpx.Response(entry["status"], text=body, request=request)
+    return httpx.Response(entry["status"], json=body, request=request)
+
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Va a la red normalmente y graba cada request/response en el cassette."""
+
+    def __init__(self, cassette: Cassette, *, limits: Optional[httpx.Limits] = None, http2: bool = False):
+        self.cassette = cassette
+        kw: dict[str, Any] = {"http2": http2}
+        if limits is not None:
+            kw["limits"] = limits
+        self._sync = httpx.HTTPTransport(**kw)
+        self._async = httpx.AsyncHTTPTransport(**kw)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        resp = self._sync.handle_request(request)
+        resp.read()
+        self.cassette.record(request, resp)
+        return resp
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        resp = await self._async.handle_async_request(request)
+        await resp.aread()
+        self.cassette.record(request, resp)
+        return resp
+
+    def close(self) -> None:
+        self._sync.close()
+
+    async def aclose(self) -> None:
+        await self._async.aclose()
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Sirve las respuestas del cassette sin red, con latencia simulada
+    (`latency_ms` fijo + `jitter_ms` uniforme). Un request no grabado -> CassetteMiss.
+    """
+
+    def __init__(self, cassette: Cassette, *, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.cassette = cassette
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.served = 0
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000.0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        entry = self.cassette.lookup(request)
+        d = self._delay()
+        if d:
+            time.sleep(d)
+        self.served += 1
+        return _response_from(entry, request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        entry = self.cassette.lookup(request)
+        d = self._delay()
+        if d:
+            await asyncio.sleep(d)
+        self.served += 1
+        return _response_from(entry, request)
+
+
+def cassette_from_jsonl(paths: Iterable[str | Path], cassette: Optional[Cassette] = None) -> Cassette:
+    """
+    Arma un cassette de Finaer y Hoggax a partir del campo `raw` de los JSONL de output
+    (el request se reconstruye desde `scenario`). Los registros sin raw (reglas, sin
+    cambios, filas viejas de hoggax_<ts>.jsonl) no aportan nada.
+    """
+    from price_monitor.clients.finaer import FINAER_URL, build_finaer_payload
+    from price_monitor.clients.hoggax import HOGGAX_URL, MESES_TO_PLAZO, build_hoggax_payload
+
+    cassette = cassette or Cassette()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if not rec.get("raw"):
+                    continue
+                s = rec.get("scenario") or {}
+                alq, exp, meses = int(s["alquiler"]), int(s["expensas"]), int(s["meses"])
+                if rec.get("competitor") == "finaer":
+                    payload = build_finaer_payload(alq, exp, meses, bool(s.get("tipo_garantia")))
+                    cassette.add("POST", FINAER_URL, payload, 200, rec["raw"])
+                elif rec.get("competitor") == "hoggax" and meses in MESES_TO_PLAZO:
+                    cassette.add("POST", HOGGAX_URL, build_hoggax_payload(alq, exp, meses), 200, rec["raw"])
+    return cassette
@@ -1,96 +1,516 @@
 from __future__ import annotations
 
-import time
+import argparse
+import asyncio
+import contextlib
+import importlib
+import sys
 from pathlib import Path
+from typing import Callable
 
-from price_monitor.scenarios import load_scenarios_csv
-from price_monitor.clients.finaer import call_finaer
-from price_monitor.normalize.finaer import normalize_finaer
-from price_monitor.io.files import write_jsonl, utc_stamp
+from price_monitor import providers, tracing
+from price_monitor.scenarios import load_scenario_records
+from price_monitor.scenario_grid import GridSpec
+from price_monitor.cache import CACHE_ONLY, NORMAL, REFRESH, ResponseCache, default_cache_dir
+from price_monitor.cassette import Cassette, RecordingTransport, ReplayTransport
+from price_monitor.clients.hoggax import HoggaxClient, crawl_hoggax
+from price_monitor.fingerprints import FingerprintStore, changes_path, store_path
+from price_monitor.ratecontrol import ProviderControl, make_control
+from price_monitor.scheduler import run_key, run_providers
+from price_monitor.io.files import JsonlWriter, repo_root, utc_stamp
+from price_monitor.runs import RunManifest, resolve_run, truncate_partial_line
+from price_monitor.records import set_validate_raw
+from price_monitor.sampling import SamplePlan, sample_path, stratified_sample
+from price_monitor.sharding import in_shard, parse_shard, shard_tag
 from price_monitor.io.excel import jsonl_to_excel
 
 
-def _repo_root() -> Path:
-    """
-    Busca el root del repo subiendo carpetas hasta encontrar pyproject.toml.
-    Funciona aunque el usuario ejecute desde cualquier cwd.
-    """
-    here = Path(__file__).resolve()
-    for p in [here] + list(here.parents):
-        if (p / "pyproject.toml").exists():
-            return p
-    # fallback: carpeta src/price_monitor -> subir 2 niveles
-    return Path(__file__).resolve().parents[2]
+# una hoja de Excel llega a ~1M filas (y openpyxl con eso tarda minutos): más allá, solo JSONL
+EXCEL_MAX_SCENARIOS = 200_000
 
 
-def main():
-    root = _repo_root()
+# subcomandos: `price-monitor <cmd> ...` -> <módulo>.main(argv)
+COMMANDS = {
+    "bench": "price_monitor.bench",
+    "breakpoints": "price_monitor.breakpoints",
+    "daemon": "price_monitor.daemon",
+    "grid": "price_monitor.scenario_grid",
+    "merge": "price_monitor.sharding",
+    "renormalize": "price_monitor.renormalize",
+    "surrogate": "price_monitor.surrogate",
+    "whatif": "price_monitor.whatif",
+}
 
-    csv_path = root / "data" / "scenarios.csv"
-    if not csv_path.exists():
-        print(f"No existe {csv_path}")
-        return
 
-    df = load_scenarios_csv(csv_path)
-    df = df[df["run"] == True]
+def _shard_arg(spec: str) -> tuple[int, int]:
+    try:
+        return parse_shard(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
-    if df.empty:
-        print(f"No hay escenarios con run=true en {csv_path}")
-        return
 
-    ts = utc_stamp()
-    out_dir = root / "output"
-    out_dir.mkdir(parents=True, exist_ok=True)
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="price-monitor",
+        description="Crawl de cotizaciones Finaer / Hoggax. Otros comandos: " + ", ".join(sorted(COMMANDS)),
+    )
+    p.add_argument(
+        "--provider",
+        nargs="+",
+        choices=providers.names() + ["all"],
+        default=["finaer"],
+        help="a quién cotizar; varios (o all) corren a la vez en un solo stream quotes_<ts>.jsonl (default: finaer)",
+    )
+    src = p.add_mutually_exclusive_group()
+    src.add_argument("--scenarios", type=Path, default=None, help="escenarios: CSV, Parquet o Feather (default: <repo>/data/scenarios.csv)")
+    src.add_argument(
+        "--grid",
+        type=Path,
+        default=None,
+        metavar="SPEC",
+        help="spec JSON de una grilla (ver price_monitor.scenario_grid): se recorre lazy, sin CSV ni coalescing",
+    )
+    p.add_argument(
+        "--shard",
+        type=_shard_arg,
+        default=None,
+        metavar="i/N",
+        help="correr solo la porción i de N (hash estable por escenario) y escribir <run>_<ts>_shard<i>of<N>.jsonl; "
+        "juntar después con: price-monitor merge",
+    )
+    p.add_argument(
+        "--sample",
+        type=int,
+        default=None,
+        metavar="REQUESTS",
+        help="cotizar solo una muestra estratificada (segmento x meses x garantía) de a lo sumo REQUESTS requests "
+        "en total; el plan queda en <run>.sample.json y las matrices salen con error estándar",
+    )
+    p.add_argument("--seed", type=int, default=0, help="seed de --sample: misma seed, misma muestra (default: 0)")
+    p.add_argument("--out-dir", type=Path, default=None, help="carpeta de salida (default: <repo>/output)")
+    p.add_argument(
+        "--resume",
+        default=None,
+        metavar="RUN",
+        help="retomar una corrida cortada (timestamp o path del JSONL): saltea los escenarios ya hechos",
+    )
+    p.add_argument("--concurrency", type=int, default=8, help="requests en vuelo como máximo (default: 8)")
+    p.add_argument("--min-concurrency", type=int, default=1, help="piso del control adaptativo (default: 1)")
+    p.add_argument("--no-adaptive", action="store_true", help="concurrencia fija = --concurrency (sin AIMD)")
+    p.add_argument("--target-latency", type=float, default=2.0, help="latencia (s) sobre la cual se baja la concurrencia (default: 2)")
+    p.add_argument("--retries", type=int, default=3, help="reintentos ante 429/5xx/timeouts (default: 3)")
+    p.add_argument("--breaker-threshold", type=int, default=5, help="fallas seguidas que abren el circuito (default: 5)")
+    p.add_argument("--breaker-cooldown", type=float, default=30.0, help="segundos con el circuito abierto (default: 30)")
+    p.add_argument(
+        "--rps",
+        type=float,
+        default=None,
+        help="requests por segundo como máximo, por proveedor; 0 = sin límite (default: el de cada proveedor, 4)",
+    )
+    p.add_argument("--connect-timeout", type=float, default=5.0, help="timeout de conexión en segundos (default: 5)")
+    p.add_argument("--read-timeout", type=float, default=30.0, help="timeout de lectura en segundos (default: 30)")
+    p.add_argument("--http2", action="store_true", help="usar HTTP/2 (requiere httpx[http2])")
+    p.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        help="respuestas iguales a la última conocida (fingerprint) no se normalizan: se registran como "
+        "unchanged_since; si nada cambió no se regenera el Excel",
+    )
+    p.add_argument(
+        "--no-validate",
+        action="store_true",
+        help="no validar el schema de cada respuesta antes de normalizar (más rápido; un cambio de la API no avisa)",
+    )
+    p.add_argument(
+        "--trace",
+        type=Path,
+        default=None,
+        metavar="JSON",
+        help="guardar una traza Chrome trace-event (requests, normalización, escrituras) para abrir en Perfetto",
+    )
+
+    c = p.add_argument_group("cache de respuestas")
+    c.add_argument("--cache-dir", type=Path, default=None, help="carpeta de la cache (default: $PRICE_MONITOR_CACHE_DIR o <repo>/.cache)")
+    c.add_argument("--no-cache", action="store_true", help="no usar la cache")
+    mode = c.add_mutually_exclusive_group()
+    mode.add_argument("--cache-only", action="store_true", help="no ir a la red: solo respuestas cacheadas")
+    mode.add_argument("--refresh", action="store_true", help="ignorar lo cacheado y volver a pedir todo")
+    c.add_argument(
+        "--cache-ttl",
+        action="append",
+        default=[],
+        metavar="PROVIDER=SEGUNDOS",
+        help="TTL por proveedor, ej: --cache-ttl finaer=3600 (repetible)",
+    )
+    c.add_argument("--cache-max-mb", type=float, default=256, help="tamaño máximo de la cache en MB (default: 256)")
+
+    r = p.add_argument_group("record / replay")
+    rr = r.add_mutually_exclusive_group()
+    rr.add_argument("--record", type=Path, default=None, metavar="CASSETTE", help="grabar requests/responses en un cassette JSONL")
+    rr.add_argument("--replay", type=Path, default=None, metavar="CASSETTE", help="servir requests desde un cassette (sin red)")
+    r.add_argument("--replay-latency-ms", type=float, default=0.0, help="latencia simulada en replay (default: 0)")
+    r.add_argument("--replay-jitter-ms", type=float, default=0.0, help="jitter uniforme extra en replay (default: 0)")
+    return p.parse_args(argv)
+
+
+def _make_transport(args: argparse.Namespace) -> tuple[Cassette | None, RecordingTransport | ReplayTransport | None]:
+    if args.replay is not None:
+        cassette = Cassette.load(args.replay)
+        return cassette, ReplayTransport(
+            cassette, latency_ms=args.replay_latency_ms, jitter_ms=args.replay_jitter_ms
+        )
+    if args.record is not None:
+        cassette = Cassette.load(args.record) if args.record.exists() else Cassette(args.record)
+        cassette.path = args.record
+        return cassette, RecordingTransport(cassette, http2=args.http2)
+    return None, None
+
+
+def _make_cache(args: argparse.Namespace) -> ResponseCache | None:
+    if args.no_cache:
+        return None
+
+    ttls: dict[str, float] = {}
+    for item in args.cache_ttl:
+        provider, _, secs = item.partition("=")
+        if not secs:
+            raise SystemExit(f"--cache-ttl inválido: {item!r} (esperado PROVIDER=SEGUNDOS)")
+        ttls[provider.strip()] = float(secs)
+
+    mode = CACHE_ONLY if args.cache_only else REFRESH if args.refresh else NORMAL
+    cache_dir = args.cache_dir or default_cache_dir()
+    return ResponseCache(
+        cache_dir / "responses.sqlite",
+        ttls=ttls,
+        max_bytes=int(args.cache_max_mb * 1024 * 1024),
+        mode=mode,
+    )
+
 
-    out_path = out_dir / f"finaer_{ts}.jsonl"
+def _make_provider_control(name: str, args: argparse.Namespace) -> ProviderControl:
+    return make_control(
+        name,
+        adaptive=not args.no_adaptive,
+        max_concurrency=args.concurrency,
+        min_concurrency=args.min_concurrency,
+        target_latency=args.target_latency,
+        retries=args.retries,
+        breaker_threshold=args.breaker_threshold,
+        breaker_cooldown=args.breaker_cooldown,
+    )
 
-    rows: list[dict] = []
 
-    for _, r in df.iterrows():
-        try:
-            raw = call_finaer(
-                int(r["alquiler"]),
-                int(r["expensas"]),
-                int(r["meses"]),
-                bool(r["tipo_garantia"]),
+async def _crawl(
+    selected: list[providers.Provider],
+    pending: dict[str, list[dict]],
+    ts: str,
+    args: argparse.Namespace,
+    cache: ResponseCache | None,
+    transport,
+    emit: Callable[[dict], None],
+    emit_error: Callable[[dict], None],
+    fingerprints: FingerprintStore | None = None,
+    coalesce: bool = True,
+) -> None:
+    """Un cliente y un control por proveedor; todos corren a la vez (ver price_monitor.scheduler)."""
+    async with contextlib.AsyncExitStack() as stack:
+        clients = {}
+        for p in selected:
+            client = p.client(
+                connect_timeout=args.connect_timeout,
+                read_timeout=args.read_timeout,
+                max_connections=min(args.concurrency, p.max_concurrency),
+                http2=args.http2,
+                cache=cache,
+                transport=transport,
             )
-            norm = normalize_finaer(raw)
-
-            rows.append(
-                {
-                    "ts_utc": ts,
-                    "competitor": "finaer",
-                    "scenario_id": r["scenario_id"],
-                    "scenario": {
-                        "alquiler": int(r["alquiler"]),
-                        "expensas": int(r["expensas"]),
-                        "meses": int(r["meses"]),
-                        "tipo_garantia": bool(r["tipo_garantia"]),
-                    },
-                    "normalized": norm,
-                    "raw": raw,
-                }
+            clients[p.name] = await stack.enter_async_context(client)
+
+        await run_providers(
+            selected,
+            pending,
+            ts=ts,
+            clients=clients,
+            emit=emit,
+            emit_error=emit_error,
+            controls={p.name: _make_provider_control(p.name, args) for p in selected},
+            concurrency=args.concurrency,
+            rps=args.rps,
+            fingerprints=fingerprints,
+            coalesce=coalesce,
+        )
+
+
+def _open_run(provider: str, out_path: Path, ts: str, scenarios: list[dict], resume: bool) -> tuple[RunManifest, list[dict]]:
+    manifest = RunManifest.open(out_path, ts=ts, provider=provider, resume=resume)
+    manifest.total = len(scenarios)
+    pending = manifest.pending(scenarios)
+    if resume:
+        truncate_partial_line(out_path)
+        print(f"Reanudando {provider} {ts}: {len(scenarios) - len(pending)} ya hechos, {len(pending)} pendientes")
+    manifest.save(force=True)
+    return manifest, pending
+
+
+def _interrupted(manifest: RunManifest, provider_args: str) -> None:
+    manifest.finish(False)
+    print(
+        f"Interrumpido: {len(manifest.completed)}/{manifest.total} escenarios guardados. "
+        f"Reanudar con: price-monitor --provider {provider_args} --resume {manifest.ts}"
+    )
+
+
+def _run_name(selected: list[providers.Provider]) -> str:
+    return selected[0].name if len(selected) == 1 else "quotes"
+
+
+def _run_providers(
+    selected: list[providers.Provider],
+    scenarios: list[dict] | GridSpec,
+    ts: str,
+    out_dir: Path,
+    args: argparse.Namespace,
+    cache: ResponseCache | None,
+    transport=None,
+    resume: bool = False,
+    plan: SamplePlan | None = None,
+) -> None:
+    name = _run_name(selected)
+    tag = shard_tag(args.shard)
+    out_path = out_dir / f"{name}_{ts}{tag}.jsonl"
+    err_path = out_dir / f"{name}_{ts}{tag}.errors.jsonl"
+
+    # con un solo proveedor el manifest guarda scenario_id (como siempre); con varios, proveedor:scenario_id
+    multi = len(selected) > 1
+
+    def key(provider: str, scenario_id) -> str:
+        return run_key(provider, scenario_id) if multi else str(scenario_id)
+
+    manifest = RunManifest.open(
+        out_path,
+        ts=ts,
+        provider=name,
+        resume=resume,
+        key=lambda rec: key(rec["competitor"], rec["scenario_id"]),
+    )
+    grid = isinstance(scenarios, GridSpec)
+    shard = args.shard
+    if not grid:
+        n_scenarios = len(scenarios)
+    elif shard is None:
+        n_scenarios = scenarios.count()
+    else:
+        n_scenarios = sum(1 for s in scenarios if in_shard(s, shard))
+    manifest.total = n_scenarios * len(selected)
+    if grid:
+        # la grilla se recorre lazy (una vez por proveedor); nada se materializa
+        pending = {
+            p.name: (
+                s
+                for s in scenarios
+                if in_shard(s, shard) and key(p.name, s["scenario_id"]) not in manifest.completed
             )
+            for p in selected
+        }
+        print(f"Grilla {args.grid}: {n_scenarios:,} escenarios x {len(selected)} proveedor(es)")
+    else:
+        pending = {
+            p.name: [s for s in scenarios if key(p.name, s["scenario_id"]) not in manifest.completed] for p in selected
+        }
+    if resume:
+        truncate_partial_line(out_path)
+        n_pending = manifest.total - len(manifest.completed) if grid else sum(len(v) for v in pending.values())
+        print(f"Reanudando {name} {ts}: {manifest.total - n_pending} ya hechos, {n_pending} pendientes")
+    manifest.save(force=True)
+    if plan is not None:
+        plan.save(sample_path(out_path))
+
+    fingerprints = FingerprintStore.load(store_path(out_dir, tag)) if args.skip_unchanged else None
+    errors: list[JsonlWriter] = []
 
-            print(f"OK {r['scenario_id']} -> planes: {len(norm.get('planes', []))}")
+    def emit_error(rec: dict) -> None:
+        if not errors:
+            errors.append(JsonlWriter(err_path, mode="a" if resume else "w"))
+        errors[0].write(rec)
 
-        except Exception as e:
-            print(f"ERROR {r['scenario_id']}: {e}")
+    try:
+        # cada registro se appendea (y flushea) apenas termina: un crash no pierde lo hecho
+        with JsonlWriter(out_path, mode="a" if resume else "w") as w:
 
-        time.sleep(0.25)  # rate limit básico
+            def emit(rec: dict) -> None:
+                w.write(rec)
+                manifest.mark_done(key(rec["competitor"], rec["scenario_id"]))
 
-    if not rows:
+            with tracing.span("crawl", "run", providers=name, scenarios=n_scenarios):
+                asyncio.run(
+                    _crawl(selected, pending, ts, args, cache, transport, emit, emit_error, fingerprints, coalesce=not grid)
+                )
+    except KeyboardInterrupt:
+        shard_args = "" if shard is None else f" --shard {shard[0]}/{shard[1]}"
+        _interrupted(manifest, " ".join(p.name for p in selected) + shard_args)
+        return
+    finally:
+        for e in errors:
+            e.close()
+        if fingerprints is not None:
+            # también si se corta: lo ya guardado en el JSONL tiene su fingerprint al día
+            fingerprints.save()
+
+    manifest.finish()
+    if errors:
+        print(f"{errors[0].count} escenarios con error -> {err_path}")
+
+    if not manifest.completed:
         print("No se obtuvieron resultados válidos")
         return
 
-    write_jsonl(out_path, rows)
     print(f"Wrote JSONL -> {out_path}")
 
+    if fingerprints is not None:
+        fingerprints.write_changes(changes_path(out_path), ts)
+        print(f"Fingerprints: {fingerprints.summary()} -> {changes_path(out_path)}")
+        if not fingerprints.dirty:
+            print("Sin cambios: no se regenera el Excel")
+            return
+
+    if len(manifest.completed) > EXCEL_MAX_SCENARIOS:
+        print(f"{len(manifest.completed):,} escenarios: demasiados para Excel, queda solo el JSONL")
+        return
+
     # Exportar a Excel
     xlsx_path = out_path.with_suffix(".xlsx")
-    jsonl_to_excel(out_path, xlsx_path)
+    with tracing.span("excel", "io"):
+        jsonl_to_excel(out_path, xlsx_path)
     print(f"Wrote Excel -> {xlsx_path}")
 
 
+def _run_hoggax(
+    scenarios: list[dict],
+    ts: str,
+    out_dir: Path,
+    args: argparse.Namespace,
+    cache: ResponseCache | None,
+    transport=None,
+    resume: bool = False,
+) -> None:
+    out_csv = out_dir / "hoggax_rates_long.csv"
+    out_jsonl = out_dir / f"hoggax_{ts}.jsonl"
+    manifest, pending = _open_run("hoggax", out_jsonl, ts, scenarios, resume)
+
+    client = HoggaxClient(
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        max_connections=args.concurrency,
+        http2=args.http2,
+        cache=cache,
+        transport=transport,
+    )
+    try:
+        with tracing.span("crawl", "run", providers="hoggax", scenarios=len(scenarios)):
+            asyncio.run(
+                crawl_hoggax(
+                    pending,
+                    ts=ts,
+                    out_csv=out_csv,
+                    out_jsonl=out_jsonl,
+                    raw_dir=out_dir / "hoggax_raw",
+                    errors_jsonl=out_dir / f"hoggax_{ts}.errors.jsonl",
+                    client=client,
+                    control=_make_provider_control("hoggax", args),
+                    concurrency=args.concurrency,
+                    rps=providers.get("hoggax").rps if args.rps is None else args.rps,
+                    append=resume,
+                    on_done=manifest.mark_done,
+                )
+            )
+    except KeyboardInterrupt:
+        _interrupted(manifest, "hoggax")
+        return
+
+    manifest.finish()
+    print(f"Wrote CSV -> {out_csv}")
+    print(f"Wrote JSONL -> {out_jsonl}")
+
+
+def main(argv: list[str] | None = None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        return importlib.import_module(COMMANDS[argv[0]]).main(argv[1:])
+
+    args = _parse_args(argv)
+    root = repo_root()
+    if args.no_validate:
+        set_validate_raw(False)
+    if args.trace is not None:
+        tracing.enable(args.trace)
+    else:
+        tracing.enable_from_env()
+    try:
+        _main(args, root)
+    finally:
+        trace_path = tracing.finish()
+        if trace_path is not None:
+            print(f"Wrote trace -> {trace_path}")
+
+
+def _main(args: argparse.Namespace, root: Path) -> None:
+    scenarios: list[dict] | GridSpec
+    if args.grid is not None:
+        scenarios = GridSpec.load(args.grid)
+    else:
+        csv_path = args.scenarios or (root / "data" / "scenarios.csv")
+        if not csv_path.exists():
+            print(f"No existe {csv_path}")
+            return
+
+        scenarios = load_scenario_records(csv_path, only_run=True)
+        if not scenarios:
+            print(f"No hay escenarios con run=true en {csv_path}")
+            return
+
+    selected = providers.resolve(args.provider)
+
+    plan = None
+    if args.sample is not None:
+        # el presupuesto es de requests: se reparte entre los proveedores
+        budget = max(1, args.sample // len(selected))
+        scenarios, plan = stratified_sample(scenarios, budget, seed=args.seed)
+        print(
+            f"Muestra (seed {args.seed}): {len(scenarios):,} escenarios x {len(selected)} proveedor(es), "
+            f"{plan.fraction:.1%} de {sum(plan.population.values()):,} en {len(plan.population)} estratos"
+        )
+    # con --sample se shardea la muestra: la unión de los shards es la muestra entera
+    if args.shard is not None and not isinstance(scenarios, GridSpec):
+        scenarios = [s for s in scenarios if in_shard(s, args.shard)]
+
+    if args.shard is not None:
+        i, n = args.shard
+        print(f"Shard {i}/{n}" + ("" if isinstance(scenarios, GridSpec) else f": {len(scenarios)} escenarios"))
+
+    out_dir = args.out_dir or (root / "output")
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    ts = utc_stamp()
+    if args.resume:
+        ts, run_path = resolve_run(args.resume, out_dir, _run_name(selected), suffix=shard_tag(args.shard))
+        out_dir = run_path.parent
+
+    cache = _make_cache(args)
+    cassette, transport = _make_transport(args)
+    try:
+        legacy_hoggax = args.grid is None and args.shard is None and plan is None and not args.skip_unchanged
+        if [p.name for p in selected] == ["hoggax"] and legacy_hoggax:
+            # solo Hoggax: además el CSV long que lee compare_finaer_vs_hoggax_borders
+            _run_hoggax(scenarios, ts, out_dir, args, cache, transport, resume=bool(args.resume))
+        else:
+            _run_providers(selected, scenarios, ts, out_dir, args, cache, transport, resume=bool(args.resume), plan=plan)
+    finally:
+        if cache is not None:
+            print(f"Cache: {cache.stats.summary()}")
+            cache.close()
+        if args.record is not None and cassette is not None:
+            print(f"Wrote cassette ({len(cassette)} requests) -> {cassette.save()}")
+
+
 if __name__ == "__main__":
     main()
@@ -1,30 +1,226 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+from typing import Any, Dict, Iterable, Mapping, Optional
 
 import httpx
 
+from price_monitor.cache import ResponseCache, payload_key
+from price_monitor.coalesce import Coalescer
+from price_monitor.engine import run_jobs
+from price_monitor import ratecontrol, tracing
+
 
 FINAER_URL = "https://admin.finaersa.com.ar/api/web/calcular-costo-del-servicio/"
 
+HEADERS = {
+    "accept": "application/json",
+    "accept-encoding": "gzip, deflate",
+}
 
-def call_finaer(alquiler: int, expensas: int, meses: int, tipo_garantia: bool) -> Dict[str, Any]:
-    """
-    Llama a la API de Finaer.
 
+def build_finaer_payload(alquiler: int, expensas: int, meses: int, tipo_garantia: bool) -> Dict[str, Any]:
+    """
     Header/body esperado (según lo que pasaste):
       {alquiler: "350000", expensas: 0, duracion_contrato: "12", tipo_garantia: false}
 
     Nota: algunos backends esperan strings en alquiler/duracion_contrato.
     """
-    payload = {
+    return {
         "alquiler": str(int(alquiler)),
         "expensas": int(expensas),
         "duracion_contrato": str(int(meses)),
         "tipo_garantia": bool(tipo_garantia),
     }
 
-    with httpx.Client(timeout=30) as client:
-        r = client.post(FINAER_URL, json=payload)
+
+def finaer_payload_key(s: Mapping[str, Any]) -> str:
+    """Key del request de un escenario (la misma que usa la ResponseCache): escenarios con igual payload comparten key."""
+    return payload_key(
+        "finaer",
+        build_finaer_payload(int(s["alquiler"]), int(s["expensas"]), int(s["meses"]), bool(s["tipo_garantia"])),
+    )
+
+
+class FinaerClient:
+    """
+    Cliente long-lived de Finaer: mantiene un pool de conexiones keep-alive
+    (sync y async) para no pagar DNS/TCP/TLS en cada escenario.
+
+    http2=True requiere el extra `httpx[http2]`.
+    Con `cache` las respuestas se sirven/guardan en la ResponseCache compartida.
+    `transport` permite grabar/reproducir requests (ver price_monitor.cassette).
+    Con `coalesce` (default) los requests async idénticos que están en vuelo a la vez
+    se hacen una sola vez (ver price_monitor.coalesce).
+    """
+
+    def __init__(
+        self,
+        *,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_connections: int = 20,
+        http2: bool = False,
+        url: str = FINAER_URL,
+        cache: Optional[ResponseCache] = None,
+        transport: Optional[httpx.BaseTransport | httpx.AsyncBaseTransport] = None,
+        coalesce: bool = True,
+    ):
+        self.url = url
+        self.cache = cache
+        self.transport = transport
+        self.http2 = http2
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=30.0,
+        )
+        self._client: Optional[httpx.Client] = None
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self.coalescer: Optional[Coalescer[Dict[str, Any]]] = Coalescer() if coalesce else None
+
+    # ---- pools (lazy) ----
+    def _sync(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                headers=HEADERS,
+                transport=self.transport,  # type: ignore[arg-type]
+                event_hooks=tracing.event_hooks(async_=False),
+            )
+        return self._client
+
+    def _async(self) -> httpx.AsyncClient:
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                headers=HEADERS,
+                transport=self.transport,  # type: ignore[arg-type]
+                event_hooks=tracing.event_hooks(async_=True),
+            )
+        return self._aclient
+
+    # ---- requests ----
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        r = self._sync().post(self.url, json=payload)
+        r.raise_for_status()
+        return r.json()
+
+    async def _apost(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with ratecontrol.network_call():
+            r = await self._async().post(self.url, json=payload)
         r.raise_for_status()
         return r.json()
+
+    def quote(self, alquiler: int, expensas: int, meses: int, tipo_garantia: bool) -> Dict[str, Any]:
+        payload = build_finaer_payload(alquiler, expensas, meses, tipo_garantia)
+        if self.cache is not None:
+            return self.cache.fetch("finaer", payload, lambda: self._post(payload))
+        return self._post(payload)
+
+    async def aquote(self, alquiler: int, expensas: int, meses: int, tipo_garantia: bool) -> Dict[str, Any]:
+        payload = build_finaer_payload(alquiler, expensas, meses, tipo_garantia)
+
+        async def fetch() -> Dict[str, Any]:
+            if self.cache is not None:
+                return await self.cache.afetch("finaer", payload, lambda: self._apost(payload))
+            return await self._apost(payload)
+
+        if self.coalescer is not None:
+            return await self.coalescer.run(payload_key("finaer", payload), fetch)
+        return await fetch()
+
+    async def aquote_many(
+        self,
+        scenarios: Iterable[Mapping[str, Any]],
+        *,
+        concurrency: int = 8,
+        rps: Optional[float] = None,
+    ) -> list[Dict[str, Any] | BaseException]:
+        """
+        Cotiza muchos escenarios ({alquiler, expensas, meses, tipo_garantia}) en paralelo.
+        Devuelve una lista alineada con la entrada: respuesta o la excepción de ese escenario.
+        """
+        results: dict[int, Dict[str, Any] | BaseException] = {}
+
+        async def fetch(job: tuple[int, Mapping[str, Any]]) -> Dict[str, Any]:
+            _, s = job
+            return await self.aquote(
+                int(s["alquiler"]), int(s["expensas"]), int(s["meses"]), bool(s["tipo_garantia"])
+            )
+
+        def on_result(job, res, err) -> None:
+            results[job[0]] = err if err is not None else res
+
+        await run_jobs(enumerate(scenarios), fetch, concurrency=concurrency, rps=rps, on_result=on_result)
+        return [results[i] for i in sorted(results)]
+
+    def quote_many(
+        self,
+        scenarios: Iterable[Mapping[str, Any]],
+        *,
+        concurrency: int = 8,
+        rps: Optional[float] = None,
+    ) -> list[Dict[str, Any] | BaseException]:
+        """Versión sync de aquote_many (corre su propio event loop)."""
+
+        async def _run():
+            try:
+                return await self.aquote_many(scenarios, concurrency=concurrency, rps=rps)
+            finally:
+                # el pool async queda atado a este loop: lo cerramos acá
+                await self._aclose_async()
+
+        return asyncio.run(_run())
+
+    # ---- lifecycle ----
+    async def _aclose_async(self) -> None:
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        await self._aclose_async()
+        self.close()
+
+    def __enter__(self) -> "FinaerClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "FinaerClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+
+_default_client: Optional[FinaerClient] = None
+
+
+def _get_default_client() -> FinaerClient:
+    global _default_client
+    if _default_client is None:
+        _default_client = FinaerClient(cache=ResponseCache.default())
+    return _default_client
+
+
+def call_finaer(alquiler: int, expensas: int, meses: int, tipo_garantia: bool) -> Dict[str, Any]:
+    """
+    Llama a la API de Finaer.
+
+    Wrapper de compatibilidad: usa un FinaerClient compartido (conexiones reutilizadas)
+    y la cache de respuestas por defecto (ver price_monitor.cache).
+    """
+    return _get_default_client().quote(alquiler, expensas, meses, tipo_garantia)
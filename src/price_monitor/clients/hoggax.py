@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+
+import httpx
+
+from price_monitor.cache import ResponseCache, payload_key
+from price_monitor.coalesce import Coalescer, group_by_key
+from price_monitor.engine import EngineStats, run_jobs
+from price_monitor.io.files import CsvWriter, JsonlWriter
+from price_monitor.normalize.hoggax import parse_info, parse_texto
+from price_monitor.ratecontrol import ProviderControl
+from price_monitor.rules import hoggax_12m_rows
+from price_monitor import ratecontrol, tracing
+
+
+HOGGAX_URL = "https://api.hoggax.com/cotizador/individuo/cotizar"
+
+MESES_TO_PLAZO = {24: 2, 36: 3}
+
+HEADERS = {
+    "content-type": "application/json",
+    "accept": "application/json, text/plain, */*",
+    "accept-encoding": "gzip, deflate",
+}
+
+TARGET_CUOTAS = {1, 3}  # lo que querés comparar
+
+# columnas de output/hoggax_rates_long.csv (lo lee compare_finaer_vs_hoggax_borders)
+HOGGAX_COLUMNS = [
+    "scenario_id",
+    "alquiler",
+    "expensas",
+    "alq_exp",
+    "meses",
+    "cuotas",
+    "plan_texto",
+    "plan_subtexto",
+    "hoggax_sin_desc",
+    "hoggax_total_web",
+    "hoggax_monto_cuota",
+]
+
+
+def _parse_int(x: Any) -> Optional[int]:
+    try:
+        if x is None:
+            return None
+        return int(float(x))
+    except Exception:
+        return None
+
+
+def _amount(x: Optional[float]) -> Optional[int]:
+    return None if x is None else int(x)
+
+
+def build_hoggax_payload(alquiler: int, expensas: int, meses: int) -> Dict[str, Any]:
+    plazo = MESES_TO_PLAZO.get(int(meses))
+    if plazo is None:
+        raise ValueError(f"Meses={meses} no está mapeado en MESES_TO_PLAZO.")
+
+    return {
+        "cotizacion": {
+            "alquiler": int(alquiler),
+            "expensas": int(expensas),
+            "plazo": plazo,
+            "discountRef": "",
+        },
+        "meta": {
+            "fuente": "Hoggax",
+            "medio": "Cotizador (nueva web)",
+            "esMobile": False,
+            "esRenovacion": False,
+        },
+    }
+
+
+def hoggax_payload_key(s: Mapping[str, Any]) -> str:
+    """
+    Key del request de un escenario (la misma que usa la ResponseCache).
+    Si el plazo no tiene request (ValueError) la key es el scenario_id: falla por su cuenta.
+    """
+    try:
+        payload = build_hoggax_payload(int(s["alquiler"]), int(s["expensas"]), int(s["meses"]))
+    except ValueError:
+        return f"hoggax:{s['scenario_id']}"
+    return payload_key("hoggax", payload)
+
+
+def rows_12m(s: Mapping[str, Any]) -> list[dict]:
+    """12 meses: regla fija (NO API), ver price_monitor.rules.hoggax_12m."""
+    return hoggax_12m_rows([s])
+
+
+def rows_from_response(data: dict, s: Mapping[str, Any]) -> list[dict]:
+    """Filas long (una por plan en TARGET_CUOTAS) desde la respuesta de la API (24/36 meses)."""
+    cot = (data.get("payload") or {}).get("cotizacion") or {}
+    lista = _parse_int(cot.get("importeRaw")) or _parse_int(cot.get("importe"))
+    facs = cot.get("facilidades_pago") or []
+    if lista is None or not isinstance(facs, list):
+        return []
+
+    alquiler = int(s["alquiler"])
+    expensas = int(s["expensas"])
+
+    rows = []
+    for f in facs:
+        texto = str(f.get("texto") or "")
+        sub = str(f.get("sub_texto") or "")
+        precio_texto = str(f.get("precio_texto") or "")
+        info = str(f.get("info_texto") or "")
+        importe = _parse_int(f.get("importe"))
+
+        # "15% OFF" -> 1 (contado), "3 CUOTAS sin interés" -> 3, "7,5% Adel. + 23 CUOTAS" -> 23 (no la queremos)
+        cuotas = parse_texto(texto).cuotas
+
+        if cuotas not in TARGET_CUOTAS:
+            continue
+
+        total = None
+        monto_cuota = None
+
+        # "Importe total: $ 1.413.747. CFT: 144.10%" / "Importe cuota: $ 324.999. CFT: 0.00%"
+        fields = parse_info(info)
+        if precio_texto.lower().startswith("precio"):
+            total = importe
+            monto_cuota = 0 if cuotas == 1 else _amount(fields.cuota)
+        else:
+            monto_cuota = importe
+            total = _amount(fields.total)
+            if total is None and monto_cuota is not None and cuotas is not None:
+                total = monto_cuota * cuotas
+
+        rows.append(
+            {
+                "scenario_id": str(s["scenario_id"]),
+                "alquiler": alquiler,
+                "expensas": expensas,
+                "alq_exp": alquiler + expensas,
+                "meses": int(s["meses"]),
+                "cuotas": cuotas,
+                "plan_texto": texto,
+                "plan_subtexto": sub,
+                "hoggax_sin_desc": lista,
+                "hoggax_total_web": total,
+                "hoggax_monto_cuota": monto_cuota,
+            }
+        )
+    return rows
+
+
+class HoggaxClient:
+    """
+    Cliente long-lived de Hoggax (pool de conexiones keep-alive, sync y async).
+    Con `coalesce` (default) los requests async idénticos en vuelo se hacen una sola vez.
+    """
+
+    def __init__(
+        self,
+        *,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_connections: int = 20,
+        http2: bool = False,
+        url: str = HOGGAX_URL,
+        cache: Optional[ResponseCache] = None,
+        transport: Optional[httpx.BaseTransport | httpx.AsyncBaseTransport] = None,
+        coalesce: bool = True,
+    ):
+        self.url = url
+        self.cache = cache
+        self.transport = transport
+        self.http2 = http2
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=30.0,
+        )
+        self._client: Optional[httpx.Client] = None
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self.coalescer: Optional[Coalescer[Dict[str, Any]]] = Coalescer() if coalesce else None
+
+    def _sync(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                headers=HEADERS,
+                transport=self.transport,  # type: ignore[arg-type]
+                event_hooks=tracing.event_hooks(async_=False),
+            )
+        return self._client
+
+    def _async(self) -> httpx.AsyncClient:
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                headers=HEADERS,
+                transport=self.transport,  # type: ignore[arg-type]
+                event_hooks=tracing.event_hooks(async_=True),
+            )
+        return self._aclient
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        r = self._sync().post(self.url, json=payload)
+        r.raise_for_status()
+        return r.json()
+
+    async def _apost(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with ratecontrol.network_call():
+            r = await self._async().post(self.url, json=payload)
+        r.raise_for_status()
+        return r.json()
+
+    def quote(self, alquiler: int, expensas: int, meses: int) -> Dict[str, Any]:
+        payload = build_hoggax_payload(alquiler, expensas, meses)
+        if self.cache is not None:
+            return self.cache.fetch("hoggax", payload, lambda: self._post(payload))
+        return self._post(payload)
+
+    async def aquote(self, alquiler: int, expensas: int, meses: int) -> Dict[str, Any]:
+        payload = build_hoggax_payload(alquiler, expensas, meses)
+
+        async def fetch() -> Dict[str, Any]:
+            if self.cache is not None:
+                return await self.cache.afetch("hoggax", payload, lambda: self._apost(payload))
+            return await self._apost(payload)
+
+        if self.coalescer is not None:
+            return await self.coalescer.run(payload_key("hoggax", payload), fetch)
+        return await fetch()
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+        self.close()
+
+    def __enter__(self) -> "HoggaxClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "HoggaxClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+
+async def crawl_hoggax(
+    scenarios: Iterable[Mapping[str, Any]],
+    *,
+    ts: str,
+    out_csv: Path,
+    out_jsonl: Optional[Path] = None,
+    raw_dir: Optional[Path] = None,
+    errors_jsonl: Optional[Path] = None,
+    client: Optional[HoggaxClient] = None,
+    control: Optional[ProviderControl] = None,
+    concurrency: int = 8,
+    rps: Optional[float] = 4.0,
+    append: bool = False,
+    on_done: Optional[Callable[[str], None]] = None,
+) -> EngineStats:
+    """
+    Cotiza los escenarios contra Hoggax en paralelo y escribe cada fila en
+    `out_csv` (y `out_jsonl`) apenas llega su cotización.
+    Los de 12 meses salen por regla fija, sin API.
+    Los escenarios con el mismo payload se cotizan con un solo request y el resultado
+    se reparte entre todos sus scenario_id.
+    Los escenarios que fallan (agotados los reintentos de `control`) van a `errors_jsonl`.
+    `append=True` sigue escribiendo sobre los archivos existentes (resume) y
+    `on_done(scenario_id)` se llama cuando un escenario quedó escrito.
+    """
+    if raw_dir is not None:
+        raw_dir.mkdir(parents=True, exist_ok=True)
+
+    own_client = client is None
+    client = client or HoggaxClient(max_connections=concurrency)
+
+    mode = "a" if append else "w"
+    csv_w = CsvWriter(out_csv, HOGGAX_COLUMNS, mode=mode)
+    jsonl_w = JsonlWriter(out_jsonl, mode=mode) if out_jsonl is not None else None
+    errors_w: Optional[JsonlWriter] = None
+
+    def emit(rows: list[dict]) -> None:
+        for row in rows:
+            csv_w.write(row)
+            if jsonl_w is not None:
+                jsonl_w.write({"ts_utc": ts, "competitor": "hoggax"} | row)
+
+    def done(s: Mapping[str, Any]) -> None:
+        if on_done is not None:
+            on_done(str(s["scenario_id"]))
+
+    rule_scenarios: list[Mapping[str, Any]] = []
+
+    def api_scenarios():
+        for s in scenarios:
+            if int(s["meses"]) == 12:
+                rule_scenarios.append(s)
+                continue
+            yield s
+
+    # un job por payload único: (key, escenarios que lo piden)
+    groups = group_by_key(api_scenarios(), hoggax_payload_key)
+
+    # 12 meses: todos juntos en una sola evaluación vectorizada
+    emit(hoggax_12m_rows(rule_scenarios))
+    for s in rule_scenarios:
+        done(s)
+    n_api = sum(len(members) for _, members in groups)
+    if n_api > len(groups):
+        print(f"Coalescing hoggax: {n_api} escenarios -> {len(groups)} requests únicos")
+
+    async def fetch(group: tuple[str, list]) -> dict:
+        s = group[1][0]
+        return await client.aquote(int(s["alquiler"]), int(s["expensas"]), int(s["meses"]))
+
+    def on_result(group: tuple[str, list], data: dict | None, err: BaseException | None) -> None:
+        for s in group[1]:
+            on_scenario(s, data, err)
+
+    def on_scenario(s: Mapping[str, Any], data: dict | None, err: BaseException | None) -> None:
+        nonlocal errors_w
+        if err is not None:
+            print(f"ERROR hoggax {s['scenario_id']}: {err}")
+            if errors_jsonl is not None:
+                errors_w = errors_w or JsonlWriter(errors_jsonl, mode=mode)
+                errors_w.write(
+                    {
+                        "ts_utc": ts,
+                        "competitor": "hoggax",
+                        "scenario_id": str(s["scenario_id"]),
+                        "scenario": {k: s[k] for k in ("alquiler", "expensas", "meses") if k in s},
+                        "error": f"{type(err).__name__}: {err}",
+                    }
+                )
+            return
+        if raw_dir is not None:
+            (raw_dir / f"{s['scenario_id']}.json").write_text(
+                json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+        with tracing.span("normalize", "hoggax"):
+            rows = rows_from_response(data or {}, s)
+        emit(rows)
+        done(s)
+        print(f"OK hoggax {s['scenario_id']} -> planes: {len(rows)}")
+
+    try:
+        stats = await run_jobs(
+            groups, fetch, concurrency=concurrency, rps=rps, on_result=on_result, control=control
+        )
+    finally:
+        csv_w.close()
+        if jsonl_w is not None:
+            jsonl_w.close()
+        if errors_w is not None:
+            errors_w.close()
+        if own_client:
+            await client.aclose()
+
+    print(f"Throughput hoggax: {stats.summary()}")
+    if control is not None:
+        print(f"Control: {control.summary()}")
+    return stats
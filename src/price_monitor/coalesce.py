@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Hashable, Iterable, TypeVar
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+K = TypeVar("K", bound=Hashable)
+
+
+def group_by_key(items: Iterable[T], key: Callable[[T], K]) -> list[tuple[K, list[T]]]:
+    """
+    Agrupa items con la misma key (ej: payload normalizado) respetando el orden de
+    primera aparición. Sirve para hacer un solo request por payload único y repartir
+    el resultado entre todos los escenarios que lo pidieron.
+    """
+    groups: dict[K, list[T]] = {}
+    for it in items:
+        groups.setdefault(key(it), []).append(it)
+    return list(groups.items())
+
+
+@dataclass
+class CoalesceStats:
+    calls: int = 0
+    joined: int = 0      # esperaron un request idéntico que ya estaba en vuelo
+    memo_hits: int = 0   # resueltos con un resultado reciente en memoria
+
+    @property
+    def saved(self) -> int:
+        return self.joined + self.memo_hits
+
+    def summary(self) -> str:
+        return f"calls={self.calls} coalescidos={self.saved} (en vuelo={self.joined}, memo={self.memo_hits})"
+
+
+class Coalescer(Generic[R]):
+    """
+    Coalescing de requests por key:
+    - si ya hay uno en vuelo con la misma key, se espera ese mismo resultado
+    - los últimos `memo_size` resultados OK quedan en memoria (LRU) para duplicados cercanos
+    (entre corridas lo cubre la ResponseCache, con la misma key).
+    """
+
+    def __init__(self, memo_size: int = 1024):
+        self.memo_size = memo_size
+        self.stats = CoalesceStats()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._memo: OrderedDict[Hashable, R] = OrderedDict()
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[R]]) -> R:
+        self.stats.calls += 1
+
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            self.stats.memo_hits += 1
+            return self._memo[key]
+
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.stats.joined += 1
+        else:
+            # el request corre en su propia task: si se cancela el que lo lanzó (o cualquier
+            # otro que espera), los demás siguen esperando el mismo resultado
+            fut = asyncio.ensure_future(self._fetch(key, fn))
+            fut.add_done_callback(_retrieve)
+            self._inflight[key] = fut
+        return await asyncio.shield(fut)
+
+    async def _fetch(self, key: Hashable, fn: Callable[[], Awaitable[R]]) -> R:
+        try:
+            res = await fn()
+        finally:
+            self._inflight.pop(key, None)
+        if self.memo_size > 0:
+            self._memo[key] = res
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return res
+
+
+def _retrieve(fut: asyncio.Future) -> None:
+    """Marca la excepción como leída si todos los que esperaban se cancelaron."""
+    if not fut.cancelled():
+        fut.exception()
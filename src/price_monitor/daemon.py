@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import heapq
+import json
+import math
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from price_monitor import providers
+from price_monitor.breakpoints import DEFAULT_OUT as BREAKPOINTS_JSON, load_breakpoints
+from price_monitor.cache import REFRESH, ResponseCache
+from price_monitor.io.files import JsonlWriter, repo_root, utc_stamp
+from price_monitor.ratecontrol import make_control
+from price_monitor.scenarios import load_scenario_records
+from price_monitor.scheduler import run_key, run_providers
+
+
+# Modo daemon: en vez de re-crawlear toda la grilla, cada ciclo gasta el presupuesto
+# (requests/hora) en los refrescos que más valen. Prioridad de un request único:
+#
+#   staleness * (vol_floor + volatilidad) * (1 + border_weight * cercanía_a_corte)
+#
+# - staleness: horas desde el último OK / target_age (nunca visto = infinito)
+# - volatilidad: EWMA de "cambió el precio" en cada refresco (0..1)
+# - cercanía: exp(-distancia relativa al corte más cercano / border_scale), ver breakpoints.json
+
+DEFAULT_STATE = Path("output") / "daemon_state.json"
+
+
+@dataclass
+class Entry:
+    """Estado de un request único (proveedor + payload); lo comparten los escenarios coalescidos."""
+
+    last_ok: Optional[float] = None
+    last_try: Optional[float] = None
+    totals: dict[str, float] = field(default_factory=dict)  # plan -> total_final del último OK
+    vol: float = 0.0
+    refreshes: int = 0
+    changes: int = 0
+    errors: int = 0
+
+
+@dataclass
+class Target:
+    provider: str
+    key: str
+    scenarios: list[dict]
+    border: float  # 0..1
+
+
+class DaemonState:
+    """daemon_state.json: una Entry por run_key(proveedor, payload_key). Se guarda de forma atómica."""
+
+    def __init__(self, path: Path, entries: Optional[dict[str, Entry]] = None):
+        self.path = path
+        self.entries: dict[str, Entry] = entries or {}
+
+    @classmethod
+    def load(cls, path: Path) -> "DaemonState":
+        if not path.exists():
+            return cls(path)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(path, {k: Entry(**v) for k, v in (data.get("entries") or {}).items()})
+
+    def get(self, key: str) -> Entry:
+        e = self.entries.get(key)
+        if e is None:
+            e = self.entries[key] = Entry()
+        return e
+
+    def save(self) -> None:
+        data = {
+            "updated": datetime.now(timezone.utc).isoformat(),
+            "entries": {k: asdict(e) for k, e in self.entries.items()},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+def _totals(quotes: list[dict]) -> dict[str, float]:
+    return {str(q.get("plan") or q.get("cuotas")): float(q["total_final"]) for q in quotes if q.get("total_final") is not None}
+
+
+def changed(old: dict[str, float], new: dict[str, float], rel_tol: float = 1e-4) -> bool:
+    if old.keys() != new.keys():
+        return True
+    return any(abs(new[k] - v) > rel_tol * max(abs(v), 1.0) for k, v in old.items())
+
+
+def record_ok(e: Entry, quotes: list[dict], now: float, alpha: float) -> bool:
+    """Actualiza la Entry con un refresco OK. Devuelve True si el precio cambió."""
+    new = _totals(quotes)
+    moved = False
+    if e.last_ok is not None:
+        moved = changed(e.totals, new)
+        e.vol = alpha * float(moved) + (1 - alpha) * e.vol
+        e.changes += moved
+    e.totals = new
+    e.last_ok = e.last_try = now
+    e.refreshes += 1
+    return moved
+
+
+def border_index(data: dict) -> dict[tuple[str, int], list[int]]:
+    """(proveedor, meses) -> alq_exp de los cortes conocidos, ordenados."""
+    out: dict[tuple[str, int], set[int]] = {}
+    for bp in data.get("breakpoints") or []:
+        out.setdefault((bp["provider"], int(bp["meses"])), set()).add(int(bp["alq_exp"]))
+    return {k: sorted(v) for k, v in out.items()}
+
+
+def border_closeness(cuts: list[int], alq_exp: int, scale: float) -> float:
+    """1 sobre un corte, ~0 lejos: exp(-|alq_exp - corte| / corte / scale)."""
+    if not cuts or scale <= 0:
+        return 0.0
+    d = min(abs(alq_exp - c) / c for c in cuts if c > 0)
+    return math.exp(-d / scale)
+
+
+def priority(
+    e: Entry,
+    border: float,
+    now: float,
+    *,
+    target_age: float,
+    vol_floor: float,
+    border_weight: float,
+) -> float:
+    boost = 1.0 + border_weight * border
+    if e.last_try is None:
+        return math.inf
+    # nunca OK (solo errores): se reintenta como si fuera muy volátil, pero envejeciendo desde el último intento
+    vol = e.vol if e.last_ok is not None else 1.0
+    staleness = max(0.0, now - e.last_try) / target_age
+    return staleness * (vol_floor + vol) * boost
+
+
+def build_targets(
+    selected: list[providers.Provider],
+    scenarios: list[dict],
+    cuts: dict[tuple[str, int], list[int]],
+    border_scale: float,
+) -> list[Target]:
+    """Un Target por request único de cada proveedor. Los escenarios locales (reglas) no gastan presupuesto y se omiten."""
+    targets: dict[tuple[str, str], Target] = {}
+    for p in selected:
+        for s in scenarios:
+            if p.is_local(s):
+                continue
+            k = (p.name, p.payload_key(s))
+            t = targets.get(k)
+            if t is None:
+                alq_exp = int(s["alquiler"]) + int(s["expensas"])
+                b = border_closeness(cuts.get((p.name, int(s["meses"])), []), alq_exp, border_scale)
+                t = targets[k] = Target(p.name, k[1], [], b)
+            t.scenarios.append(s)
+    return list(targets.values())
+
+
+def pick(targets: list[Target], state: DaemonState, n: int, now: float, **weights: float) -> list[Target]:
+    """Los `n` targets de mayor prioridad (heap); los nunca vistos primero, desempatando por cercanía a un corte."""
+    if n <= 0:
+        return []
+    return heapq.nlargest(
+        n,
+        targets,
+        key=lambda t: (priority(state.entries.get(run_key(t.provider, t.key)) or Entry(), t.border, now, **weights), t.border),
+    )
+
+
+class Budget:
+    """Token bucket en requests/hora: acumula como mucho `burst` requests sin gastar."""
+
+    def __init__(self, per_hour: float, burst: float):
+        self.rate = per_hour / 3600.0
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self._last = time.monotonic()
+
+    def available(self) -> int:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+        return int(self.tokens)
+
+    def spend(self, n: int) -> None:
+        self.tokens -= n
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="price-monitor daemon",
+        description="Refresca continuamente los escenarios de mayor valor dentro de un presupuesto de requests/hora",
+    )
+    p.add_argument("--provider", nargs="+", choices=providers.names() + ["all"], default=["all"])
+    p.add_argument("--scenarios", type=Path, default=None, help="CSV de escenarios (default: <repo>/data/scenarios.csv)")
+    p.add_argument("--out-dir", type=Path, default=None, help="carpeta de salida (default: <repo>/output)")
+    p.add_argument("--state", type=Path, default=None, help=f"estado del daemon (default: <repo>/{DEFAULT_STATE})")
+    p.add_argument("--breakpoints", type=Path, default=None, help=f"cortes conocidos (default: <repo>/{BREAKPOINTS_JSON})")
+    p.add_argument("--budget", type=float, default=600, help="requests por hora, todos los proveedores juntos (default: 600)")
+    p.add_argument("--interval", type=float, default=60, help="segundos entre ciclos (default: 60)")
+    p.add_argument("--cycles", type=int, default=0, help="cortar después de N ciclos; 0 = para siempre (default: 0)")
+    p.add_argument("--target-age", type=float, default=24, help="horas de antigüedad que valen staleness=1 (default: 24)")
+    p.add_argument("--vol-floor", type=float, default=0.1, help="volatilidad mínima: lo estable también envejece (default: 0.1)")
+    p.add_argument("--vol-alpha", type=float, default=0.3, help="peso del último refresco en la EWMA de volatilidad (default: 0.3)")
+    p.add_argument("--border-scale", type=float, default=0.02, help="distancia relativa a un corte que decae e^-1 (default: 0.02)")
+    p.add_argument("--border-weight", type=float, default=2.0, help="boost máximo por estar sobre un corte (default: 2)")
+    p.add_argument("--concurrency", type=int, default=8, help="requests en vuelo por proveedor (default: 8)")
+    p.add_argument("--rps", type=float, default=None, help="tope por segundo por proveedor (default: el de cada proveedor)")
+    p.add_argument("--no-cache", action="store_true", help="no guardar las respuestas en la cache")
+    return p.parse_args(argv)
+
+
+async def _loop(
+    args: argparse.Namespace,
+    selected: list[providers.Provider],
+    targets: list[Target],
+    state: DaemonState,
+    out_dir: Path,
+    cache: Optional[ResponseCache],
+) -> None:
+    weights = {"target_age": args.target_age * 3600, "vol_floor": args.vol_floor, "border_weight": args.border_weight}
+    budget = Budget(args.budget, burst=args.budget * args.interval / 3600)
+    controls = {p.name: make_control(p.name, max_concurrency=args.concurrency) for p in selected}
+
+    async with contextlib.AsyncExitStack() as stack:
+        clients = {}
+        for p in selected:
+            # sin coalesce: su memo devolvería la respuesta anterior en vez de refrescar (los targets ya son únicos)
+            client = p.client(max_connections=min(args.concurrency, p.max_concurrency), cache=cache, coalesce=False)
+            clients[p.name] = await stack.enter_async_context(client)
+
+        cycle = 0
+        while not args.cycles or cycle < args.cycles:
+            cycle += 1
+            now = time.time()
+            chosen = pick(targets, state, budget.available(), now, **weights)
+            if chosen:
+                budget.spend(len(chosen))
+                await _refresh(chosen, selected, clients, controls, state, out_dir, args)
+                state.save()
+            print(f"Ciclo {cycle}: {len(chosen)} requests, presupuesto restante {budget.tokens:.1f}")
+            if not args.cycles or cycle < args.cycles:
+                await asyncio.sleep(args.interval)
+
+
+async def _refresh(
+    chosen: list[Target],
+    selected: list[providers.Provider],
+    clients: dict[str, Any],
+    controls: dict,
+    state: DaemonState,
+    out_dir: Path,
+    args: argparse.Namespace,
+) -> None:
+    now = time.time()
+    day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    ts = utc_stamp()
+
+    # (proveedor, scenario_id) -> key del target: el primer registro de cada grupo actualiza su Entry
+    owner: dict[str, str] = {}
+    pending: dict[str, list[dict]] = {}
+    for t in chosen:
+        state.get(run_key(t.provider, t.key)).last_try = now
+        pending.setdefault(t.provider, []).extend(t.scenarios)
+        for s in t.scenarios:
+            owner[run_key(t.provider, s["scenario_id"])] = run_key(t.provider, t.key)
+
+    seen: set[str] = set()
+    moved = 0
+    with JsonlWriter(out_dir / f"daemon_{day}.jsonl", mode="a") as w, JsonlWriter(
+        out_dir / f"daemon_{day}.errors.jsonl", mode="a"
+    ) as we:
+
+        def emit(rec: dict) -> None:
+            nonlocal moved
+            w.write(rec)
+            k = owner[run_key(rec["competitor"], rec["scenario_id"])]
+            if k not in seen:
+                seen.add(k)
+                moved += record_ok(state.get(k), rec.get("quotes") or [], now, args.vol_alpha)
+
+        def emit_error(rec: dict) -> None:
+            we.write(rec)
+            k = owner[run_key(rec["competitor"], rec["scenario_id"])]
+            if k not in seen:
+                seen.add(k)
+                state.get(k).errors += 1
+
+        await run_providers(
+            [p for p in selected if p.name in pending],
+            pending,
+            ts=ts,
+            clients=clients,
+            emit=emit,
+            emit_error=emit_error,
+            controls=controls,
+            concurrency=args.concurrency,
+            rps=args.rps,
+        )
+    print(f"Refrescados {len(seen)} requests ({moved} con cambio de precio)")
+
+
+def main(argv: list[str] | None = None):
+    args = _parse_args(argv)
+    root = repo_root()
+
+    csv_path = args.scenarios or (root / "data" / "scenarios.csv")
+    if not csv_path.exists():
+        print(f"No existe {csv_path}")
+        return
+    scenarios = load_scenario_records(csv_path, only_run=True)
+    if not scenarios:
+        print(f"No hay escenarios con run=true en {csv_path}")
+        return
+
+    out_dir = args.out_dir or (root / "output")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    selected = providers.resolve(args.provider)
+
+    cuts = border_index(load_breakpoints(args.breakpoints or (root / BREAKPOINTS_JSON)))
+    targets = build_targets(selected, scenarios, cuts, args.border_scale)
+    state = DaemonState.load(args.state or (root / DEFAULT_STATE))
+    print(
+        f"Daemon: {len(scenarios)} escenarios -> {len(targets)} requests únicos, "
+        f"presupuesto {args.budget:g}/h (grilla completa cada {len(targets) / max(args.budget, 1e-9):.1f} h)"
+    )
+
+    # REFRESH: el daemon siempre va a la red, pero deja lo nuevo en la cache para el resto de los comandos
+    cache = None if args.no_cache else ResponseCache.default(mode=REFRESH)
+    try:
+        asyncio.run(_loop(args, selected, targets, state, out_dir, cache))
+    except KeyboardInterrupt:
+        print("Daemon detenido")
+    finally:
+        state.save()
+        print(f"Wrote state -> {state.path}")
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from functools import partial
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable, Optional, TypeVar
+
+from price_monitor import tracing
+
+if TYPE_CHECKING:
+    from price_monitor.ratecontrol import ProviderControl
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class RateLimiter:
+    """
+    Token bucket: como máximo `rps` requests por segundo, con ráfagas de hasta `burst`.
+    rps=None (o <= 0) desactiva el límite.
+    """
+
+    def __init__(self, rps: Optional[float], burst: int = 1):
+        self.rps = rps if rps and rps > 0 else None
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rps is None:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rps)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rps)
+
+
+@dataclass
+class EngineStats:
+    ok: int = 0
+    errors: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+    @property
+    def total(self) -> int:
+        return self.ok + self.errors
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished if self.finished is not None else time.monotonic()
+        return max(end - self.started, 1e-9)
+
+    @property
+    def throughput(self) -> float:
+        """Requests completados por segundo (ok + errores)."""
+        return self.total / self.elapsed
+
+    def summary(self) -> str:
+        return (
+            f"{self.total} requests ({self.ok} ok, {self.errors} errores) "
+            f"en {self.elapsed:.1f}s -> {self.throughput:.2f} req/s"
+        )
+
+
+ResultCallback = Callable[[T, Optional[R], Optional[BaseException]], None]
+
+
+async def run_jobs(
+    jobs: Iterable[T],
+    fetch: Callable[[T], Awaitable[R]],
+    *,
+    concurrency: int = 8,
+    rps: Optional[float] = None,
+    on_result: Optional[ResultCallback] = None,
+    control: Optional["ProviderControl"] = None,
+) -> EngineStats:
+    """
+    Ejecuta `fetch(job)` para cada job con a lo sumo `concurrency` en vuelo y
+    respetando `rps` requests por segundo.
+
+    Con `control` cada job pasa por sus reintentos/circuit breaker y, si tiene
+    AIMDController, la concurrencia real la decide el controller (con
+    `concurrency` como techo).
+
+    Los jobs se consumen de forma lazy (sirve con generadores grandes) y cada
+    resultado se entrega a `on_result(job, result, error)` apenas termina, en el
+    orden en que van llegando.
+    """
+    stats = EngineStats()
+    limiter = RateLimiter(rps)
+    it = iter(jobs)
+
+    async def acquire() -> None:
+        with tracing.span("rate_limit", "engine"):
+            await limiter.acquire()
+
+    # el token se espera antes de entrar al control: la espera propia del token bucket
+    # no cuenta como latencia del proveedor para el AIMDController
+    before = acquire if limiter.rps is not None else None
+
+    async def worker() -> None:
+        for job in it:
+            try:
+                if control is not None:
+                    res = await control.call(partial(fetch, job), before=before)
+                else:
+                    if before is not None:
+                        await before()
+                    res = await fetch(job)
+            except Exception as e:
+                stats.errors += 1
+                if on_result:
+                    on_result(job, None, e)
+                continue
+            stats.ok += 1
+            if on_result:
+                on_result(job, res, None)
+
+    workers = max(1, int(concurrency))
+    if control is not None and control.controller is not None:
+        workers = max(workers, control.controller.max_limit)
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    stats.finished = time.monotonic()
+    return stats
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+
+def fingerprint(raw: Any) -> str:
+    """sha256 del JSON canónico (claves ordenadas): misma respuesta -> mismo fingerprint."""
+    body = json.dumps(raw, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def changes_path(jsonl_path: Path) -> Path:
+    return jsonl_path.with_suffix(".changes.json")
+
+
+class FingerprintStore:
+    """
+    Último fingerprint conocido por key (run_key(proveedor, scenario_id)) y desde qué
+    corrida (`since`) la respuesta es la misma. Además lleva la cuenta de qué keys
+    cambiaron en la corrida actual, para avisarle a los reportes.
+    """
+
+    def __init__(self, path: Path, entries: Optional[dict[str, dict]] = None):
+        self.path = path
+        self.entries: dict[str, dict] = entries or {}
+        self.new: list[str] = []
+        self.changed: list[str] = []
+        self.unchanged: list[str] = []
+
+    @classmethod
+    def load(cls, path: Path) -> "FingerprintStore":
+        if not path.exists():
+            return cls(path)
+        return cls(path, json.loads(path.read_text(encoding="utf-8")).get("entries") or {})
+
+    def unchanged_since(self, key: str, fp: str) -> Optional[str]:
+        """Si `key` sigue con el mismo fingerprint, el ts desde el que está igual; si no, None."""
+        prev = self.entries.get(key)
+        if prev is not None and prev["fp"] == fp:
+            self.unchanged.append(key)
+            return prev["since"]
+        return None
+
+    def update(self, key: str, fp: str, ts: str) -> None:
+        """Fingerprint nuevo para `key` (solo después de normalizar y guardar OK)."""
+        (self.changed if key in self.entries else self.new).append(key)
+        self.entries[key] = {"fp": fp, "since": ts}
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.new or self.changed)
+
+    def summary(self) -> str:
+        return f"nuevos={len(self.new)} cambiados={len(self.changed)} sin cambios={len(self.unchanged)}"
+
+    def save(self) -> None:
+        data = {"updated": datetime.now(timezone.utc).isoformat(), "entries": self.entries}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def write_changes(self, path: Path, ts: str) -> None:
+        """Qué keys cambiaron en esta corrida (lo que los reportes tienen que rehacer)."""
+        data = {
+            "ts_utc": ts,
+            "new": sorted(self.new),
+            "changed": sorted(self.changed),
+            "unchanged": len(self.unchanged),
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+# lo que un unchanged_record toma del último registro completo de ese escenario
+RESOLVED_FIELDS = ("normalized", "quotes", "normalizer")
+
+
+def store_path(out_dir: Path, tag: str = "") -> Path:
+    """
+    fingerprints.json de una carpeta de output; cada shard (`tag` = sharding.shard_tag) tiene
+    el suyo: los procesos de una corrida shardeada no se pisan el archivo. Un escenario cae
+    siempre en el mismo shard para el mismo N, así que su historia sigue en el mismo store.
+    """
+    return out_dir / f"fingerprints{tag}.json"
+
+
+def _run_files(out_dir: Path, since: str) -> list[Path]:
+    """JSONL de la corrida `since`: <run>_<since>.jsonl y <run>_<since>_shard<i>of<N>.jsonl."""
+    paths = [*out_dir.glob(f"*_{since}.jsonl"), *out_dir.glob(f"*_{since}_shard*of*.jsonl")]
+    return sorted(p for p in paths if p.name.count(".") == 1)
+
+
+def _full_records(out_dir: Path, since: str, wanted: set[tuple[str, str]]) -> dict[tuple[str, str], dict]:
+    """Registros completos de la corrida `since` (y sus shards) en out_dir para `wanted`."""
+    found: dict[tuple[str, str], dict] = {}
+    for path in _run_files(out_dir, since):
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or not line.endswith("\n"):
+                    continue
+                rec = json.loads(line)
+                k = (rec.get("competitor"), rec.get("scenario_id"))
+                if k in wanted and rec.get("normalized") is not None and "unchanged_since" not in rec:
+                    found[k] = rec
+    return found
+
+
+def _read(path: Path) -> Iterator[dict]:
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            # una última línea cortada (corrida que murió) se ignora
+            if line.strip() and line.endswith("\n"):
+                yield json.loads(line)
+
+
+def resolved_records(jsonl_path: Path, records: Optional[Iterable[dict]] = None) -> Iterator[dict]:
+    """
+    Los registros de una corrida con cada unchanged_record completado con normalized/quotes
+    del registro completo de su corrida `unchanged_since` (misma carpeta). No se normaliza
+    nada: la respuesta es la misma que entonces, así que lo guardado sigue valiendo.
+    Los que no se encuentran (se borró esa corrida) quedan como están.
+
+    Todo lo que lee registros de output pasa por acá. `records`: los registros del archivo
+    ya leídos de otra forma (ej. validados); por default se leen de `jsonl_path`.
+    """
+    jsonl_path = Path(jsonl_path)
+    wanted: dict[str, set[tuple[str, str]]] = {}
+    with jsonl_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            # solo se parsean los stubs: en una corrida sin --skip-unchanged es una pasada de strings
+            if '"unchanged_since"' not in line or not line.endswith("\n"):
+                continue
+            rec = json.loads(line)
+            if "unchanged_since" in rec:
+                wanted.setdefault(rec["unchanged_since"], set()).add((rec["competitor"], rec["scenario_id"]))
+
+    if records is None:
+        records = _read(jsonl_path)
+    if not wanted:
+        yield from records
+        return
+
+    full: dict[tuple[str, str, str], dict] = {}
+    for since, keys in wanted.items():
+        for (comp, sid), rec in _full_records(jsonl_path.parent, since, keys).items():
+            full[(since, comp, sid)] = rec
+
+    missing = 0
+    for rec in records:
+        if "unchanged_since" in rec:
+            prev = full.get((rec["unchanged_since"], rec["competitor"], rec["scenario_id"]))
+            if prev is None:
+                missing += 1
+            else:
+                rec = rec | {k: prev[k] for k in RESOLVED_FIELDS if k in prev}
+        yield rec
+    if missing:
+        print(f"ERROR {jsonl_path.name}: {missing} registros sin cambios sin su registro completo (¿se borró la corrida?)")
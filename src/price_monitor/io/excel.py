@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
+from price_monitor import providers, rules
+from price_monitor.fingerprints import resolved_records
+
 
 def _to_float(x: Any):
     try:
@@ -18,87 +21,55 @@ def _to_float(x: Any):
 
 def jsonl_to_excel(jsonl_path: str | Path, xlsx_path: str | Path):
     rows = []
-
-    with open(jsonl_path, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            rec = json.loads(line)
-
-            ts = rec.get("ts_utc")
-            competitor = rec.get("competitor")
-            scenario_id = rec.get("scenario_id")
-            scenario = rec.get("scenario") or {}
-            alquiler = _to_float(scenario.get("alquiler")) or 0.0
-            expensas = _to_float(scenario.get("expensas")) or 0.0
-            meses = int(scenario.get("meses") or 0)
-            base_total = (alquiler + expensas) * meses if meses else None
-
-            norm = rec.get("normalized") or {}
-            planes = norm.get("planes") or []
-
-            # Finaer: tus claves actuales
-            # Hoggax: claves del normalize_hoggax
-            for p in planes:
-                row = {
-                    "ts": ts,
-                    "competitor": competitor,
-                    "scenario_id": scenario_id,
-                    "alquiler": alquiler,
-                    "expensas": expensas,
+    unknown: dict[str, int] = {}
+
+    # --skip-unchanged: los unchanged_record vienen con normalized/quotes de su última corrida completa
+    for rec in resolved_records(Path(jsonl_path)):
+        # cada proveedor sabe llevar sus registros al schema unificado (providers.QUOTE_FIELDS)
+        name = rec.get("competitor")
+        provider = providers.REGISTRY.get(name) if isinstance(name, str) else None
+        if provider is None:
+            unknown[str(name)] = unknown.get(str(name), 0) + 1
+            continue
+        quotes = provider.quotes_from_record(rec)
+        # texto libre del plan (Hoggax normalize_hoggax: "info"); las quotes salen 1 a 1 de los planes
+        planes = (rec.get("normalized") or {}).get("planes") or []
+        infos = [p.get("info") for p in planes] if len(planes) == len(quotes) else [None] * len(quotes)
+        for q, info in zip(quotes, infos):
+            meses = int(q.get("meses") or 0)
+            alq_exp = _to_float(q.get("alq_exp")) or 0.0
+            base_total = alq_exp * meses if meses else None
+            total_final = _to_float(q.get("total_final"))
+
+            rows.append(
+                {
+                    "ts": rec.get("ts_utc"),
+                    "competitor": q.get("competitor"),
+                    "scenario_id": q.get("scenario_id"),
+                    "alquiler": _to_float(q.get("alquiler")),
+                    "expensas": _to_float(q.get("expensas")),
                     "meses": meses,
-                    "alq_exp": alquiler + expensas,
+                    "alq_exp": alq_exp,
                     "base_total": base_total,
+                    "plan": q.get("plan"),
+                    "cuotas": q.get("cuotas"),
+                    "total_final": total_final,
+                    "monto_cuota": _to_float(q.get("monto_cuota")),
+                    "anticipo": _to_float(q.get("anticipo")),
+                    "honorario_sin_desc": _to_float(q.get("lista")),
+                    "desc_abs": _to_float(q.get("desc_abs")),
+                    "desc_pct": _to_float(q.get("desc_pct")),  # fracción
+                    "fecha_limite_desc": q.get("fecha_limite_desc"),
+                    "info": info,
+                    # fracción
+                    "pct_sobre_base": (total_final / base_total) if (total_final is not None and base_total) else None,
+                    "source": q.get("source"),
                 }
+            )
 
-                if competitor == "finaer":
-                    cuotas = int(p.get("cuotas") or 0)
-                    total_final = _to_float(p.get("monto_final"))
-                    monto_cuotas = _to_float(p.get("monto_cuotas"))
-                    anticipo = _to_float(p.get("anticipo"))
-
-                    honorario = _to_float(p.get("honorario_sin_descuentos"))
-                    desc_abs = _to_float(p.get("descuento_aplicado"))
-                    desc_pct = _to_float(p.get("pct_descuento_real"))  # fracción
-
-                    row |= {
-                        "plan": f"{cuotas} cuotas",
-                        "cuotas": cuotas,
-                        "total_final": total_final,
-                        "monto_cuota": monto_cuotas,
-                        "anticipo": anticipo,
-                        "honorario_sin_desc": honorario,
-                        "desc_abs": desc_abs,
-                        "desc_pct": desc_pct,
-                        "fecha_limite_desc": p.get("fecha_limite_descuento"),
-                    }
-
-                else:
-                    # Hoggax normalize_hoggax
-                    total_final = _to_float(p.get("total_final"))
-                    cuota = _to_float(p.get("cuota"))
-                    anticipo = _to_float(p.get("anticipo"))
-                    desc_abs = _to_float(p.get("desc_abs"))
-                    desc_pct = _to_float(p.get("desc_pct"))  # fracción
-
-                    row |= {
-                        "plan": p.get("metodo"),
-                        "cuotas": None,
-                        "total_final": total_final,
-                        "monto_cuota": cuota,
-                        "anticipo": anticipo,
-                        "honorario_sin_desc": None,
-                        "desc_abs": desc_abs,
-                        "desc_pct": desc_pct,
-                        "fecha_limite_desc": None,
-                        "info": p.get("info"),
-                    }
-
-                # métricas comunes
-                pct_sobre_base = (total_final / base_total) if (total_final is not None and base_total) else None
-                row["pct_sobre_base"] = pct_sobre_base  # fracción
-
-                rows.append(row)
+    if unknown:
+        names = ", ".join(f"{k} ({n})" for k, n in sorted(unknown.items()))
+        print(f"SKIP {sum(unknown.values())} registros de proveedores desconocidos en {Path(jsonl_path).name}: {names}")
 
     df = pd.DataFrame(rows)
 
@@ -109,15 +80,8 @@ def jsonl_to_excel(jsonl_path: str | Path, xlsx_path: str | Path):
 
         # hoja resumen simple por segmento/plazo/competidor (promedio)
         if not df.empty:
-            def seg(x):
-                if x <= 500_000:
-                    return "hasta 500k"
-                if x <= 800_000:
-                    return "500k-800k"
-                return "mayor_800k"
-
             df2 = df.copy()
-            df2["segmento"] = df2["alq_exp"].apply(seg)
+            df2["segmento"] = np.asarray(rules.segment_labels())[rules.segment_index(df2["alq_exp"])]
 
             # promedio por competitor/segmento/meses de pct_sobre_base y descuento
             piv = (
@@ -1,7 +1,23 @@
 from __future__ import annotations
+import csv
 import json
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import Sequence
+
+from price_monitor import tracing
+
+def repo_root() -> Path:
+    """
+    Busca el root del repo subiendo carpetas hasta encontrar pyproject.toml.
+    Funciona aunque el usuario ejecute desde cualquier cwd.
+    """
+    here = Path(__file__).resolve()
+    for p in [here] + list(here.parents):
+        if (p / "pyproject.toml").exists():
+            return p
+    # fallback: carpeta src/price_monitor/io -> subir 3 niveles
+    return Path(__file__).resolve().parents[3]
 
 def utc_stamp() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H%M%SZ")
@@ -11,3 +27,60 @@ def write_jsonl(path: Path, rows: list[dict]) -> None:
     with path.open("w", encoding="utf-8") as f:
         for r in rows:
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+class JsonlWriter:
+    """
+    Escribe un registro por línea y hace flush después de cada uno,
+    así un crash a mitad de corrida no pierde lo ya escrito.
+    """
+
+    def __init__(self, path: Path, mode: str = "w"):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._f = path.open(mode, encoding="utf-8")
+        self.count = 0
+
+    def write(self, row: dict) -> None:
+        with tracing.span("jsonl_write", "io"):
+            self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self._f.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class CsvWriter:
+    """Como JsonlWriter pero CSV con columnas fijas (header al abrir en modo "w")."""
+
+    def __init__(self, path: Path, fieldnames: Sequence[str], mode: str = "w"):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        write_header = mode == "w" or not path.exists() or path.stat().st_size == 0
+        self._f = path.open(mode, encoding="utf-8", newline="")
+        self._w = csv.DictWriter(self._f, fieldnames=list(fieldnames), extrasaction="ignore")
+        if write_header:
+            self._w.writeheader()
+            self._f.flush()
+        self.count = 0
+
+    def write(self, row: dict) -> None:
+        self._w.writerow(row)
+        self._f.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "CsvWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
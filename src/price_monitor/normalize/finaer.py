@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-from typing import Any, Optional
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from price_monitor import rules
 
 
 def _to_float(x: Any) -> Optional[float]:
@@ -37,6 +43,7 @@ def normalize_finaer(resp: dict) -> dict:
     base_mensual_alq_exp = alquiler + expensas
 
     planes = obj.get("posibles_planes_de_cuotas") or []
+    transfer_desc = rules.TRANSFER_DESC_PCT / 100.0  # fracción
 
     out_planes = []
     planes_raw = []
@@ -82,8 +89,8 @@ def normalize_finaer(resp: dict) -> dict:
         if monto_final is not None and denom_ae:
             pct_sobre_total_alq_exp = monto_final / denom_ae  # fracción
 
-        # ---- transferencia (regla negocio): 15% OFF SOLO en 1 pago
-        transfer_desc_pct = 0.15 if cuotas == 1 else 0.0  # fracción
+        # ---- transferencia (regla negocio, rules.TRANSFER_DESC_PCT): % OFF SOLO en 1 pago
+        transfer_desc_pct = transfer_desc if cuotas == 1 else 0.0  # fracción
         monto_final_transfer = (honorario * (1.0 - transfer_desc_pct)) if (honorario is not None and cuotas == 1) else monto_final
 
         out_planes.append(
@@ -115,3 +122,203 @@ def normalize_finaer(resp: dict) -> dict:
         "planes_raw": sorted(planes_raw, key=lambda x: x["cantidad_de_cuotas"]),
         "errors": (resp or {}).get("errors") or [],
     }
+
+
+# ---------------- batch (columnar) ----------------
+# Misma normalización que normalize_finaer, pero para muchas respuestas a la vez y en
+# columnas: un array por campo (NaN = sin dato) y los planes de todas las respuestas
+# concatenados, con `offsets` estilo Arrow (los planes de la respuesta i son
+# offsets[i]:offsets[i+1], ordenados por cuotas). Los derivados salen de una sola
+# pasada de NumPy; lo único en Python es sacar los campos de los dicts.
+
+PLAN_FIELDS = {
+    "cuotas": "cantidad_de_cuotas",
+    "monto_final": "monto_final",
+    "honorario_sin_descuentos": "honorario_sin_descuentos",
+    "descuento_aplicado": "descuento_aplicado",
+    "monto_cuotas": "monto_cuotas",
+    "anticipo": "anticipo",
+    "pct_descuento_aplicado_api": "porcentaje_de_descuento_aplicado",
+}
+
+
+def _floats(values: list) -> np.ndarray:
+    """Como _to_float elemento a elemento (None / "" / basura -> NaN), con camino rápido si todo es numérico."""
+    try:
+        a = np.asarray(values, dtype=np.float64)
+        if a.ndim == 1:
+            return a
+    except (TypeError, ValueError):
+        pass
+    return np.array([np.nan if (v := _to_float(x)) is None else v for x in values], dtype=np.float64)
+
+
+def _ints(values: list) -> np.ndarray:
+    """Como `_to_int(x) or 0`."""
+    f = np.trunc(_floats(values))
+    return np.where(np.isfinite(f), f, 0).astype(np.int64)
+
+
+def _nullable(a: np.ndarray) -> list:
+    """Array float -> lista con None donde hay NaN (para los dicts del JSONL)."""
+    out = a.tolist()
+    if np.isnan(a).any():
+        return [None if x != x else x for x in out]
+    return out
+
+
+@dataclass
+class FinaerBatch:
+    # por respuesta
+    alquiler: np.ndarray
+    expensas: np.ndarray
+    meses: np.ndarray
+    porcentaje_descuento_mercadopago: np.ndarray
+    errors: list[list]
+    offsets: np.ndarray
+    # por plan (len = offsets[-1])
+    plans: dict[str, np.ndarray]
+    fecha_limite_descuento: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def alq_exp(self) -> np.ndarray:
+        return self.alquiler + self.expensas
+
+    @property
+    def plan_response(self) -> np.ndarray:
+        """Índice de respuesta de cada plan."""
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def planes_frame(self) -> pd.DataFrame:
+        """Un DataFrame de planes (columna `resp` = índice de respuesta) con base y derivados."""
+        r = self.plan_response
+        df = pd.DataFrame({"resp": r, "alquiler": self.alquiler[r], "expensas": self.expensas[r], "meses": self.meses[r]})
+        for k, v in self.plans.items():
+            df[k] = v
+        df["fecha_limite_descuento"] = self.fecha_limite_descuento
+        return df
+
+    def records(self) -> list[dict]:
+        """Los mismos dicts que normalize_finaer, respuesta por respuesta."""
+        cols = {k: (v.tolist() if v.dtype.kind == "i" else _nullable(v)) for k, v in self.plans.items()}
+        fechas = self.fecha_limite_descuento.tolist()
+        alq, exp, ae = self.alquiler.tolist(), self.expensas.tolist(), self.alq_exp.tolist()
+        meses = self.meses.tolist()
+        mp = _nullable(self.porcentaje_descuento_mercadopago)
+        offsets = self.offsets.tolist()
+
+        out = []
+        for i in range(len(self)):
+            planes, planes_raw = [], []
+            for j in range(offsets[i], offsets[i + 1]):
+                planes_raw.append(
+                    {
+                        "monto_cuotas": cols["monto_cuotas"][j],
+                        "monto_final": cols["monto_final"][j],
+                        "honorario_sin_descuentos": cols["honorario_sin_descuentos"][j],
+                        "porcentaje_de_descuento_aplicado": cols["pct_descuento_aplicado_api"][j],
+                        "descuento_aplicado": cols["descuento_aplicado"][j],
+                        "cantidad_de_cuotas": cols["cuotas"][j],
+                        "anticipo": cols["anticipo"][j],
+                        "fecha_limite_descuento": fechas[j],
+                    }
+                )
+                planes.append(
+                    {
+                        "cuotas": cols["cuotas"][j],
+                        "monto_final": cols["monto_final"][j],
+                        "monto_final_transfer": cols["monto_final_transfer"][j],
+                        "transfer_desc_pct": cols["transfer_desc_pct"][j],
+                        "monto_cuotas": cols["monto_cuotas"][j],
+                        "anticipo": cols["anticipo"][j],
+                        "honorario_sin_descuentos": cols["honorario_sin_descuentos"][j],
+                        "descuento_aplicado": cols["descuento_aplicado"][j],
+                        "pct_descuento_aplicado_api": cols["pct_descuento_aplicado_api"][j],
+                        "pct_descuento_real": cols["pct_descuento_real"][j],
+                        "fecha_limite_descuento": fechas[j],
+                        "costo_mensual_equiv": cols["costo_mensual_equiv"][j],
+                        "pct_sobre_total_alquiler": cols["pct_sobre_total_alquiler"][j],
+                        "pct_sobre_total_alq_exp": cols["pct_sobre_total_alq_exp"][j],
+                    }
+                )
+            out.append(
+                {
+                    "alquiler": alq[i],
+                    "expensas": exp[i],
+                    "alq_exp": ae[i],
+                    "meses": meses[i],
+                    "porcentaje_descuento_mercadopago": mp[i],
+                    "planes": planes,
+                    "planes_raw": planes_raw,
+                    "errors": self.errors[i],
+                }
+            )
+        return out
+
+
+def normalize_finaer_batch(responses: Sequence[dict]) -> FinaerBatch:
+    """normalize_finaer para muchas respuestas: columnas NumPy + offsets de planes (ver FinaerBatch)."""
+    objs = [(r or {}).get("object") or {} for r in responses]
+    alquiler = np.nan_to_num(_floats([o.get("alquiler") for o in objs]), nan=0.0)
+    expensas = np.nan_to_num(_floats([o.get("expensas") for o in objs]), nan=0.0)
+    meses = _ints([o.get("duracion_del_contrato_en_meses") for o in objs])
+    mp = _floats([o.get("porcentaje_descuento_mercadopago") for o in objs])
+    errors = [(r or {}).get("errors") or [] for r in responses]
+
+    planes = [o.get("posibles_planes_de_cuotas") or [] for o in objs]
+    counts = np.fromiter((len(p) for p in planes), dtype=np.int64, count=len(planes))
+    offsets = np.zeros(len(planes) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    flat = [p for ps in planes for p in ps]
+
+    cols = {k: _floats([p.get(src) for p in flat]) for k, src in PLAN_FIELDS.items() if k != "cuotas"}
+    cuotas = _ints([p.get("cantidad_de_cuotas") for p in flat])
+    fechas = np.array([p.get("fecha_limite_descuento") for p in flat], dtype=object)
+
+    # planes de cada respuesta ordenados por cuotas (estable, como sorted())
+    resp = np.repeat(np.arange(len(planes)), counts)
+    order = np.lexsort((cuotas, resp))
+    cuotas = cuotas[order]
+    cols = {k: v[order] for k, v in cols.items()}
+    fechas = fechas[order]
+
+    # ---- derivados, vectorizados
+    m = meses[resp].astype(np.float64)
+    monto = cols["monto_final"]
+    honorario = cols["honorario_sin_descuentos"]
+    descuento = cols["descuento_aplicado"]
+    denom_alq = alquiler[resp] * m
+    denom_ae = (alquiler + expensas)[resp] * m
+    uno = cuotas == 1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        costo = np.where(m != 0, monto / m, np.nan)
+        pct_real = np.where((honorario > 0) & ~np.isnan(descuento), descuento / honorario, np.nan)
+        pct_alq = np.where(denom_alq != 0, monto / denom_alq, np.nan)
+        pct_ae = np.where(denom_ae != 0, monto / denom_ae, np.nan)
+    transfer_desc = rules.TRANSFER_DESC_PCT / 100.0
+    transfer_pct = np.where(uno, transfer_desc, 0.0)
+    monto_transfer = np.where(uno & ~np.isnan(honorario), honorario * (1.0 - transfer_desc), monto)
+
+    plans = {"cuotas": cuotas, **cols}
+    plans |= {
+        "monto_final_transfer": monto_transfer,
+        "transfer_desc_pct": transfer_pct,
+        "pct_descuento_real": pct_real,
+        "costo_mensual_equiv": costo,
+        "pct_sobre_total_alquiler": pct_alq,
+        "pct_sobre_total_alq_exp": pct_ae,
+    }
+    return FinaerBatch(
+        alquiler=alquiler,
+        expensas=expensas,
+        meses=meses,
+        porcentaje_descuento_mercadopago=mp,
+        errors=errors,
+        offsets=offsets,
+        plans=plans,
+        fecha_limite_descuento=fechas,
+    )
@@ -1,64 +1,97 @@
 from __future__ import annotations
 
 import re
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Optional
 
 
-_money_re = re.compile(r"\$?\s*([\d\.\,]+)")
-_pct_re = re.compile(r"(\d+(?:[\,\.]\d+)?)\s*%")
+# Tokenizer de los textos de Hoggax: cada texto se recorre una sola vez con una regex
+# compilada y sale con todos sus campos. Los mismos textos ("15% OFF", "Importe total:
+# $ 1.413.747. CFT: ...") se repiten entre escenarios, así que el resultado se memoiza
+# (LRU acotado). Lo usan normalize_hoggax y price_monitor.clients.hoggax.
 
-def _parse_money(s: str) -> Optional[float]:
-    if not s:
-        return None
-    m = _money_re.search(s)
-    if not m:
-        return None
-    raw = m.group(1).replace(".", "").replace(",", ".")
-    try:
-        return float(raw)
-    except Exception:
-        return None
+TEXT_CACHE_SIZE = 4096
 
-def _parse_pct_from_text(s: str) -> Optional[float]:
-    if not s:
-        return None
-    m = _pct_re.search(s)
-    if not m:
+# info_texto: "<etiqueta> ... <monto>" o un monto suelto. El monto de una etiqueta va en
+# un lookahead (opcional): no se consume, así dos etiquetas seguidas ven el mismo monto
+# (como con split) y una etiqueta sin monto igual queda registrada.
+_INFO_RE = re.compile(
+    r"(?P<label>Importe total:|Importe cuota:|Adelanto:|Te ahorr)(?:(?=[^\d\.\,]*(?P<amount>[\d\.\,]+))|)"
+    r"|(?P<money>[\d\.\,]+)"
+)
+_INFO_FIELDS = {"Importe total:": "total", "Importe cuota:": "cuota", "Adelanto:": "anticipo", "Te ahorr": "ahorro"}
+
+# texto del plan: "15% OFF", "3 CUOTAS sin interés", "7,5% Adel. + 23 CUOTAS"
+_TEXTO_RE = re.compile(
+    r"(?P<pct>\d+(?:[\,\.]\d+)?)\s*%|(?P<cuotas>\d+)\s*cuot|(?P<contado>transferencia|off)",
+    re.IGNORECASE,
+)
+
+
+def _money(raw: Optional[str]) -> Optional[float]:
+    """ "1.413.747" -> 1413747.0, "1.234,5" -> 1234.5 (punto de miles, coma decimal)."""
+    if not raw:
         return None
-    raw = m.group(1).replace(",", ".")
     try:
-        return float(raw) / 100.0
-    except Exception:
+        return float(raw.replace(".", "").replace(",", "."))
+    except ValueError:
         return None
 
-def _extract_total_from_info(info: str) -> Optional[float]:
-    # Busca "Importe total: $ X"
-    if not info:
-        return None
-    # separa por frases comunes
-    # preferir el que sigue a "Importe total:"
-    parts = info.split("Importe total:")
-    if len(parts) >= 2:
-        return _parse_money(parts[1])
-    # fallback: primer monto que aparezca
-    return _parse_money(info)
-
-def _extract_anticipo_from_info(info: str) -> Optional[float]:
-    if not info:
-        return None
-    parts = info.split("Adelanto:")
-    if len(parts) >= 2:
-        return _parse_money(parts[1])
-    return None
 
-def _extract_desc_abs_from_info(info: str) -> Optional[float]:
-    # "Te ahorrás $ X"
+@dataclass(frozen=True)
+class InfoFields:
+    total: Optional[float] = None  # "Importe total: $ X"
+    cuota: Optional[float] = None  # "Importe cuota: $ X"
+    anticipo: Optional[float] = None  # "Adelanto: $ X"
+    ahorro: Optional[float] = None  # "Te ahorrás $ X"
+    first_money: Optional[float] = None  # primer monto del texto (fallback del total)
+    has_total: bool = False  # aparece "Importe total:" (aunque sin monto)
+
+
+@dataclass(frozen=True)
+class TextoFields:
+    desc_pct: Optional[float] = None  # fracción: "15% OFF" -> 0.15
+    cuotas: Optional[int] = None  # 1 si es contado (transferencia / OFF)
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def parse_info(info: str) -> InfoFields:
     if not info:
-        return None
-    parts = info.split("Te ahorr")
-    if len(parts) >= 2:
-        return _parse_money(parts[1])
-    return None
+        return InfoFields()
+    found: dict[str, Optional[float]] = {}
+    first_money: Optional[str] = None
+    for m in _INFO_RE.finditer(info):
+        label = m.group("label")
+        if label is None:
+            if first_money is None:
+                first_money = m.group("money")
+            continue
+        # la primera aparición de cada etiqueta manda
+        field = _INFO_FIELDS[label]
+        if field not in found:
+            found[field] = _money(m.group("amount"))
+    return InfoFields(first_money=_money(first_money), has_total="total" in found, **found)
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def parse_texto(texto: str) -> TextoFields:
+    if not texto:
+        return TextoFields()
+    pct: Optional[float] = None
+    cuotas: Optional[int] = None
+    contado = False
+    for m in _TEXTO_RE.finditer(texto):
+        if m.group("pct") is not None:
+            if pct is None:
+                pct = float(m.group("pct").replace(",", ".")) / 100.0
+        elif m.group("cuotas") is not None:
+            if cuotas is None:
+                cuotas = int(m.group("cuotas"))
+        else:
+            contado = True
+    # transferencia / OFF: un solo pago, aunque el texto mencione cuotas
+    return TextoFields(desc_pct=pct, cuotas=1 if contado else cuotas)
 
 
 def normalize_hoggax(resp: dict) -> dict:
@@ -78,9 +111,11 @@ def normalize_hoggax(resp: dict) -> dict:
         info = str(pm.get("infoTexto") or "")
         importe = float(pm.get("importe") or 0)
 
+        fields = parse_info(info)
+
         # detectar descuento %
-        desc_pct = _parse_pct_from_text(texto)
-        desc_abs = _extract_desc_abs_from_info(info)
+        desc_pct = parse_texto(texto).desc_pct
+        desc_abs = fields.ahorro
 
         # total_final:
         # - si precioTexto == "Precio FINAL": importe es total
@@ -91,10 +126,11 @@ def normalize_hoggax(resp: dict) -> dict:
         if precio_texto.lower().strip() == "precio final":
             total_final = importe
         else:
-            total_final = _extract_total_from_info(info)
+            # preferir el que sigue a "Importe total:"; si no hay, el primer monto que aparezca
+            total_final = fields.total if fields.has_total else fields.first_money
             cuota = importe if importe else None
 
-        anticipo = _extract_anticipo_from_info(info)
+        anticipo = fields.anticipo
 
         # Si tengo desc_pct pero no desc_abs, lo calculo desde total
         if desc_pct is not None and total_final:
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence, Union
+
+from price_monitor import tracing
+
+
+# Runner de pipeline estilo make: cada Stage declara qué lee (inputs) y qué escribe
+# (outputs). Las dependencias salen solas (un input que matchea el output de otra
+# stage), las stages independientes corren en paralelo y una stage cuyos inputs
+# tienen el mismo hash que en la corrida anterior (y con outputs presentes) se saltea.
+#
+# Un output glob (ej. output/finaer_*.xlsx, un archivo por corrida) se resuelve al
+# terminar la stage al archivo más nuevo que matchee y queda guardado en el estado: las
+# stages que lo leen hashean solo ese archivo, no toda la historia que matchea el glob.
+
+Command = Union[Sequence[str], Callable[[], object]]
+
+DEFAULT_STATE = Path("output") / ".pipeline_state.json"
+
+
+@dataclass
+class Stage:
+    """
+    `cmd`: argv (subproceso, con cwd=root) o una función Python (corre en un thread).
+    `inputs` / `outputs`: paths o globs relativos al root. Un output glob es "el archivo
+    más nuevo que matchee" al terminar la stage (lo que escribió esta corrida).
+    `after`: dependencias explícitas además de las que salen de inputs/outputs.
+    """
+
+    name: str
+    cmd: Command
+    inputs: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+    after: list[str] = field(default_factory=list)
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str  # "ok" | "skip" | "error" | "blocked"
+    seconds: float = 0.0
+    output: str = ""
+
+
+def _files(root: Path, patterns: Iterable[str]) -> list[Path]:
+    out: set[Path] = set()
+    for pat in patterns:
+        if _is_glob(pat):
+            out.update(p for p in root.glob(pat) if p.is_file())
+        elif (root / pat).is_file():
+            out.add(root / pat)
+    return sorted(out)
+
+
+def _is_glob(pattern: str) -> bool:
+    return any(ch in pattern for ch in "*?[")
+
+
+def _newest(root: Path, pattern: str) -> list[Path]:
+    files = _files(root, [pattern])
+    return [max(files, key=lambda p: p.stat().st_mtime)] if files else []
+
+
+def _file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def inputs_hash(stage: Stage, root: Path, resolve: Optional[Callable[[str], list[Path]]] = None) -> str:
+    """
+    Hash del contenido de los inputs (y del comando): si no cambia, la stage no tiene nada
+    nuevo que hacer. `resolve(pattern)` -> archivos de ese input (default: todo lo que matchea).
+    """
+    h = hashlib.sha256()
+    cmd = stage.cmd if not callable(stage.cmd) else f"{stage.cmd.__module__}.{stage.cmd.__qualname__}"
+    h.update(json.dumps(cmd, default=str).encode("utf-8"))
+    for pat in stage.inputs:
+        h.update(f"\0{pat}".encode("utf-8"))
+        for p in (resolve or (lambda x: _files(root, [x])))(pat):
+            h.update(f"\0{p.relative_to(root).as_posix()}\0{_file_hash(p)}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _matches(pattern: str, other: str) -> bool:
+    """¿Un input `pattern` puede leer lo que escribe el output `other`? (mismo path o glob que lo cubre)."""
+    if pattern == other:
+        return True
+    return Path(other).match(pattern) or Path(pattern).match(other)
+
+
+def dependencies(stages: Sequence[Stage]) -> dict[str, set[str]]:
+    names = {s.name for s in stages}
+    deps: dict[str, set[str]] = {}
+    for s in stages:
+        d = {x for x in s.after}
+        unknown = d - names
+        if unknown:
+            raise ValueError(f"Stage {s.name}: dependencias desconocidas {sorted(unknown)}")
+        for o in stages:
+            if o is not s and any(_matches(i, out) for i in s.inputs for out in o.outputs):
+                d.add(o.name)
+        deps[s.name] = d
+
+    # ciclos
+    done: set[str] = set()
+    while len(done) < len(deps):
+        ready = [n for n, d in deps.items() if n not in done and d <= done]
+        if not ready:
+            raise ValueError(f"Ciclo entre stages: {sorted(set(deps) - done)}")
+        done.update(ready)
+    return deps
+
+
+class Pipeline:
+    def __init__(self, stages: Sequence[Stage], root: Path, state_path: Optional[Path] = None):
+        self.stages = {s.name: s for s in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Nombres de stage repetidos")
+        self.root = root
+        self.deps = dependencies(stages)
+        self.state_path = state_path or (root / DEFAULT_STATE)
+        self.state: dict[str, str] = {}
+        # stage -> {output glob: [archivo de su última corrida]} (relativos al root)
+        self.produced: dict[str, dict[str, list[str]]] = {}
+        if self.state_path.exists():
+            data = json.loads(self.state_path.read_text(encoding="utf-8"))
+            self.state = data.get("stages") or {}
+            self.produced = data.get("outputs") or {}
+
+    def _save_state(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"stages": self.state, "outputs": self.produced}, indent=2), encoding="utf-8")
+        tmp.replace(self.state_path)
+
+    def _output_files(self, stage: Stage, pattern: str) -> list[Path]:
+        """
+        Archivos de un output: para un glob, los de la última corrida de la stage (si existen;
+        sin nada guardado, p.ej. un estado de antes de esto, el más nuevo que matchee).
+        """
+        if not _is_glob(pattern):
+            return _files(self.root, [pattern])
+        recorded = (self.produced.get(stage.name) or {}).get(pattern)
+        if recorded is None:
+            return _newest(self.root, pattern)
+        return [self.root / f for f in recorded if (self.root / f).is_file()]
+
+    def _input_files(self, pattern: str) -> list[Path]:
+        """Un input que lee un output glob de otra stage: solo lo que escribió su última corrida."""
+        if _is_glob(pattern):
+            for o in self.stages.values():
+                for out in o.outputs:
+                    if _is_glob(out) and _matches(pattern, out):
+                        return [p for p in self._output_files(o, out) if p.relative_to(self.root).match(pattern)]
+        return _files(self.root, [pattern])
+
+    def _record_outputs(self, stage: Stage) -> None:
+        globs = [o for o in stage.outputs if _is_glob(o)]
+        self.produced[stage.name] = {
+            o: [p.relative_to(self.root).as_posix() for p in _newest(self.root, o)] for o in globs
+        }
+
+    def up_to_date(self, stage: Stage, h: str) -> bool:
+        outputs_ok = all(self._output_files(stage, o) for o in stage.outputs)
+        return self.state.get(stage.name) == h and outputs_ok
+
+    async def _exec(self, stage: Stage) -> tuple[bool, str]:
+        if callable(stage.cmd):
+            try:
+                await asyncio.to_thread(stage.cmd)
+                return True, ""
+            except Exception as e:
+                return False, f"{type(e).__name__}: {e}"
+
+        # con traza activa, cada subproceso traza a su archivo y al final se suma a la del pipeline
+        tracer = tracing.active()
+        env = None
+        child_trace = None
+        if tracer is not None and tracer.path is not None:
+            child_trace = tracer.path.with_name(f"{tracer.path.stem}.{stage.name}.json")
+            env = os.environ | {tracing.ENV_VAR: str(child_trace)}
+
+        proc = await asyncio.create_subprocess_exec(
+            *stage.cmd,
+            cwd=self.root,
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        out, _ = await proc.communicate()
+
+        if child_trace is not None and child_trace.exists():
+            tracer.extend(json.loads(child_trace.read_text(encoding="utf-8")).get("traceEvents") or [])
+            child_trace.unlink()
+        return proc.returncode == 0, out.decode("utf-8", errors="replace")
+
+    async def _run_stage(self, stage: Stage, force: bool, dry_run: bool) -> StageResult:
+        # el hash se calcula recién acá: con las dependencias ya terminadas
+        h = inputs_hash(stage, self.root, self._input_files)
+        if not force and self.up_to_date(stage, h):
+            return StageResult(stage.name, "skip")
+        if dry_run:
+            return StageResult(stage.name, "ok", output="(dry-run)")
+
+        t0 = time.perf_counter()
+        with tracing.span(stage.name, "stage"):
+            ok, output = await self._exec(stage)
+        if ok:
+            self.state[stage.name] = h
+            self._record_outputs(stage)
+            self._save_state()
+        return StageResult(stage.name, "ok" if ok else "error", time.perf_counter() - t0, output)
+
+    async def run(
+        self,
+        *,
+        force: Iterable[str] = (),
+        jobs: int = 4,
+        dry_run: bool = False,
+        on_result: Optional[Callable[[StageResult], None]] = None,
+    ) -> dict[str, StageResult]:
+        """
+        Corre la DAG: cada stage arranca apenas terminan sus dependencias (hasta `jobs` a la vez).
+        `force`: nombres de stages a correr igual ("all" = todas). Si una stage falla, las que
+        dependen de ella quedan "blocked".
+        """
+        force = set(force)
+        sem = asyncio.Semaphore(max(1, jobs))
+        results: dict[str, StageResult] = {}
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_one(name: str) -> StageResult:
+            for d in self.deps[name]:
+                await tasks[d]
+            if any(results[d].status in ("error", "blocked") for d in self.deps[name]):
+                res = StageResult(name, "blocked")
+            else:
+                # si alguna dependencia corrió de verdad, el hash de inputs lo va a notar
+                async with sem:
+                    res = await self._run_stage(self.stages[name], "all" in force or name in force, dry_run)
+            results[name] = res
+            if on_result is not None:
+                on_result(res)
+            return res
+
+        for name in self.stages:
+            tasks[name] = asyncio.ensure_future(run_one(name))
+        await asyncio.gather(*tasks.values())
+        return {n: results[n] for n in self.stages}
+
+
+def print_result(res: StageResult) -> None:
+    if res.status == "skip":
+        print(f"SKIP {res.name}: inputs sin cambios")
+        return
+    if res.status == "blocked":
+        print(f"BLOCKED {res.name}: falló una dependencia")
+        return
+    print(f"\n>> {res.name} ({res.status}, {res.seconds:.1f}s)")
+    if res.output:
+        print(res.output.rstrip())
+
+
+def python(*args: str) -> list[str]:
+    """argv para correr algo con el mismo intérprete."""
+    return [sys.executable, *args]
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+import httpx
+
+from price_monitor.cache import ResponseCache
+from price_monitor.clients.finaer import FinaerClient, finaer_payload_key
+from price_monitor.clients.hoggax import HoggaxClient, hoggax_payload_key, rows_from_response
+from price_monitor.normalize.finaer import normalize_finaer, normalize_finaer_batch
+from price_monitor.records import validate_raw, validate_raws
+from price_monitor.rules import hoggax_12m_rows, rules_hash
+
+
+# Schema unificado: una Quote por (escenario, proveedor, plan). Todos los proveedores
+# devuelven exactamente estas claves (None si no aplica).
+QUOTE_FIELDS = [
+    "competitor",
+    "scenario_id",
+    "alquiler",
+    "expensas",
+    "alq_exp",
+    "meses",
+    "cuotas",
+    "plan",
+    "lista",          # precio sin descuentos
+    "total_final",
+    "monto_cuota",
+    "anticipo",
+    "desc_abs",
+    "desc_pct",       # fracción
+    "fecha_limite_desc",
+    "source",         # "api" | "regla"
+]
+
+
+def _num(x: Any) -> Optional[float]:
+    try:
+        return None if x is None else float(x)
+    except (TypeError, ValueError):
+        return None
+
+
+def make_quote(competitor: str, s: Mapping[str, Any], **fields: Any) -> dict:
+    alquiler = int(s["alquiler"])
+    expensas = int(s.get("expensas") or 0)
+    q = dict.fromkeys(QUOTE_FIELDS)
+    q |= {
+        "competitor": competitor,
+        "scenario_id": str(s["scenario_id"]),
+        "alquiler": alquiler,
+        "expensas": expensas,
+        "alq_exp": alquiler + expensas,
+        "meses": int(s["meses"]),
+        "source": "api",
+    }
+    q |= fields
+    lista, total = _num(q["lista"]), _num(q["total_final"])
+    if q["desc_abs"] is None and lista is not None and total is not None:
+        q["desc_abs"] = lista - total
+    if q["desc_pct"] is None and q["desc_abs"] is not None and lista:
+        q["desc_pct"] = q["desc_abs"] / lista
+    return q
+
+
+class Provider:
+    """
+    Un competidor: cómo armar la key del request, el cliente HTTP, cómo cotizar
+    un escenario y cómo llevar la respuesta al schema unificado (QUOTE_FIELDS).
+    `rps` / `max_concurrency` son los límites propios del proveedor.
+
+    `normalizer_version` se sube a mano cuando cambia el código de normalize /
+    local_records; `rules` son las constantes de price_monitor.rules que usan. Las dos
+    cosas forman normalizer_id(), que queda en cada registro y es la key de
+    `price-monitor renormalize`.
+    """
+
+    name: str = ""
+    rps: Optional[float] = 4.0
+    max_concurrency: int = 32
+    normalizer_version: int = 1
+    rules: tuple[str, ...] = ()
+    # True si normalize() usa el escenario (no solo el raw): entra en la key del cache
+    normalize_uses_scenario: bool = False
+
+    def normalizer_id(self) -> str:
+        """ "finaer/v1/c5d08099b6f0": versión del normalizador + hash de las reglas que usa."""
+        return f"{self.name}/v{self.normalizer_version}/{rules_hash(self.rules)}"
+
+    def client(
+        self,
+        *,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_connections: int = 20,
+        http2: bool = False,
+        cache: Optional[ResponseCache] = None,
+        transport: Optional[httpx.BaseTransport | httpx.AsyncBaseTransport] = None,
+        coalesce: bool = True,
+    ) -> Any:
+        raise NotImplementedError
+
+    def payload_key(self, s: Mapping[str, Any]) -> str:
+        raise NotImplementedError
+
+    def is_local(self, s: Mapping[str, Any]) -> bool:
+        """True si el escenario se cotiza por regla, sin API."""
+        return False
+
+    def local_records(self, scenarios: list[Mapping[str, Any]]) -> list[tuple[Mapping[str, Any], dict, list[dict]]]:
+        """(escenario, normalized, quotes) para los escenarios locales, todos juntos."""
+        return []
+
+    async def fetch(self, client: Any, s: Mapping[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def normalize(self, raw: Dict[str, Any], s: Mapping[str, Any]) -> dict:
+        raise NotImplementedError
+
+    def normalize_many(self, raws: list[Dict[str, Any]], scenarios: list[Mapping[str, Any]]) -> list[dict]:
+        """normalize() de muchas respuestas juntas (ej. renormalize); mismo resultado, en orden."""
+        return [self.normalize(raw, s) for raw, s in zip(raws, scenarios)]
+
+    def quotes(self, normalized: dict, s: Mapping[str, Any]) -> list[dict]:
+        raise NotImplementedError
+
+    def quotes_from_record(self, rec: Mapping[str, Any]) -> list[dict]:
+        """Quotes de un registro JSONL (los viejos no traen el campo `quotes`)."""
+        if rec.get("quotes") is not None:
+            return list(rec["quotes"])
+        s = {"scenario_id": rec.get("scenario_id")} | (rec.get("scenario") or {})
+        return self.quotes(rec.get("normalized") or {}, s)
+
+
+class FinaerProvider(Provider):
+    name = "finaer"
+    rules = ("TRANSFER_DESC_PCT",)
+
+    def client(self, **kw: Any) -> FinaerClient:
+        return FinaerClient(**kw)
+
+    def payload_key(self, s: Mapping[str, Any]) -> str:
+        return finaer_payload_key(s)
+
+    async def fetch(self, client: FinaerClient, s: Mapping[str, Any]) -> Dict[str, Any]:
+        return await client.aquote(int(s["alquiler"]), int(s["expensas"]), int(s["meses"]), bool(s["tipo_garantia"]))
+
+    def normalize(self, raw: Dict[str, Any], s: Mapping[str, Any]) -> dict:
+        validate_raw(self.name, raw or {})
+        return normalize_finaer(raw or {})
+
+    def normalize_many(self, raws: list[Dict[str, Any]], scenarios: list[Mapping[str, Any]]) -> list[dict]:
+        raws = [raw or {} for raw in raws]
+        validate_raws(self.name, raws)
+        return normalize_finaer_batch(raws).records()
+
+    def quotes(self, normalized: dict, s: Mapping[str, Any]) -> list[dict]:
+        out = []
+        for p in normalized.get("planes") or []:
+            cuotas = int(p.get("cuotas") or 0)
+            out.append(
+                make_quote(
+                    self.name,
+                    s,
+                    cuotas=cuotas,
+                    plan=f"{cuotas} cuotas",
+                    lista=_num(p.get("honorario_sin_descuentos")),
+                    total_final=_num(p.get("monto_final")),
+                    monto_cuota=_num(p.get("monto_cuotas")),
+                    anticipo=_num(p.get("anticipo")),
+                    desc_abs=_num(p.get("descuento_aplicado")),
+                    desc_pct=_num(p.get("pct_descuento_real")),
+                    fecha_limite_desc=p.get("fecha_limite_descuento"),
+                )
+            )
+        return out
+
+
+class HoggaxProvider(Provider):
+    name = "hoggax"
+    rules = ("HOGGAX_12M_PLANES",)
+    normalize_uses_scenario = True
+
+    def client(self, **kw: Any) -> HoggaxClient:
+        return HoggaxClient(**kw)
+
+    def payload_key(self, s: Mapping[str, Any]) -> str:
+        return hoggax_payload_key(s)
+
+    def is_local(self, s: Mapping[str, Any]) -> bool:
+        return int(s["meses"]) == 12
+
+    def local_records(self, scenarios: list[Mapping[str, Any]]) -> list[tuple[Mapping[str, Any], dict, list[dict]]]:
+        by_id: dict[str, list[dict]] = {}
+        for row in hoggax_12m_rows(scenarios):
+            by_id.setdefault(row["scenario_id"], []).append(row)
+        out = []
+        for s in scenarios:
+            norm = {"planes": by_id.get(str(s["scenario_id"]), [])}
+            out.append((s, norm, self.quotes(norm, s)))
+        return out
+
+    async def fetch(self, client: HoggaxClient, s: Mapping[str, Any]) -> Dict[str, Any]:
+        return await client.aquote(int(s["alquiler"]), int(s["expensas"]), int(s["meses"]))
+
+    def normalize(self, raw: Dict[str, Any], s: Mapping[str, Any]) -> dict:
+        validate_raw(self.name, raw or {})
+        return {"planes": rows_from_response(raw or {}, s)}
+
+    def quotes(self, normalized: dict, s: Mapping[str, Any]) -> list[dict]:
+        source = "regla" if self.is_local(s) else "api"
+        out = []
+        for r in normalized.get("planes") or []:
+            if "hoggax_total_web" in r:
+                # filas de rows_from_response / rules
+                out.append(
+                    make_quote(
+                        self.name,
+                        s,
+                        cuotas=r.get("cuotas"),
+                        plan=" - ".join(x for x in (r.get("plan_texto"), r.get("plan_subtexto")) if x),
+                        lista=_num(r.get("hoggax_sin_desc")),
+                        total_final=_num(r.get("hoggax_total_web")),
+                        monto_cuota=_num(r.get("hoggax_monto_cuota")),
+                        source=source,
+                    )
+                )
+            else:
+                # normalize_hoggax (respuesta vieja body.quotation.payment_methods)
+                out.append(
+                    make_quote(
+                        self.name,
+                        s,
+                        plan=r.get("metodo"),
+                        total_final=_num(r.get("total_final")),
+                        monto_cuota=_num(r.get("cuota")),
+                        anticipo=_num(r.get("anticipo")),
+                        desc_abs=_num(r.get("desc_abs")),
+                        desc_pct=_num(r.get("desc_pct")),
+                    )
+                )
+        return out
+
+    def quotes_from_record(self, rec: Mapping[str, Any]) -> list[dict]:
+        if rec.get("quotes") is None and "hoggax_total_web" in rec:
+            # línea de hoggax_<ts>.jsonl (una fila por plan)
+            return self.quotes({"planes": [rec]}, rec)
+        return super().quotes_from_record(rec)
+
+
+# ---------------- registry ----------------
+REGISTRY: dict[str, Provider] = {}
+
+
+def register(provider: Provider) -> Provider:
+    if not provider.name:
+        raise ValueError("Provider sin name")
+    REGISTRY[provider.name] = provider
+    return provider
+
+
+def get(name: str) -> Provider:
+    try:
+        return REGISTRY[name]
+    except KeyError:
+        raise KeyError(f"Proveedor desconocido: {name!r} (registrados: {', '.join(sorted(REGISTRY))})") from None
+
+
+def names() -> list[str]:
+    return list(REGISTRY)
+
+
+def resolve(selected: Iterable[str]) -> list[Provider]:
+    """Nombres (o "all") -> proveedores, sin repetir y en orden de registro."""
+    sel = set(selected)
+    return [p for n, p in REGISTRY.items() if "all" in sel or n in sel]
+
+
+register(FinaerProvider())
+register(HoggaxProvider())
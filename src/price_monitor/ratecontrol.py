@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+
+import httpx
+
+from price_monitor import tracing
+
+
+R = TypeVar("R")
+
+# status que indican "el proveedor está saturado / caído": se reintentan y bajan la concurrencia
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpen(RuntimeError):
+    """El circuit breaker del proveedor está abierto: no se manda el request."""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"{provider}: circuito abierto (reintento en {retry_in:.1f}s)")
+        self.retry_in = retry_in
+
+
+# Latencia de red del intento en curso (ProviderControl._measured abre una muestra por
+# intento). Los clientes envuelven el POST real con network_call(): un hit de cache o de
+# coalescer no deja muestra y no alimenta al AIMDController.
+_NETWORK: ContextVar[Optional[list[float]]] = ContextVar("network_latency", default=None)
+
+
+@contextmanager
+def network_call() -> Iterator[None]:
+    """Mide un request HTTP de verdad y lo anota en la muestra del intento actual."""
+    sample = _NETWORK.get()
+    t0 = time.monotonic()
+    try:
+        yield
+    finally:
+        if sample is not None:
+            sample.append(time.monotonic() - t0)
+
+
+def is_overload(exc: BaseException) -> bool:
+    """429/5xx/timeouts/errores de conexión: señal para reintentar y hacer backoff."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError))
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    v = exc.response.headers.get("retry-after")
+    try:
+        return max(0.0, float(v)) if v is not None else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """Reintentos con backoff exponencial y full jitter (respeta Retry-After si viene)."""
+
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int, exc: BaseException) -> float:
+        if isinstance(exc, CircuitOpen):
+            return exc.retry_in
+        ra = _retry_after(exc)
+        if ra is not None:
+            return min(ra, self.max_delay)
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, cap)
+
+
+class CircuitBreaker:
+    """
+    closed -> open tras `failure_threshold` fallas seguidas.
+    open -> half_open pasados `reset_after` segundos (deja pasar un solo request de prueba).
+    half_open -> closed si la prueba sale bien, open de nuevo si falla.
+    """
+
+    def __init__(self, provider: str, *, failure_threshold: int = 5, reset_after: float = 30.0):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+
+    def before(self) -> None:
+        if self.state == "closed":
+            return
+        now = time.monotonic()
+        if self.state == "open":
+            wait = self.opened_at + self.reset_after - now
+            if wait > 0:
+                raise CircuitOpen(self.provider, wait)
+            self.state = "half_open"
+        # half_open: un solo request de prueba a la vez
+        if self._probe_in_flight:
+            raise CircuitOpen(self.provider, min(1.0, self.reset_after))
+        self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probe_in_flight = False
+        self.state = "closed"
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        was_probe = self._probe_in_flight
+        self._probe_in_flight = False
+        if was_probe or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """El request de prueba terminó sin veredicto (ej: error 4xx propio)."""
+        self._probe_in_flight = False
+
+
+class AIMDController:
+    """
+    Límite de concurrencia adaptativo (additive increase / multiplicative decrease):
+    - cada request OK con latencia <= target_latency suma ~1 al límite por "ventana" (1/limit por request)
+    - 429/5xx/timeout o latencia alta multiplican el límite por `backoff` (como mucho una vez por `cooldown`)
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        target_latency: float = 2.0,
+        backoff: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.peak = self.limit
+        self.decreases = 0
+        self._inflight = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        with tracing.span("aimd_slot", "engine", limit=int(self.limit)):
+            async with self._cond:
+                await self._cond.wait_for(lambda: self._inflight < int(self.limit))
+                self._inflight += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._inflight -= 1
+                self._cond.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.target_latency:
+            self._decrease()
+            return
+        self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        self.peak = max(self.peak, self.limit)
+
+    def on_overload(self) -> None:
+        self._decrease()
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        self.decreases += 1
+
+
+@dataclass
+class ProviderControl:
+    """
+    Control por proveedor: concurrencia adaptativa + reintentos + circuit breaker.
+    controller=None deja la concurrencia fija (la que maneje el engine).
+    """
+
+    name: str
+    controller: Optional[AIMDController] = None
+    breaker: Optional[CircuitBreaker] = None
+    retry: RetryPolicy = field(default_factory=RetryPolicy)
+    retries: int = 0
+
+    async def call(self, fn: Callable[[], Awaitable[R]], before: Optional[Callable[[], Awaitable[None]]] = None) -> R:
+        """
+        `fn` con reintentos. `before` (ej. el token bucket del engine) se espera antes de
+        cada intento, fuera del slot del controller y de la medición de latencia.
+        """
+        attempt = 0
+        while True:
+            try:
+                if before is not None:
+                    await before()
+                return await self._once(fn)
+            except Exception as e:
+                if not (is_overload(e) or isinstance(e, CircuitOpen)):
+                    raise
+                attempt += 1
+                if attempt >= self.retry.max_attempts:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.retry.delay(attempt, e))
+
+    async def _once(self, fn: Callable[[], Awaitable[R]]) -> R:
+        if self.breaker is not None:
+            self.breaker.before()
+
+        if self.controller is None:
+            return await self._measured(fn)
+        async with self.controller.slot():
+            return await self._measured(fn)
+
+    async def _measured(self, fn: Callable[[], Awaitable[R]]) -> R:
+        sample: list[float] = []
+        token = _NETWORK.set(sample)
+        try:
+            res = await fn()
+        except Exception as e:
+            if is_overload(e):
+                if self.controller is not None:
+                    self.controller.on_overload()
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+            elif self.breaker is not None:
+                self.breaker.release_probe()
+            raise
+        finally:
+            _NETWORK.reset(token)
+        # solo requests que fueron a la red: un hit de cache / coalescer no dice nada del proveedor
+        if self.controller is not None and sample:
+            self.controller.on_success(sum(sample))
+        if self.breaker is not None:
+            self.breaker.record_success()
+        return res
+
+    def summary(self) -> str:
+        parts = [f"{self.name}: retries={self.retries}"]
+        if self.controller is not None:
+            c = self.controller
+            parts.append(f"concurrencia final={int(c.limit)} pico={int(c.peak)} backoffs={c.decreases}")
+        if self.breaker is not None:
+            parts.append(f"circuito={self.breaker.state} aperturas={self.breaker.trips}")
+        return " ".join(parts)
+
+
+def make_control(
+    name: str,
+    *,
+    adaptive: bool = True,
+    max_concurrency: int = 8,
+    min_concurrency: int = 1,
+    target_latency: float = 2.0,
+    retries: int = 3,
+    breaker_threshold: int = 5,
+    breaker_cooldown: float = 30.0,
+) -> ProviderControl:
+    controller = None
+    if adaptive:
+        controller = AIMDController(
+            initial=min(4, max_concurrency),
+            min_limit=min_concurrency,
+            max_limit=max_concurrency,
+            target_latency=target_latency,
+        )
+    return ProviderControl(
+        name=name,
+        controller=controller,
+        breaker=CircuitBreaker(name, failure_threshold=breaker_threshold, reset_after=breaker_cooldown),
+        retry=RetryPolicy(max_attempts=retries + 1),
+    )
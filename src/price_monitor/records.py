@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Mapping, Optional, Union
+
+import pandas as pd
+from pydantic import BeforeValidator, ConfigDict, Discriminator, Tag, TypeAdapter, ValidationError, with_config
+from typing_extensions import Annotated, NotRequired, TypedDict
+
+from price_monitor.fingerprints import resolved_records
+
+
+# Registros compactos y tipados para historias grandes (muchas corridas en memoria):
+# - Scenario / Plan / Quote con __slots__ (sin __dict__ por instancia)
+# - montos en centavos (int): exactos y sin float por campo
+# - flyweight: escenarios, planes y strings repetidos se comparten (Interner); una
+#   historia de N corridas de la misma grilla guarda cada plan sin cambios una sola vez
+#
+# Y schemas pydantic de lo que devuelven las APIs: si cambia el tipo de un campo la
+# respuesta falla al normalizar (error visible) en vez de dar planes con None.
+
+
+# ---------------- schemas de las respuestas (pydantic) ----------------
+def _blank_to_none(x: Any) -> Any:
+    return None if isinstance(x, str) and not x.strip() else x
+
+
+# número, string numérico, "" o null (lo que ya tolera la normalización); otra cosa es drift
+Num = Annotated[Optional[float], BeforeValidator(_blank_to_none)]
+
+
+@with_config(ConfigDict(extra="allow"))
+class FinaerPlanRaw(TypedDict):
+    cantidad_de_cuotas: NotRequired[Num]
+    monto_final: NotRequired[Num]
+    honorario_sin_descuentos: NotRequired[Num]
+    descuento_aplicado: NotRequired[Num]
+    monto_cuotas: NotRequired[Num]
+    anticipo: NotRequired[Num]
+    porcentaje_de_descuento_aplicado: NotRequired[Num]
+    fecha_limite_descuento: NotRequired[Optional[str]]
+
+
+@with_config(ConfigDict(extra="allow"))
+class FinaerObjectRaw(TypedDict):
+    alquiler: NotRequired[Num]
+    expensas: NotRequired[Num]
+    duracion_del_contrato_en_meses: NotRequired[Num]
+    porcentaje_descuento_mercadopago: NotRequired[Num]
+    posibles_planes_de_cuotas: NotRequired[Optional[List[FinaerPlanRaw]]]
+
+
+@with_config(ConfigDict(extra="allow"))
+class FinaerRaw(TypedDict):
+    object: NotRequired[Optional[FinaerObjectRaw]]
+    errors: NotRequired[Optional[List[Any]]]
+
+
+@with_config(ConfigDict(extra="allow"))
+class HoggaxFacilidadRaw(TypedDict):
+    texto: NotRequired[Optional[str]]
+    sub_texto: NotRequired[Optional[str]]
+    precio_texto: NotRequired[Optional[str]]
+    info_texto: NotRequired[Optional[str]]
+    importe: NotRequired[Num]
+
+
+@with_config(ConfigDict(extra="allow"))
+class HoggaxCotizacionRaw(TypedDict):
+    importeRaw: NotRequired[Num]
+    importe: NotRequired[Num]
+    facilidades_pago: NotRequired[Optional[List[HoggaxFacilidadRaw]]]
+
+
+@with_config(ConfigDict(extra="allow"))
+class HoggaxPayloadRaw(TypedDict):
+    cotizacion: NotRequired[Optional[HoggaxCotizacionRaw]]
+
+
+@with_config(ConfigDict(extra="allow"))
+class HoggaxRaw(TypedDict):
+    payload: NotRequired[Optional[HoggaxPayloadRaw]]
+
+
+RAW_SCHEMAS: dict[str, Any] = {"finaer": FinaerRaw, "hoggax": HoggaxRaw}
+
+# un TypeAdapter por proveedor (y uno para listas, para validar en batch): construirlos
+# cuesta, se hacen una vez
+_RAW: dict[str, TypeAdapter] = {k: TypeAdapter(v) for k, v in RAW_SCHEMAS.items()}
+_RAW_MANY: dict[str, TypeAdapter] = {k: TypeAdapter(List[v]) for k, v in RAW_SCHEMAS.items()}
+
+# los normalizadores validan cada respuesta antes de normalizar; set_validate_raw(False)
+# (crawl --no-validate) lo apaga para corridas donde el costo importa más que el aviso
+_VALIDATE_RAW = True
+
+# líneas por llamada a pydantic al validar un JSONL (memoria acotada por chunk)
+VALIDATE_CHUNK = 10_000
+
+
+def set_validate_raw(enabled: bool) -> None:
+    global _VALIDATE_RAW
+    _VALIDATE_RAW = bool(enabled)
+
+
+class SchemaDrift(ValueError):
+    """La respuesta de un proveedor no tiene la forma esperada."""
+
+
+def _drift(what: str, e: ValidationError) -> SchemaDrift:
+    first = e.errors()[0]
+    loc = ".".join(str(x) for x in first["loc"])
+    return SchemaDrift(f"schema {what}: {loc}: {first['msg']} ({e.error_count()} errores)")
+
+
+def validate_raw(provider: str, raw: Any) -> None:
+    """Falla con SchemaDrift si `raw` no respeta el schema del proveedor (sin schema o apagado: no valida)."""
+    adapter = _RAW.get(provider)
+    if adapter is None or not _VALIDATE_RAW:
+        return
+    try:
+        adapter.validate_python(raw)
+    except ValidationError as e:
+        raise _drift(provider, e) from None
+
+
+def validate_raws(provider: str, raws: List[Any]) -> None:
+    """validate_raw para muchas respuestas en una sola llamada a pydantic."""
+    adapter = _RAW_MANY.get(provider)
+    if adapter is None or not _VALIDATE_RAW:
+        return
+    try:
+        adapter.validate_python(raws)
+    except ValidationError as e:
+        raise _drift(provider, e) from None
+
+
+# ---------------- registros del JSONL ----------------
+# Un registro por (escenario, proveedor); el raw se valida con el schema de su proveedor
+# en la misma pasada (unión discriminada por competitor). Las líneas de hoggax_<ts>.jsonl
+# (una fila por plan, sin raw) tienen su propia forma.
+@with_config(ConfigDict(extra="allow"))
+class ScenarioLine(TypedDict):
+    alquiler: int
+    expensas: int
+    meses: int
+    tipo_garantia: NotRequired[bool]
+
+
+@with_config(ConfigDict(extra="allow"))
+class FinaerLine(TypedDict):
+    ts_utc: str
+    competitor: str
+    scenario_id: Union[str, int]
+    scenario: ScenarioLine
+    normalized: NotRequired[Optional[dict]]
+    quotes: NotRequired[Optional[List[dict]]]
+    raw: NotRequired[Optional[FinaerRaw]]
+
+
+@with_config(ConfigDict(extra="allow"))
+class HoggaxLine(TypedDict):
+    ts_utc: str
+    competitor: str
+    scenario_id: Union[str, int]
+    scenario: ScenarioLine
+    normalized: NotRequired[Optional[dict]]
+    quotes: NotRequired[Optional[List[dict]]]
+    raw: NotRequired[Optional[HoggaxRaw]]
+
+
+@with_config(ConfigDict(extra="allow"))
+class HoggaxRowLine(TypedDict):
+    ts_utc: str
+    competitor: str
+    scenario_id: Union[str, int]
+    alquiler: int
+    expensas: int
+    meses: int
+    cuotas: Optional[int]
+    hoggax_sin_desc: Num
+    hoggax_total_web: Num
+    hoggax_monto_cuota: Num
+
+
+@with_config(ConfigDict(extra="allow"))
+class OtherLine(TypedDict):
+    ts_utc: str
+    competitor: str
+    scenario_id: Union[str, int]
+
+
+def _line_kind(v: Any) -> str:
+    c = v.get("competitor") if isinstance(v, dict) else None
+    if c == "hoggax" and "hoggax_total_web" in v:
+        return "hoggax_row"
+    return c if c in RAW_SCHEMAS else "other"
+
+
+RecordLine = Annotated[
+    Union[
+        Annotated[FinaerLine, Tag("finaer")],
+        Annotated[HoggaxLine, Tag("hoggax")],
+        Annotated[HoggaxRowLine, Tag("hoggax_row")],
+        Annotated[OtherLine, Tag("other")],
+    ],
+    Discriminator(_line_kind),
+]
+
+_RECORDS = TypeAdapter(List[RecordLine])
+
+
+def _line_chunks(path: Path, size: int) -> Iterator[tuple[int, list[bytes]]]:
+    """(nro de la primera línea, líneas completas) de a `size`; una última línea cortada (crash) se ignora."""
+    chunk: list[bytes] = []
+    start = 1
+    with path.open("rb") as f:
+        for n, line in enumerate(f, 1):
+            if not line.endswith(b"\n") or not line.strip():
+                continue
+            if not chunk:
+                start = n
+            chunk.append(line)
+            if len(chunk) >= size:
+                yield start, chunk
+                chunk = []
+    if chunk:
+        yield start, chunk
+
+
+def validate_records(path: Path, chunk: int = VALIDATE_CHUNK) -> Iterator[dict]:
+    """
+    Registros de un JSONL (raw incluido), validados de a `chunk` líneas: cada bloque se
+    valida en una sola llamada desde sus bytes y se entrega, sin tener el archivo entero.
+    """
+    for start, lines in _line_chunks(path, chunk):
+        try:
+            records = _RECORDS.validate_json(b"[" + b",".join(lines) + b"]")
+        except ValidationError as e:
+            raise _drift(f"{path.name} (líneas desde {start})", e) from None
+        yield from records
+
+
+# ---------------- records compactos ----------------
+def to_cents(x: Any) -> Optional[int]:
+    if x is None:
+        return None
+    try:
+        return round(float(x) * 100)
+    except (TypeError, ValueError):
+        return None
+
+
+def from_cents(c: Optional[int]) -> Optional[float]:
+    return None if c is None else c / 100
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    scenario_id: str
+    alquiler: int
+    expensas: int
+    meses: int
+    tipo_garantia: bool = False
+
+    @property
+    def alq_exp(self) -> int:
+        return self.alquiler + self.expensas
+
+
+@dataclass(frozen=True, slots=True)
+class Plan:
+    """Un plan cotizado, sin escenario ni fecha: el mismo plan en varias corridas es el mismo objeto."""
+
+    competitor: str
+    cuotas: Optional[int]
+    plan: Optional[str]
+    lista: Optional[int]  # centavos
+    total_final: Optional[int]  # centavos
+    monto_cuota: Optional[int]  # centavos
+    anticipo: Optional[int]  # centavos
+    desc_abs: Optional[int]  # centavos
+    desc_pct: Optional[float]  # fracción
+    fecha_limite_desc: Optional[str]
+    source: str
+
+
+@dataclass(frozen=True, slots=True)
+class Quote:
+    ts_utc: str
+    scenario: Scenario
+    plan: Plan
+
+    def to_dict(self) -> dict:
+        """La quote en el schema unificado (providers.QUOTE_FIELDS), montos en pesos."""
+        s, p = self.scenario, self.plan
+        return {
+            "competitor": p.competitor,
+            "scenario_id": s.scenario_id,
+            "alquiler": s.alquiler,
+            "expensas": s.expensas,
+            "alq_exp": s.alq_exp,
+            "meses": s.meses,
+            "cuotas": p.cuotas,
+            "plan": p.plan,
+            "lista": from_cents(p.lista),
+            "total_final": from_cents(p.total_final),
+            "monto_cuota": from_cents(p.monto_cuota),
+            "anticipo": from_cents(p.anticipo),
+            "desc_abs": from_cents(p.desc_abs),
+            "desc_pct": p.desc_pct,
+            "fecha_limite_desc": p.fecha_limite_desc,
+            "source": p.source,
+        }
+
+
+class Interner:
+    """Pool flyweight: strings, escenarios y planes iguales se guardan una sola vez."""
+
+    def __init__(self) -> None:
+        self.scenarios: dict[tuple, Scenario] = {}
+        self.plans: dict[Plan, Plan] = {}
+
+    @staticmethod
+    def text(x: Any) -> Optional[str]:
+        return None if x is None else sys.intern(str(x))
+
+    def scenario(self, scenario_id: Any, alquiler: Any, expensas: Any, meses: Any, tipo_garantia: Any = False) -> Scenario:
+        key = (str(scenario_id), int(alquiler), int(expensas or 0), int(meses), bool(tipo_garantia))
+        s = self.scenarios.get(key)
+        if s is None:
+            s = self.scenarios[key] = Scenario(self.text(key[0]), *key[1:])
+        return s
+
+    def plan(self, q: Mapping[str, Any]) -> Plan:
+        cuotas = q.get("cuotas")
+        desc_pct = q.get("desc_pct")
+        p = Plan(
+            competitor=self.text(q["competitor"]),
+            cuotas=None if cuotas is None else int(cuotas),
+            plan=self.text(q.get("plan")),
+            lista=to_cents(q.get("lista")),
+            total_final=to_cents(q.get("total_final")),
+            monto_cuota=to_cents(q.get("monto_cuota")),
+            anticipo=to_cents(q.get("anticipo")),
+            desc_abs=to_cents(q.get("desc_abs")),
+            desc_pct=None if desc_pct is None else float(desc_pct),
+            fecha_limite_desc=self.text(q.get("fecha_limite_desc")),
+            source=self.text(q.get("source") or "api"),
+        )
+        return self.plans.setdefault(p, p)
+
+    def quote(self, ts_utc: str, q: Mapping[str, Any], tipo_garantia: bool = False) -> Quote:
+        s = self.scenario(q["scenario_id"], q["alquiler"], q.get("expensas"), q["meses"], tipo_garantia)
+        return Quote(self.text(ts_utc), s, self.plan(q))
+
+
+def iter_quotes(
+    paths: Iterable[Path],
+    *,
+    validate: bool = True,
+    interner: Optional[Interner] = None,
+) -> Iterator[Quote]:
+    """
+    Quotes compactas de uno o más JSONL (historia), armadas a medida que se lee cada
+    chunk. Con `validate` cada chunk se valida en batch desde sus bytes (registros y raw
+    de cada proveedor) y un cambio de schema corta con SchemaDrift.
+    """
+    from price_monitor import providers  # providers importa este módulo (validate_raw)
+
+    interner = interner or Interner()
+    for path in paths:
+        path = Path(path)
+        if validate:
+            records: Iterable[dict] = validate_records(path)
+        else:
+            records = (json.loads(line) for _, lines in _line_chunks(path, VALIDATE_CHUNK) for line in lines)
+        # --skip-unchanged: los unchanged_record traen las quotes de su última corrida completa
+        records = resolved_records(path, records)
+
+        for rec in records:
+            name = rec.get("competitor")
+            if name not in providers.REGISTRY:
+                continue
+            ts = rec.get("ts_utc") or ""
+            tg = bool((rec.get("scenario") or {}).get("tipo_garantia", False))
+            for q in providers.get(name).quotes_from_record(rec):
+                yield interner.quote(ts, q, tg)
+
+
+def load_quotes(paths: Iterable[Path], *, validate: bool = True) -> list[Quote]:
+    """Historia completa en memoria (un solo Interner para todos los archivos)."""
+    return list(iter_quotes(paths, validate=validate))
+
+
+def quotes_frame(quotes: Iterable[Quote]) -> pd.DataFrame:
+    """DataFrame en el schema unificado (montos en pesos) + ts_utc."""
+    return pd.DataFrame([{"ts_utc": q.ts_utc} | q.to_dict() for q in quotes])
@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Optional
+
+from price_monitor import providers
+from price_monitor.cache import default_cache_dir
+from price_monitor.fingerprints import fingerprint
+from price_monitor.io.excel import jsonl_to_excel
+from price_monitor.scheduler import LOCAL_BATCH
+
+
+# Re-normalización offline: cuando cambia una regla (price_monitor.rules) o el código de
+# un normalizador, `price-monitor renormalize` vuelve a correr los normalizadores actuales
+# sobre el `raw` guardado en cada registro JSONL, sin ir a la red. Cada registro lleva el
+# Provider.normalizer_id() que lo produjo: los que ya tienen el id actual no se tocan, y
+# los recalculados quedan en un cache sqlite keyed por (normalizer_id, fingerprint del
+# raw), así que correrlo de nuevo (o sobre corridas con respuestas repetidas) es barato.
+#
+# Se trabaja de a LOCAL_BATCH líneas: los que hay que recalcular (miss del cache) van
+# juntos a Provider.normalize_many (Finaer: normalize_finaer_batch, vectorizado) y los
+# registros por regla (sin raw, Provider.is_local) a local_records. Lo que no tiene raw ni regla (unchanged_record, filas viejas de
+# hoggax_<ts>.jsonl, errores) se copia tal cual.
+
+_SKIP_SUFFIXES = (".errors.jsonl", ".tmp")
+
+
+def normalized_key(provider: providers.Provider, normalizer: str, raw: Any, s: Mapping[str, Any]) -> str:
+    """Key del cache: normalizador + fingerprint del raw (+ el escenario si normalize lo usa)."""
+    parts = [normalizer, fingerprint(raw)]
+    if provider.normalize_uses_scenario:
+        parts.append(fingerprint(dict(s)))
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class NormalizedCache:
+    """
+    Cache en disco (sqlite) de `normalized` por normalized_key(); body en JSON con zlib.
+    read_only (--dry-run): se abre el archivo existente en modo ro y put/commit no hacen nada.
+    """
+
+    def __init__(self, path: str | Path, read_only: bool = False):
+        self.path = Path(path)
+        self.read_only = read_only
+        if read_only:
+            self._db = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS normalized (
+                key TEXT PRIMARY KEY,
+                normalizer TEXT NOT NULL,
+                body BLOB NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS normalized_normalizer ON normalized(normalizer)")
+        self._db.commit()
+
+    @staticmethod
+    def default_path() -> Path:
+        return default_cache_dir() / "normalized.sqlite"
+
+    @classmethod
+    def default(cls) -> "NormalizedCache":
+        return cls(cls.default_path())
+
+    def get(self, key: str) -> Optional[dict]:
+        row = self._db.execute("SELECT body FROM normalized WHERE key = ?", (key,)).fetchone()
+        return None if row is None else json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, normalizer: str, value: dict) -> None:
+        if self.read_only:
+            return
+        body = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        self._db.execute(
+            "INSERT OR REPLACE INTO normalized (key, normalizer, body) VALUES (?, ?, ?)", (key, normalizer, body)
+        )
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """Borra lo de normalizadores que ya no son los actuales. Devuelve cuántas entradas (read_only: solo cuenta)."""
+        keep = list(keep)
+        marks = ",".join("?" * len(keep))
+        if self.read_only:
+            sql = f"SELECT COUNT(*) FROM normalized WHERE normalizer NOT IN ({marks})"
+            return self._db.execute(sql, keep).fetchone()[0]
+        cur = self._db.execute(f"DELETE FROM normalized WHERE normalizer NOT IN ({marks})", keep)
+        self._db.commit()
+        return cur.rowcount
+
+    def commit(self) -> None:
+        if not self.read_only:
+            self._db.commit()
+
+    def close(self) -> None:
+        self.commit()
+        self._db.close()
+
+
+@dataclass
+class RenormStats:
+    records: int = 0
+    up_to_date: int = 0   # ya tenían el normalizer_id actual
+    recomputed: int = 0   # normalize() sobre el raw
+    cached: int = 0       # hit en NormalizedCache
+    local: int = 0        # por regla (local_records)
+    copied: int = 0       # sin raw ni regla: tal cual
+    changed: int = 0      # normalized / quotes distintos a lo guardado
+    errors: int = 0       # normalize() falló: queda el registro original
+
+    def add(self, other: "RenormStats") -> None:
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+    def summary(self) -> str:
+        return (
+            f"registros={self.records} al_dia={self.up_to_date} recalculados={self.recomputed} "
+            f"cache={self.cached} regla={self.local} copiados={self.copied} "
+            f"cambiaron={self.changed} errores={self.errors}"
+        )
+
+
+def _scenario(rec: Mapping[str, Any]) -> dict:
+    return {"scenario_id": rec.get("scenario_id")} | (rec.get("scenario") or {})
+
+
+class Renormalizer:
+    """Re-normaliza registros con los normalizadores actuales (ver comentario del módulo)."""
+
+    def __init__(self, cache: Optional[NormalizedCache] = None, force: bool = False):
+        self.cache = cache
+        self.force = force
+        self.ids = {name: p.normalizer_id() for name, p in providers.REGISTRY.items()}
+
+    def _normalize_many(
+        self, provider: providers.Provider, items: list[tuple[int, dict, Optional[str]]], stats: RenormStats
+    ) -> list[Optional[dict]]:
+        """normalize de un bloque; si el lote falla, uno por uno para aislar el registro roto (None)."""
+        raws = [rec["raw"] for _, rec, _ in items]
+        scenarios = [_scenario(rec) for _, rec, _ in items]
+        try:
+            norms: list[Optional[dict]] = list(provider.normalize_many(raws, scenarios))
+        except Exception:
+            norms = []
+            for raw, s in zip(raws, scenarios):
+                try:
+                    norms.append(provider.normalize(raw, s))
+                except Exception as e:
+                    stats.errors += 1
+                    print(f"ERROR {provider.name} {s.get('scenario_id')}: {type(e).__name__}: {e}")
+                    norms.append(None)
+        nid = self.ids[provider.name]
+        for (_, _, key), norm in zip(items, norms):
+            if norm is None:
+                continue
+            stats.recomputed += 1
+            if key is not None:
+                self.cache.put(key, nid, norm)
+        return norms
+
+    def _updated(self, provider: providers.Provider, rec: dict, norm: dict, stats: RenormStats) -> dict:
+        quotes = provider.quotes(norm, _scenario(rec))
+        # ida y vuelta por JSON para comparar contra lo leído del archivo
+        norm, quotes = json.loads(json.dumps([norm, quotes], ensure_ascii=False))
+        if norm != rec.get("normalized") or quotes != rec.get("quotes"):
+            stats.changed += 1
+        return rec | {"normalized": norm, "quotes": quotes, "normalizer": self.ids[provider.name]}
+
+    def records(self, lines: list[str], stats: RenormStats) -> list[Optional[dict]]:
+        """
+        Un bloque de líneas -> registros re-normalizados, en el mismo orden. None = la línea
+        queda igual (se copia byte a byte).
+        """
+        out: list[Optional[dict]] = [None] * len(lines)
+        local: dict[str, list[tuple[int, dict]]] = {}
+        # (línea, registro, key del cache) a recalcular, por proveedor
+        todo: dict[str, list[tuple[int, dict, Optional[str]]]] = {}
+        for i, line in enumerate(lines):
+            rec = json.loads(line)
+            stats.records += 1
+            name = rec.get("competitor")
+            provider = providers.REGISTRY.get(name) if isinstance(name, str) else None
+            if provider is None or "error" in rec or "normalized" not in rec:
+                stats.copied += 1
+                continue
+            if not self.force and rec.get("normalizer") == self.ids[name]:
+                stats.up_to_date += 1
+                continue
+            if rec.get("raw") is None:
+                if provider.is_local(_scenario(rec)):
+                    local.setdefault(name, []).append((i, rec))
+                else:
+                    stats.copied += 1
+                continue
+            key = normalized_key(provider, self.ids[name], rec["raw"], _scenario(rec)) if self.cache is not None else None
+            norm = self.cache.get(key) if key is not None else None
+            if norm is None:
+                todo.setdefault(name, []).append((i, rec, key))
+                continue
+            stats.cached += 1
+            out[i] = self._updated(provider, rec, norm, stats)
+
+        for name, items in todo.items():
+            provider = providers.get(name)
+            for (i, rec, _), norm in zip(items, self._normalize_many(provider, items, stats)):
+                if norm is not None:
+                    out[i] = self._updated(provider, rec, norm, stats)
+
+        for name, items in local.items():
+            provider = providers.get(name)
+            results = provider.local_records([_scenario(rec) for _, rec in items])
+            for (i, rec), (_, norm, _) in zip(items, results):
+                stats.local += 1
+                out[i] = self._updated(provider, rec, norm, stats)
+        return out
+
+    def file(self, path: Path, out_path: Optional[Path] = None, dry_run: bool = False) -> tuple[RenormStats, bool]:
+        """
+        Re-normaliza un JSONL. Escribe a un temporal y lo mueve encima de `out_path`
+        (default: el mismo archivo) solo si algún registro cambió. Devuelve (stats, escrito).
+        dry_run: no escribe nada (ni el temporal); solo cuenta.
+        """
+        out_path = out_path or path
+        tmp = Path(os.devnull) if dry_run else out_path.with_name(out_path.name + ".tmp")
+        stats = RenormStats()
+        touched = False
+        if not dry_run:
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("r", encoding="utf-8") as f, tmp.open("w", encoding="utf-8") as w:
+            chunk: list[str] = []
+
+            def flush() -> None:
+                nonlocal touched
+                for line, rec in zip(chunk, self.records(chunk, stats)):
+                    if rec is None:
+                        w.write(line)
+                    else:
+                        touched = True
+                        w.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                chunk.clear()
+
+            for line in f:
+                # una última línea cortada (corrida que murió) se copia tal cual
+                if not line.strip() or not line.endswith("\n"):
+                    flush()
+                    w.write(line)
+                    continue
+                chunk.append(line)
+                if len(chunk) >= LOCAL_BATCH:
+                    flush()
+            flush()
+        if self.cache is not None:
+            self.cache.commit()
+
+        if dry_run:
+            return stats, False
+        if touched:
+            os.replace(tmp, out_path)
+        else:
+            tmp.unlink()
+            if out_path != path:
+                out_path.write_bytes(path.read_bytes())
+        return stats, touched
+
+
+def _expand(patterns: Iterable[str]) -> list[Path]:
+    out: list[Path] = []
+    for pat in patterns:
+        p = Path(pat)
+        matches = sorted(p.glob("*.jsonl")) if p.is_dir() else [Path(m) for m in sorted(glob.glob(pat)) or [pat]]
+        out.extend(m for m in matches if not m.name.endswith(_SKIP_SUFFIXES))
+    return sorted(set(out))
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="price-monitor renormalize",
+        description="Re-normaliza corridas guardadas (JSONL) con los normalizadores y reglas actuales, sin red",
+    )
+    p.add_argument("inputs", nargs="*", default=["output"], help="JSONL o carpetas (acepta globs; default: output)")
+    p.add_argument("--out-dir", type=Path, default=None, help="escribir acá en vez de reescribir los archivos")
+    p.add_argument("--force", action="store_true", help="recalcular aunque el registro ya tenga el normalizer_id actual")
+    p.add_argument("--no-cache", action="store_true", help="no leer ni escribir el cache de normalizados")
+    p.add_argument("--prune", action="store_true", help="borrar del cache lo de normalizadores viejos")
+    p.add_argument("--dry-run", action="store_true", help="solo contar qué cambiaría, sin escribir")
+    p.add_argument("--excel", action="store_true", help="re-exportar a Excel los archivos reescritos")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _parse_args(argv)
+    paths = _expand(args.inputs)
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        raise SystemExit(f"No existen: {', '.join(map(str, missing))}")
+    if not paths:
+        raise SystemExit("Nada para re-normalizar")
+
+    cache_path = NormalizedCache.default_path()
+    if args.no_cache:
+        cache = None
+    elif args.dry_run:
+        # dry run: se lee el cache si existe, pero no se crea ni se escribe
+        cache = NormalizedCache(cache_path, read_only=True) if cache_path.exists() else None
+    else:
+        cache = NormalizedCache(cache_path)
+    renorm = Renormalizer(cache, force=args.force)
+    print("Normalizadores: " + ", ".join(renorm.ids.values()))
+
+    total = RenormStats()
+    try:
+        for path in paths:
+            out_path = args.out_dir / path.name if args.out_dir else path
+            stats, written = renorm.file(path, out_path, dry_run=args.dry_run)
+            total.add(stats)
+            if written:
+                print(f"Wrote JSONL ({stats.changed} cambiaron) -> {out_path}")
+                if args.excel:
+                    xlsx_path = out_path.with_suffix(".xlsx")
+                    jsonl_to_excel(out_path, xlsx_path)
+                    print(f"Wrote Excel -> {xlsx_path}")
+            elif args.dry_run:
+                print(f"OK {path.name}: {stats.changed} cambiarían (dry run)")
+            elif stats.records:
+                print(f"OK {path.name}: sin cambios")
+        if cache is not None and args.prune:
+            verb = "se borrarían (dry run)" if args.dry_run else "borradas"
+            print(f"Cache: {cache.prune(renorm.ids.values())} entradas de normalizadores viejos {verb}")
+    finally:
+        if cache is not None:
+            cache.close()
+    print(f"Renormalize ({len(paths)} archivos): {total.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sys
+from typing import Any, Callable, Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+
+# Reglas de precio locales (sin API), vectorizadas: todas las funciones reciben arrays
+# (o escalares) y evalúan una grilla entera de una vez.
+
+# Todas las constantes de negocio viven acá: normalizadores, reglas locales y scripts
+# de comparación las leen de este módulo (nunca una copia propia), y `renormalize`
+# detecta un cambio de regla por el hash de las constantes que usa cada normalizador.
+
+# transferencia: % OFF solo en 1 pago (normalize_finaer y Hoggax 12 meses)
+TRANSFER_DESC_PCT = 15.0
+
+# Finaer contado: % OFF sobre la lista en 1 pago que usa el comparador de bordes.
+# OJO: no coincide con TRANSFER_DESC_PCT (15%); hasta confirmar cuál es el vigente
+# quedan las dos, pero en un solo lugar.
+FINAER_CONTADO_DESC_PCT = 20.0
+
+# segmentos por alq+exp: "hasta 500k" (<= 500k), "500k-800k" (<= 800k), "mayor_800k"
+SEGMENT_BORDERS = (500_000, 800_000)
+
+# Hoggax, precio lista por regla para plazos sin cotizador web: lista = alq_exp * factor
+HOGGAX_LISTA_FACTOR = {12: 1 / 0.9, 3: 0.8, 6: 0.8}
+
+# Hoggax 12 meses (regla fija, NO API): monto final = alq + exp
+HOGGAX_12M_PLANES = [
+    # (cuotas, plan_texto, plan_subtexto, desc_pct)
+    (1, f"{TRANSFER_DESC_PCT:g}% OFF", "Transferencia", TRANSFER_DESC_PCT),
+    (3, "3 CUOTAS sin interés", "Crédito o Débito", 0.0),
+]
+
+_MAX_MESES = 120
+_LISTA_TABLE = np.full(_MAX_MESES + 1, np.nan)
+_LISTA_TABLE[list(HOGGAX_LISTA_FACTOR)] = list(HOGGAX_LISTA_FACTOR.values())
+
+
+def rules_hash(names: Iterable[str]) -> str:
+    """sha256 (hex, 12) de los valores actuales de las constantes `names`: cambia si cambia alguna."""
+    mod = sys.modules[__name__]
+    blob = json.dumps({n: getattr(mod, n) for n in sorted(names)}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:12]
+
+
+def _k(b: float) -> str:
+    return f"{b / 1000:g}k"
+
+
+def segment_labels(
+    borders: Sequence[float] = SEGMENT_BORDERS,
+    *,
+    first: str = "hasta {hi}",
+    middle: str = "{lo}-{hi}",
+    last: str = "mayor_{lo}",
+    unit: Callable[[float], str] = _k,
+) -> list[str]:
+    """
+    (500_000, 800_000) -> ["hasta 500k", "500k-800k", "mayor_800k"]. Los scripts con sus
+    propias etiquetas cambian los templates / `unit` (cómo se escribe cada borde), nunca los bordes.
+    """
+    labels = [first.format(hi=unit(borders[0]))]
+    labels += [middle.format(lo=unit(a), hi=unit(b)) for a, b in zip(borders, borders[1:])]
+    return labels + [last.format(lo=unit(borders[-1]))]
+
+
+def segment_index(alq_exp: ArrayLike, borders: Sequence[float] = SEGMENT_BORDERS) -> np.ndarray:
+    """Índice en segment_labels(borders) de cada alq_exp (un borde cae en el segmento de abajo)."""
+    return np.searchsorted(np.asarray(borders, dtype=float), np.asarray(alq_exp, dtype=float), side="left")
+
+
+def _lookup(table: np.ndarray, meses: ArrayLike) -> np.ndarray:
+    m = np.asarray(meses, dtype=np.int64)
+    ok = (m >= 0) & (m < len(table))
+    return np.where(ok, table[np.where(ok, m, 0)], np.nan)
+
+
+def hoggax_lista_regla(alq_exp: ArrayLike, meses: ArrayLike) -> np.ndarray:
+    """Precio lista Hoggax por regla (12: alq_exp / 0.9, 3 y 6: alq_exp * 0.8). NaN si el plazo no tiene regla."""
+    return np.asarray(alq_exp, dtype=float) * _lookup(_LISTA_TABLE, meses)
+
+
+def transfer_desc_pct(cuotas: ArrayLike, desc_pct: float = TRANSFER_DESC_PCT) -> np.ndarray:
+    return np.where(np.asarray(cuotas) == 1, float(desc_pct), 0.0)
+
+
+def total_transfer(lista: ArrayLike, cuotas: ArrayLike, desc_pct: float = TRANSFER_DESC_PCT) -> np.ndarray:
+    """Total pagando por transferencia: `desc_pct`% OFF sobre la lista solo en 1 pago."""
+    return np.asarray(lista, dtype=float) * (1.0 - transfer_desc_pct(cuotas, desc_pct) / 100.0)
+
+
+def cuota_teorica(total: ArrayLike, cuotas: ArrayLike) -> np.ndarray:
+    """Monto de cada cuota si el total se reparte sin interés (0 en 1 pago)."""
+    total = np.asarray(total, dtype=float)
+    c = np.asarray(cuotas, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where((c > 1) & ~np.isnan(total), total / c, 0.0)
+
+
+def anticipo_teorico(total: ArrayLike, cuotas: ArrayLike) -> np.ndarray:
+    total = np.asarray(total, dtype=float)
+    c = np.asarray(cuotas, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(c > 0, total / c, np.nan)
+
+
+def hoggax_12m(
+    alquiler: ArrayLike,
+    expensas: ArrayLike,
+    scenario_id: Optional[ArrayLike] = None,
+    meses: ArrayLike = 12,
+) -> dict[str, np.ndarray]:
+    """
+    Cotización Hoggax de 12 meses por regla, para N escenarios a la vez.
+    Devuelve columnas (HOGGAX_COLUMNS) con una fila por escenario y plan, en el mismo
+    orden que la API: escenario 0 plan 1, escenario 0 plan 3, escenario 1 plan 1, ...
+    """
+    alq = np.atleast_1d(np.asarray(alquiler, dtype=np.int64))
+    exp = np.broadcast_to(np.asarray(expensas, dtype=np.int64), alq.shape)
+    n = len(alq)
+    k = len(HOGGAX_12M_PLANES)
+
+    base = np.repeat(alq + exp, k)
+    cuotas = np.tile(np.array([p[0] for p in HOGGAX_12M_PLANES], dtype=np.int64), n)
+    desc = np.tile(np.array([p[3] for p in HOGGAX_12M_PLANES]), n)
+    total = np.rint(base * (1.0 - desc / 100.0)).astype(np.int64)
+    with np.errstate(divide="ignore"):
+        monto_cuota = np.where(cuotas > 1, np.rint(base / cuotas), 0).astype(np.int64)
+
+    # sin scenario_id: el índice del escenario en la entrada
+    ids = np.arange(n) if scenario_id is None else np.atleast_1d(np.asarray(scenario_id))
+    return {
+        "scenario_id": np.repeat(ids, k),
+        "alquiler": np.repeat(alq, k),
+        "expensas": np.repeat(exp, k),
+        "alq_exp": base,
+        "meses": np.repeat(np.broadcast_to(np.asarray(meses, dtype=np.int64), alq.shape), k),
+        "cuotas": cuotas,
+        "plan_texto": np.tile(np.array([p[1] for p in HOGGAX_12M_PLANES], dtype=object), n),
+        "plan_subtexto": np.tile(np.array([p[2] for p in HOGGAX_12M_PLANES], dtype=object), n),
+        "hoggax_sin_desc": base,
+        "hoggax_total_web": total,
+        "hoggax_monto_cuota": monto_cuota,
+    }
+
+
+def hoggax_12m_rows(scenarios: Sequence[Mapping[str, Any]]) -> list[dict]:
+    """hoggax_12m para escenarios como dicts (el path del crawl): filas con tipos Python."""
+    if not scenarios:
+        return []
+    cols = hoggax_12m(
+        [int(s["alquiler"]) for s in scenarios],
+        [int(s["expensas"]) for s in scenarios],
+        scenario_id=[str(s["scenario_id"]) for s in scenarios],
+        meses=[int(s["meses"]) for s in scenarios],
+    )
+    return to_records(cols)
+
+
+def to_records(cols: Mapping[str, np.ndarray]) -> list[dict]:
+    """Columnas -> lista de dicts (valores Python nativos, listos para CSV/JSON)."""
+    names = list(cols)
+    return [dict(zip(names, vals)) for vals in zip(*(np.asarray(cols[c]).tolist() for c in names))]
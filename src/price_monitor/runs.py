@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+
+_TS_RE = re.compile(r"\d{4}-\d{2}-\d{2}T\d{6}Z")
+
+
+def manifest_path(jsonl_path: Path) -> Path:
+    return jsonl_path.with_suffix(".manifest.json")
+
+
+def run_files(out_dir: Path, prefix: str = "finaer_") -> list[Path]:
+    """
+    JSONL de corridas (<prefix><ts>.jsonl) en out_dir, de la más vieja a la más nueva.
+    Quedan afuera .errors.jsonl y los _shard<i>of<N>.jsonl: esos son porciones de una
+    corrida, que se usan juntadas (`price-monitor merge`).
+    """
+    runs = []
+    for p in Path(out_dir).glob(f"{prefix}*.jsonl"):
+        m = _TS_RE.search(p.name)
+        if m and p.name.count(".") == 1 and p.stem.endswith(m.group(0)):
+            runs.append((m.group(0), p.name, p))
+    return [p for _, _, p in sorted(runs)]
+
+
+def latest_run(out_dir: Path, prefix: str = "finaer_") -> Path:
+    """La corrida más nueva de run_files(); SystemExit si no hay ninguna."""
+    runs = run_files(out_dir, prefix)
+    if runs:
+        return runs[-1]
+    shards = sorted(Path(out_dir).glob(f"{prefix}*_shard*of*.jsonl"))
+    if shards:
+        raise SystemExit(f"En {out_dir}/ solo hay corridas con --shard: juntalas con `price-monitor merge`")
+    raise SystemExit(f"No hay {out_dir}/{prefix}*.jsonl (corré primero: python -m price_monitor.cli)")
+
+
+def completed_ids_from_jsonl(path: Path, key: Optional[Callable[[dict], str]] = None) -> set[str]:
+    """
+    scenario_id (o `key(registro)`) de cada línea completa del JSONL
+    (una línea cortada por un crash se ignora).
+    """
+    ids: set[str] = set()
+    if not path.exists():
+        return ids
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n") or not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+                ids.add(key(rec) if key is not None else str(rec["scenario_id"]))
+            except (ValueError, KeyError):
+                continue
+    return ids
+
+
+def truncate_partial_line(path: Path) -> None:
+    """Si el JSONL quedó con una última línea a medias (crash), la corta antes de seguir appendeando."""
+    if not path.exists() or path.stat().st_size == 0:
+        return
+    with path.open("rb+") as f:
+        data = f.read()
+        if data.endswith(b"\n"):
+            return
+        f.truncate(data.rfind(b"\n") + 1)
+
+
+def resolve_run(run: str, out_dir: Path, provider: str, suffix: str = "") -> tuple[str, Path]:
+    """
+    `run` puede ser el timestamp de la corrida (2026-02-09T133914Z) o el path del
+    JSONL / manifest. Devuelve (ts, path del JSONL). `suffix` va después del timestamp
+    (ej. "_shard1of4" en corridas con --shard).
+    """
+    p = Path(run)
+    if p.exists():
+        m = _TS_RE.search(p.name)
+        if not m:
+            raise SystemExit(f"No puedo sacar el timestamp de la corrida de {p.name}")
+        name = p.name.split(".", 1)[0]
+        return m.group(0), p.with_name(f"{name}.jsonl")
+
+    m = _TS_RE.fullmatch(run.strip())
+    if not m:
+        raise SystemExit(f"--resume inválido: {run!r} (timestamp o path de la corrida)")
+    return run.strip(), out_dir / f"{provider}_{run.strip()}{suffix}.jsonl"
+
+
+class RunManifest:
+    """
+    Estado de una corrida (finaer_<ts>.manifest.json): qué escenarios ya terminaron.
+    Se guarda de forma atómica, como mucho cada `save_every` segundos; el JSONL es la
+    fuente de verdad si el proceso muere entre dos guardados.
+    """
+
+    def __init__(self, path: Path, *, ts: str, provider: str, save_every: float = 2.0):
+        self.path = path
+        self.ts = ts
+        self.provider = provider
+        self.save_every = save_every
+        self.created = datetime.now(timezone.utc).isoformat()
+        self.total = 0
+        self.completed: set[str] = set()
+        self.finished = False
+        self._last_save = 0.0
+        self._save_cost = 0.0
+
+    @classmethod
+    def load(cls, path: Path) -> "RunManifest":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        m = cls(path, ts=data["ts_utc"], provider=data["provider"])
+        m.created = data.get("created", m.created)
+        m.total = int(data.get("total") or 0)
+        m.completed = set(map(str, data.get("completed") or []))
+        m.finished = bool(data.get("finished"))
+        return m
+
+    @classmethod
+    def open(
+        cls,
+        jsonl_path: Path,
+        *,
+        ts: str,
+        provider: str,
+        resume: bool,
+        key: Optional[Callable[[dict], str]] = None,
+    ) -> "RunManifest":
+        path = manifest_path(jsonl_path)
+        if resume and path.exists():
+            m = cls.load(path)
+            if m.provider != provider:
+                raise SystemExit(f"La corrida {m.ts} es de {m.provider}, no de {provider}")
+        else:
+            m = cls(path, ts=ts, provider=provider)
+        if resume:
+            m.completed |= completed_ids_from_jsonl(jsonl_path, key)
+        return m
+
+    def pending(self, scenarios: Iterable[dict]) -> list[dict]:
+        return [s for s in scenarios if str(s["scenario_id"]) not in self.completed]
+
+    def mark_done(self, scenario_id: str) -> None:
+        self.completed.add(str(scenario_id))
+        self.save()
+
+    def save(self, force: bool = False) -> None:
+        now = time.monotonic()
+        # con muchos escenarios (grillas) guardar cuesta: que nunca se lleve más de ~5% del tiempo
+        if not force and now - self._last_save < max(self.save_every, 20 * self._save_cost):
+            return
+        self._last_save = now
+        data = {
+            "ts_utc": self.ts,
+            "provider": self.provider,
+            "created": self.created,
+            "updated": datetime.now(timezone.utc).isoformat(),
+            "total": self.total,
+            "finished": self.finished,
+            "completed": sorted(self.completed),
+        }
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._save_cost = time.monotonic() - now
+
+    def finish(self, finished: Optional[bool] = None) -> None:
+        self.finished = len(self.completed) >= self.total if finished is None else finished
+        self.save(force=True)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Optional
+
+import pandas as pd
+
+from price_monitor import rules
+
+
+# Muestreo estratificado con presupuesto: para las matrices segmento x plazo no hace
+# falta cotizar toda la grilla. Los estratos son segmento (alq+exp) x meses x
+# tipo_garantia, el presupuesto se reparte proporcional al tamaño de cada estrato (con
+# un mínimo de MIN_PER_STRATUM para poder estimar la varianza) y dentro de cada estrato
+# entran los escenarios con menor hash(seed, scenario_id): misma seed + mismos
+# escenarios = misma muestra, sin importar el orden.
+#
+# Las cuotas no son un eje de estratificación posible: una cotización trae todos los
+# planes (cuotas) del escenario, así que cada escenario muestreado cubre todas.
+
+SEGMENTOS = rules.segment_labels()
+STRATA_COLUMNS = ["segmento", "meses", "tipo_garantia"]
+MIN_PER_STRATUM = 2
+
+
+def segmento(alq_exp: float) -> str:
+    return SEGMENTOS[int(rules.segment_index(alq_exp))]
+
+
+def stratum(s: Mapping[str, Any]) -> str:
+    """ "hasta 500k|12|0": segmento|meses|tipo_garantia (string para poder guardarlo en JSON)."""
+    alq_exp = float(s["alquiler"]) + float(s.get("expensas") or 0)
+    return f"{segmento(alq_exp)}|{int(s['meses'])}|{int(bool(s.get('tipo_garantia', False)))}"
+
+
+def _rank(seed: int, scenario_id: Any) -> int:
+    h = hashlib.blake2b(f"{seed}|{scenario_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(h, "big")
+
+
+def allocate(sizes: Mapping[str, int], budget: int, min_per_stratum: int = MIN_PER_STRATUM) -> dict[str, int]:
+    """
+    Escenarios por estrato: proporcional al tamaño (restos mayores), con piso
+    `min_per_stratum` (o el estrato entero si es más chico). Si los pisos solos superan
+    el presupuesto, el presupuesto se estira hasta cubrirlos.
+    """
+    floors = {k: min(n, min_per_stratum) for k, n in sizes.items()}
+    total = sum(sizes.values())
+    if budget >= total:
+        return dict(sizes)
+    rest = budget - sum(floors.values())
+    if rest <= 0:
+        return floors
+
+    # lo que falta se reparte proporcional a lo que le queda a cada estrato
+    room = {k: sizes[k] - floors[k] for k in sizes}
+    room_total = sum(room.values())
+    quota = {k: rest * r / room_total for k, r in room.items()}
+    alloc = {k: floors[k] + int(q) for k, q in quota.items()}
+    left = budget - sum(alloc.values())
+    for k in sorted(quota, key=lambda k: quota[k] - int(quota[k]), reverse=True):
+        if left <= 0:
+            break
+        if alloc[k] < sizes[k]:
+            alloc[k] += 1
+            left -= 1
+    return alloc
+
+
+@dataclass
+class SamplePlan:
+    """Qué se muestreó: tamaño de cada estrato (N_h) y cuántos entraron (n_h). Va al lado del JSONL."""
+
+    seed: int
+    budget: int
+    population: dict[str, int] = field(default_factory=dict)
+    sample: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def fraction(self) -> float:
+        total = sum(self.population.values())
+        return sum(self.sample.values()) / total if total else 0.0
+
+    def save(self, path: Path) -> Path:
+        path.write_text(
+            json.dumps(
+                {"seed": self.seed, "budget": self.budget, "population": self.population, "sample": self.sample},
+                ensure_ascii=False,
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "SamplePlan":
+        d = json.loads(path.read_text(encoding="utf-8"))
+        return cls(int(d["seed"]), int(d["budget"]), dict(d["population"]), dict(d["sample"]))
+
+    @classmethod
+    def for_run(cls, jsonl_path: Path) -> Optional["SamplePlan"]:
+        """El plan de una corrida muestreada, o None si la corrida es completa."""
+        p = sample_path(jsonl_path)
+        return cls.load(p) if p.exists() else None
+
+
+def sample_path(jsonl_path: Path) -> Path:
+    return jsonl_path.with_suffix(".sample.json")
+
+
+def stratified_sample(scenarios: Iterable[dict], budget: int, seed: int = 0) -> tuple[list[dict], SamplePlan]:
+    """
+    Hasta `budget` escenarios, estratificados. `scenarios` se recorre dos veces (tamaños y
+    selección): una lista o una GridSpec, no un generador. En memoria queda solo la muestra.
+    """
+    if budget < 1:
+        raise ValueError(f"Presupuesto inválido: {budget}")
+    sizes: dict[str, int] = {}
+    for s in scenarios:
+        k = stratum(s)
+        sizes[k] = sizes.get(k, 0) + 1
+    alloc = allocate(sizes, budget)
+
+    # por estrato, un heap con los n_h de menor rank (max-heap via -rank)
+    heaps: dict[str, list[tuple[int, int, dict]]] = {k: [] for k in sizes}
+    for i, s in enumerate(scenarios):
+        k = stratum(s)
+        n_h = alloc[k]
+        if n_h == 0:
+            continue
+        item = (-_rank(seed, s["scenario_id"]), i, s)
+        h = heaps[k]
+        if len(h) < n_h:
+            heapq.heappush(h, item)
+        elif item[0] > h[0][0]:
+            heapq.heapreplace(h, item)
+
+    chosen = sorted((item for h in heaps.values() for item in h), key=lambda item: item[1])
+    plan = SamplePlan(seed, budget, dict(sorted(sizes.items())), {k: len(heaps[k]) for k in sorted(sizes)})
+    return [s for _, _, s in chosen], plan
+
+
+def cell_stats(df: pd.DataFrame, value: str, by: list[str], plan: Optional[SamplePlan] = None) -> pd.DataFrame:
+    """
+    Media, error estándar y n de `value` por celda `by` (ej. segmento x meses).
+
+    Sin plan (corrida completa) la media es la de siempre y se = NaN. Con plan, cada celda
+    se estima como estratificada sobre los estratos que contiene:
+        media = sum W_h * media_h
+        var   = sum W_h^2 * (1 - n_h/N_h) * s_h^2 / n_h
+    con W_h = N_h / N de la celda. `df` tiene que traer las columnas de STRATA_COLUMNS.
+    """
+    if plan is None:
+        g = df.groupby(by, as_index=False).agg(mean=(value, "mean"), n=(value, "count"))
+        g["se"] = math.nan
+        return g[by + ["mean", "se", "n"]]
+
+    d = df.dropna(subset=[value]).copy()
+    d["_stratum"] = [
+        f"{seg}|{int(m)}|{int(bool(tg))}" for seg, m, tg in zip(d["segmento"], d["meses"], d["tipo_garantia"])
+    ]
+    h = d.groupby(by + ["_stratum"], as_index=False).agg(
+        mean_h=(value, "mean"), var_h=(value, "var"), n_h=(value, "count")
+    )
+    # N_h del plan; si el estrato no está (no debería) se toma como censado
+    h["N_h"] = [max(plan.population.get(k, n), n) for k, n in zip(h["_stratum"], h["n_h"])]
+    fpc = 1.0 - h["n_h"] / h["N_h"]
+    # n_h = 1: sin varianza estimable, salvo que el estrato esté completo
+    h["v_h"] = (fpc * h["var_h"] / h["n_h"]).where(h["n_h"] > 1, 0.0).where((h["n_h"] > 1) | (fpc <= 0), math.nan)
+
+    rows = []
+    for key, cell in h.groupby(by, sort=True):
+        w = cell["N_h"] / cell["N_h"].sum()
+        key = key if isinstance(key, tuple) else (key,)
+        rows.append(
+            dict(
+                zip(by, key),
+                mean=float((w * cell["mean_h"]).sum()),
+                se=float(math.sqrt((w**2 * cell["v_h"]).sum(min_count=len(cell)))),
+                n=int(cell["n_h"].sum()),
+            )
+        )
+    return pd.DataFrame(rows, columns=by + ["mean", "se", "n"])
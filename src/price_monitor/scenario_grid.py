@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, Mapping, Optional, Sequence, Union
+
+
+# Grilla de escenarios declarativa y lazy: los ejes son listas o rangos (range no
+# materializa nada) y los escenarios salen de a uno, así una grilla de millones de
+# puntos se recorre en memoria constante, sin pasar por un CSV.
+#
+# Spec JSON (price-monitor --grid spec.json / price-monitor grid spec.json):
+#   {
+#     "alquiler": {"start": 100000, "stop": 2000000, "step": 1000},   # stop inclusive
+#     "expensas": [0, 50000],
+#     "meses": [12, 24, 36],
+#     "tipo_garantia": [false],
+#     "min_alq_exp": 0, "max_alq_exp": 2000000,
+#     "id_format": null                                                # ej: "S_{alquiler}_{meses}"
+#   }
+
+Axis = Sequence[Any]
+AxisSpec = Union[Sequence[Any], Mapping[str, int], str]
+
+FIELDS = ["scenario_id", "alquiler", "expensas", "meses", "tipo_garantia", "run"]
+
+
+def scenario_id(alquiler: int, expensas: int, meses: int, tipo_garantia: bool) -> str:
+    """Id estable: el mismo punto tiene el mismo id en cualquier grilla (resume, fingerprints, daemon)."""
+    key = f"{int(alquiler)}|{int(expensas)}|{int(meses)}|{int(bool(tipo_garantia))}"
+    return "G" + hashlib.blake2b(key.encode("ascii"), digest_size=8).hexdigest()
+
+
+def axis(spec: AxisSpec) -> Axis:
+    """
+    Eje de la grilla:
+    - lista de valores
+    - {"start", "stop", "step"} (stop inclusive) -> range lazy
+    - "start:stop:step" o "a,b,c" (para la línea de comandos)
+    """
+    if isinstance(spec, str):
+        if ":" in spec:
+            start, stop, *step = (int(x.replace("_", "")) for x in spec.split(":"))
+            return range(start, stop + 1, step[0] if step else 1)
+        return [_scalar(x) for x in spec.split(",") if x.strip()]
+    if isinstance(spec, Mapping):
+        step = int(spec.get("step", 1))
+        if step <= 0:
+            raise ValueError(f"step inválido: {step}")
+        return range(int(spec["start"]), int(spec["stop"]) + 1, step)
+    return list(spec)
+
+
+def _scalar(x: str) -> Any:
+    x = x.strip().replace("_", "")
+    if x.lower() in ("true", "false"):
+        return x.lower() == "true"
+    return int(x)
+
+
+@dataclass
+class GridSpec:
+    alquiler: Axis
+    expensas: Axis = (0,)
+    meses: Axis = (12, 24, 36)
+    tipo_garantia: Axis = (False,)
+    min_alq_exp: Optional[int] = None
+    max_alq_exp: Optional[int] = None
+    id_format: Optional[str] = None
+    constraints: list[Callable[[dict], bool]] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "GridSpec":
+        return cls(
+            alquiler=axis(data["alquiler"]),
+            expensas=axis(data.get("expensas", [0])),
+            meses=axis(data.get("meses", [12, 24, 36])),
+            tipo_garantia=[bool(x) for x in axis(data.get("tipo_garantia", [False]))],
+            min_alq_exp=data.get("min_alq_exp"),
+            max_alq_exp=data.get("max_alq_exp"),
+            id_format=data.get("id_format"),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "GridSpec":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def size(self) -> int:
+        """Puntos antes de aplicar restricciones (cota superior)."""
+        return len(self.alquiler) * len(self.expensas) * len(self.meses) * len(self.tipo_garantia)
+
+    def _ok(self, alquiler: int, expensas: int) -> bool:
+        alq_exp = alquiler + expensas
+        if self.min_alq_exp is not None and alq_exp < self.min_alq_exp:
+            return False
+        return self.max_alq_exp is None or alq_exp <= self.max_alq_exp
+
+    def points(self) -> Iterator[tuple[int, int, int, bool]]:
+        """(alquiler, expensas, meses, tipo_garantia) que cumplen min/max_alq_exp, sin armar dicts."""
+        # loops anidados y no itertools.product: product copia cada eje a una tupla
+        for alq in self.alquiler:
+            for exp in self.expensas:
+                if not self._ok(alq, exp):
+                    continue
+                for m in self.meses:
+                    for tg in self.tipo_garantia:
+                        yield alq, exp, m, tg
+
+    def __iter__(self) -> Iterator[dict]:
+        for alq, exp, m, tg in self.points():
+            s = {"alquiler": int(alq), "expensas": int(exp), "meses": int(m), "tipo_garantia": bool(tg), "run": True}
+            if self.constraints and not all(c(s) for c in self.constraints):
+                continue
+            s["scenario_id"] = self.id_format.format(**s) if self.id_format else scenario_id(alq, exp, m, tg)
+            yield s
+
+    def count(self) -> int:
+        """Escenarios reales (con restricciones): recorre la grilla sin guardarla."""
+        if not self.constraints:
+            return sum(1 for _ in self.points())
+        return sum(1 for _ in self)
+
+    def write_csv(self, path: Path) -> int:
+        """Escribe la grilla como scenarios.csv (streaming). Devuelve la cantidad de filas."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        n = 0
+        with path.open("w", encoding="utf-8", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=FIELDS, lineterminator="\n")
+            w.writeheader()
+            for s in self:
+                w.writerow(s)
+                n += 1
+        return n
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="price-monitor grid",
+        description="Cuenta o escribe a CSV una grilla de escenarios (spec JSON o ejes por línea de comandos)",
+    )
+    p.add_argument("spec", type=Path, nargs="?", default=None, help="spec JSON de la grilla")
+    p.add_argument("--alquiler", default=None, help='eje de alquiler: "start:stop:step" o "a,b,c"')
+    p.add_argument("--expensas", default="0")
+    p.add_argument("--meses", default="12,24,36")
+    p.add_argument("--tipo-garantia", default="false")
+    p.add_argument("--max-alq-exp", type=int, default=None)
+    p.add_argument("--out", type=Path, default=None, help="escribir la grilla como CSV de escenarios")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _parse_args(argv)
+    if args.spec is not None:
+        spec = GridSpec.load(args.spec)
+    elif args.alquiler is not None:
+        spec = GridSpec(
+            alquiler=axis(args.alquiler),
+            expensas=axis(args.expensas),
+            meses=axis(args.meses),
+            tipo_garantia=axis(args.tipo_garantia),
+            max_alq_exp=args.max_alq_exp,
+        )
+    else:
+        raise SystemExit("Pasá un spec JSON o al menos --alquiler")
+
+    if args.out is None:
+        print(f"Grilla: {spec.count():,} escenarios (cota {spec.size():,})")
+        return
+    n = spec.write_csv(args.out)
+    print(f"Wrote {n} scenarios -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
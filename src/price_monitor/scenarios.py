@@ -2,9 +2,25 @@ from __future__ import annotations
 
 from pathlib import Path
 import csv
+import importlib.util
+from typing import Iterator, Optional
+
 import pandas as pd
 
 
+REQUIRED = ["scenario_id", "alquiler", "expensas", "meses", "tipo_garantia", "run"]
+INT_COLUMNS = ["alquiler", "expensas", "meses"]
+BOOL_COLUMNS = ["tipo_garantia", "run"]
+TRUE_VALUES = {"true", "1", "yes", "si", "sí"}
+
+# filas por chunk al leer CSVs grandes con el engine C
+CHUNKSIZE = 1_000_000
+
+# Parquet / Feather: extra opcional [parquet] (pyarrow)
+COLUMNAR_SUFFIXES = (".parquet", ".pq", ".feather", ".arrow")
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
 def _sniff_delimiter(path: str | Path) -> str:
     with open(path, "r", encoding="utf-8-sig", newline="") as f:
         sample = f.read(4096)
@@ -15,30 +31,170 @@ def _sniff_delimiter(path: str | Path) -> str:
         return ","
 
 
-def load_scenarios_csv(path: str | Path) -> pd.DataFrame:
+def _header(path: str | Path, delim: str) -> list[str]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return next(csv.reader(f, delimiter=delim), [])
+
+
+def _norm(c: str) -> str:
+    return c.strip().lstrip("\ufeff").lower()
+
+
+def _csv_layout(path: str | Path) -> tuple[str, dict[str, str]]:
+    """Separador y {columna original: normalizada}, validado. Se lee una sola vez por archivo."""
     delim = _sniff_delimiter(path)
+    names = {c: _norm(c) for c in _header(path, delim)}
+    _check_columns(names.values(), delim)
+    return delim, names
 
-    df = pd.read_csv(
-        path,
-        sep=delim,
-        encoding="utf-8-sig",
-        on_bad_lines="skip",
-        engine="python",
-    )
 
-    df.columns = [c.strip().lstrip("\ufeff").lower() for c in df.columns]
+def _truthy(s: pd.Series) -> pd.Series:
+    """true/1/yes/si/sí -> True. Evalúa solo los valores distintos (pocos) y no cada fila."""
+    if s.dtype == bool:
+        return s
+    values = s.dropna().unique()
+    true = [v for v in values if str(v).strip().lower() in TRUE_VALUES]
+    return s.isin(true)
 
-    required = {"scenario_id", "alquiler", "expensas", "meses", "tipo_garantia", "run"}
-    missing = sorted(required - set(df.columns))
+
+def _check_columns(columns, delim: Optional[str] = None) -> None:
+    missing = sorted(set(REQUIRED) - set(columns))
     if missing:
         raise ValueError(
-            f"CSV inválido. Faltan columnas: {missing}. Columnas presentes: {list(df.columns)}. "
+            f"CSV inválido. Faltan columnas: {missing}. Columnas presentes: {list(columns)}. "
             f"Separador detectado: {repr(delim)}"
         )
 
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
     df["alquiler"] = df["alquiler"].astype(int)
     df["expensas"] = df["expensas"].astype(int)
     df["meses"] = df["meses"].astype(int)
-    df["tipo_garantia"] = df["tipo_garantia"].astype(str).str.strip().str.lower().isin(["true", "1", "yes", "si", "sí"])
-    df["run"] = df["run"].astype(str).str.strip().str.lower().isin(["true", "1", "yes", "si", "sí"])
+    for c in BOOL_COLUMNS:
+        df[c] = _truthy(df[c])
     return df
+
+
+def iter_scenarios_csv(
+    path: str | Path,
+    *,
+    only_run: bool = False,
+    chunksize: int = CHUNKSIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    CSV de escenarios de a chunks ya tipados (engine C, dtypes declarados). Con
+    `only_run` el filtro run=true se aplica en cada chunk: nunca se junta lo descartado.
+    """
+    delim, names = _csv_layout(path)
+    return _iter_csv(path, delim, names, only_run, chunksize)
+
+
+def _iter_csv(
+    path: str | Path, delim: str, names: dict[str, str], only_run: bool, chunksize: int
+) -> Iterator[pd.DataFrame]:
+    # dtypes por nombre original de columna; los booleanos como category (pocos valores distintos)
+    dtype: dict[str, object] = {}
+    for orig, c in names.items():
+        if c == "scenario_id":
+            dtype[orig] = str
+        elif c in INT_COLUMNS:
+            dtype[orig] = "int64"
+        elif c in BOOL_COLUMNS:
+            dtype[orig] = "category"
+
+    reader = pd.read_csv(
+        path,
+        sep=delim,
+        encoding="utf-8-sig",
+        on_bad_lines="skip",
+        engine="c",
+        dtype=dtype,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        chunk.columns = [names.get(c, _norm(c)) for c in chunk.columns]
+        chunk = _typed(chunk)
+        if only_run:
+            chunk = chunk[chunk["run"]]
+        yield chunk
+
+
+def load_scenarios_csv(path: str | Path, *, only_run: bool = False) -> pd.DataFrame:
+    """
+    Escenarios tipados (alquiler/expensas/meses int, tipo_garantia/run bool).
+    `only_run=True` devuelve solo los run=true, filtrando mientras lee.
+    """
+    delim, names = _csv_layout(path)
+    try:
+        chunks = list(_iter_csv(path, delim, names, only_run, CHUNKSIZE))
+    except (ValueError, pd.errors.ParserError):
+        # CSVs "a mano" con valores raros (ej. 499999.0 en alquiler): el camino lento de siempre
+        return _load_scenarios_csv_python(path, delim, only_run)
+    if not chunks:
+        return pd.DataFrame(columns=REQUIRED)
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    return df.reset_index(drop=True) if only_run else df
+
+
+def _load_scenarios_csv_python(path: str | Path, delim: str, only_run: bool) -> pd.DataFrame:
+    df = pd.read_csv(
+        path,
+        sep=delim,
+        encoding="utf-8-sig",
+        on_bad_lines="skip",
+        engine="python",
+    )
+
+    df.columns = [_norm(c) for c in df.columns]
+    _check_columns(df.columns, delim)
+    df = _typed(df)
+    return df[df["run"]].reset_index(drop=True) if only_run else df
+
+
+def load_scenario_records(path: str | Path, *, only_run: bool = False) -> list[dict]:
+    """
+    Escenarios como lista de dicts (lo que consume el crawl). En CSV cada chunk se pasa a
+    dicts y se descarta: nunca están el DataFrame entero ni el concat de los chunks en memoria.
+    """
+    path = Path(path)
+    if path.suffix.lower() in COLUMNAR_SUFFIXES:
+        return load_scenarios(path, only_run=only_run).to_dict("records")
+
+    delim, names = _csv_layout(path)
+    records: list[dict] = []
+    try:
+        for chunk in _iter_csv(path, delim, names, only_run, CHUNKSIZE):
+            records.extend(chunk.to_dict("records"))
+    except (ValueError, pd.errors.ParserError):
+        return _load_scenarios_csv_python(path, delim, only_run).to_dict("records")
+    return records
+
+
+def load_scenarios(path: str | Path, *, only_run: bool = False) -> pd.DataFrame:
+    """
+    Escenarios desde CSV, Parquet (.parquet / .pq) o Feather (.feather / .arrow).
+    Parquet y Feather requieren pyarrow; en Parquet el filtro run=true lo hace el reader.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix not in COLUMNAR_SUFFIXES:
+        return load_scenarios_csv(path, only_run=only_run)
+
+    if not _HAS_PYARROW:
+        raise SystemExit(f"Leer {path.name} requiere pyarrow: pip install 'price-monitor[parquet]' (o pip install pyarrow)")
+
+    if suffix in (".parquet", ".pq"):
+        filters = [("run", "==", True)] if only_run else None
+        try:
+            df = pd.read_parquet(path, filters=filters)
+        except Exception:
+            # run guardado como texto ("true"/"1"): se filtra después de tipar
+            df = pd.read_parquet(path)
+    else:
+        df = pd.read_feather(path)
+
+    df.columns = [_norm(c) for c in df.columns]
+    _check_columns(df.columns)
+    df = _typed(df)
+    df["scenario_id"] = df["scenario_id"].astype(str)
+    return df[df["run"]].reset_index(drop=True) if only_run else df
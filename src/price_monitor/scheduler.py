@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable, Iterable, Iterator, Mapping, Optional
+
+from price_monitor.coalesce import group_by_key
+from price_monitor.engine import EngineStats, run_jobs
+from price_monitor.fingerprints import FingerprintStore, fingerprint
+from price_monitor.providers import Provider
+from price_monitor.ratecontrol import ProviderControl
+from price_monitor import tracing
+
+
+# escenarios locales (reglas) que se cotizan juntos cuando la entrada es un stream
+LOCAL_BATCH = 10_000
+
+
+def scenario_of(s: Mapping[str, Any]) -> dict:
+    return {
+        "alquiler": int(s["alquiler"]),
+        "expensas": int(s["expensas"]),
+        "meses": int(s["meses"]),
+        "tipo_garantia": bool(s.get("tipo_garantia", False)),
+    }
+
+
+def run_key(provider: str, scenario_id: Any) -> str:
+    """Id de un (proveedor, escenario) en corridas con varios proveedores (manifest / resume)."""
+    return f"{provider}:{scenario_id}"
+
+
+def make_record(
+    ts: str,
+    provider: str,
+    s: Mapping[str, Any],
+    normalized: Optional[dict],
+    quotes: list[dict],
+    raw: Any,
+    normalizer: Optional[str] = None,
+) -> dict:
+    """
+    Registro unificado del stream JSONL: uno por (escenario, proveedor). `normalizer`
+    es el Provider.normalizer_id() que produjo normalized/quotes.
+    """
+    rec = {
+        "ts_utc": ts,
+        "competitor": provider,
+        "scenario_id": s["scenario_id"],
+        "scenario": scenario_of(s),
+        "normalized": normalized,
+        "quotes": quotes,
+        "raw": raw,
+    }
+    if normalizer is not None:
+        rec["normalizer"] = normalizer
+    return rec
+
+
+def unchanged_record(ts: str, provider: str, s: Mapping[str, Any], fp: str, since: str) -> dict:
+    """
+    Respuesta idéntica a la última conocida: sin normalized/quotes/raw, solo desde cuándo
+    (los reportes la completan con fingerprints.resolved_records).
+    """
+    return {
+        "ts_utc": ts,
+        "competitor": provider,
+        "scenario_id": s["scenario_id"],
+        "scenario": scenario_of(s),
+        "unchanged_since": since,
+        "fingerprint": fp,
+    }
+
+
+def error_record(ts: str, provider: str, s: Mapping[str, Any], err: BaseException) -> dict:
+    return {
+        "ts_utc": ts,
+        "competitor": provider,
+        "scenario_id": s["scenario_id"],
+        "scenario": scenario_of(s),
+        "error": f"{type(err).__name__}: {err}",
+    }
+
+
+async def crawl_provider(
+    provider: Provider,
+    scenarios: Iterable[dict],
+    *,
+    ts: str,
+    client: Any,
+    emit: Callable[[dict], None],
+    emit_error: Callable[[dict], None],
+    control: Optional[ProviderControl] = None,
+    concurrency: int = 8,
+    rps: Optional[float] = None,
+    fingerprints: Optional[FingerprintStore] = None,
+    coalesce: bool = True,
+) -> EngineStats:
+    """
+    Cotiza `scenarios` contra un proveedor: los locales (reglas) todos juntos, el resto
+    con un request por payload único y el resultado repartido entre sus scenario_id.
+    Cada registro (OK o error) se entrega a `emit` / `emit_error` apenas termina.
+
+    Con `fingerprints`, una respuesta igual a la última conocida para ese escenario no
+    se normaliza: se emite un unchanged_record.
+
+    Con coalesce=False `scenarios` se consume como stream (ej. una GridSpec de millones
+    de puntos, todos distintos): un request por escenario y los locales de a LOCAL_BATCH,
+    en memoria constante.
+    """
+    name = provider.name
+    normalizer = provider.normalizer_id()
+
+    def emit_ok(s: Mapping[str, Any], norm: Optional[dict], quotes: list[dict], raw: Any, fp: Optional[str]) -> None:
+        rec = make_record(ts, name, s, norm, quotes, raw, normalizer)
+        if fp is not None:
+            rec["fingerprint"] = fp
+        emit(rec)
+        if fp is not None:
+            fingerprints.update(run_key(name, s["scenario_id"]), fp, ts)
+
+    def skip_unchanged(members: list[dict], fp: Optional[str]) -> list[dict]:
+        """Emite los que no cambiaron; devuelve los que hay que normalizar."""
+        if fp is None:
+            return members
+        todo = []
+        for s in members:
+            since = fingerprints.unchanged_since(run_key(name, s["scenario_id"]), fp)
+            if since is None:
+                todo.append(s)
+            else:
+                emit(unchanged_record(ts, name, s, fp, since))
+                print(f"OK {name} {s['scenario_id']} -> sin cambios desde {since}")
+        return todo
+
+    def emit_local(local: list[dict]) -> None:
+        if not local:
+            return
+        with tracing.span("local_records", name, n=len(local)):
+            records = provider.local_records(local)
+        for s, norm, quotes in records:
+            fp = fingerprint(norm) if fingerprints is not None else None
+            if skip_unchanged([s], fp):
+                emit_ok(s, norm, quotes, None, fp)
+
+    def stream(items: Iterable[dict]) -> Iterator[tuple[None, list[dict]]]:
+        batch: list[dict] = []
+        for s in items:
+            if not provider.is_local(s):
+                yield None, [s]
+                continue
+            batch.append(s)
+            if len(batch) >= LOCAL_BATCH:
+                emit_local(batch)
+                batch = []
+        emit_local(batch)
+
+    if coalesce:
+        scenarios = list(scenarios)
+        emit_local([s for s in scenarios if provider.is_local(s)])
+        api = [s for s in scenarios if not provider.is_local(s)]
+        groups: Iterable[tuple[Any, list[dict]]] = group_by_key(api, provider.payload_key)
+        if len(api) > len(groups):
+            print(f"Coalescing {name}: {len(api)} escenarios -> {len(groups)} requests únicos")
+    else:
+        groups = stream(scenarios)
+
+    async def fetch(group: tuple[Any, list[dict]]) -> dict:
+        return await provider.fetch(client, group[1][0])
+
+    def on_result(group: tuple[Any, list[dict]], raw: dict | None, err: BaseException | None) -> None:
+        members = group[1]
+        fp = None
+        if err is None and fingerprints is not None:
+            fp = fingerprint(raw)
+            members = skip_unchanged(members, fp)
+            if not members:
+                return
+
+        def normalize(s: dict) -> dict:
+            with tracing.span("normalize", name):
+                return provider.normalize(raw or {}, s)
+
+        # una sola normalización por grupo, salvo que el normalizador use el escenario
+        # (Hoggax): ahí cada miembro se normaliza con el suyo
+        norm = None
+        if err is None and not provider.normalize_uses_scenario:
+            try:
+                norm = normalize(members[0])
+            except Exception as e:
+                err = e
+
+        for s in members:
+            member_err = err
+            if member_err is None and provider.normalize_uses_scenario:
+                try:
+                    norm = normalize(s)
+                except Exception as e:
+                    member_err = e
+            if member_err is not None:
+                print(f"ERROR {name} {s['scenario_id']}: {member_err}")
+                emit_error(error_record(ts, name, s, member_err))
+                continue
+            quotes = provider.quotes(norm or {}, s)
+            emit_ok(s, norm, quotes, raw, fp)
+            print(f"OK {name} {s['scenario_id']} -> planes: {len(quotes)}")
+
+    stats = await run_jobs(
+        groups,
+        fetch,
+        concurrency=min(concurrency, provider.max_concurrency),
+        rps=provider.rps if rps is None else rps,
+        on_result=on_result,
+        control=control,
+    )
+    print(f"Throughput {name}: {stats.summary()}")
+    if control is not None:
+        print(f"Control: {control.summary()}")
+    return stats
+
+
+async def run_providers(
+    providers: list[Provider],
+    scenarios: dict[str, Iterable[dict]],
+    *,
+    ts: str,
+    clients: dict[str, Any],
+    emit: Callable[[dict], None],
+    emit_error: Callable[[dict], None],
+    controls: Optional[dict[str, ProviderControl]] = None,
+    concurrency: int = 8,
+    rps: Optional[float] = None,
+    fingerprints: Optional[FingerprintStore] = None,
+    coalesce: bool = True,
+) -> dict[str, EngineStats]:
+    """
+    Corre todos los proveedores a la vez, cada uno con sus límites (rps, concurrencia,
+    control), sobre el mismo stream de registros: el tiempo total es el del más lento,
+    no la suma. `scenarios[name]` son los pendientes de cada proveedor.
+    """
+    controls = controls or {}
+    results = await asyncio.gather(
+        *(
+            crawl_provider(
+                p,
+                scenarios.get(p.name, []),
+                ts=ts,
+                client=clients[p.name],
+                emit=emit,
+                emit_error=emit_error,
+                control=controls.get(p.name),
+                concurrency=concurrency,
+                rps=rps,
+                fingerprints=fingerprints,
+                coalesce=coalesce,
+            )
+            for p in providers
+        )
+    )
+    return {p.name: st for p, st in zip(providers, results)}
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import re
+import shutil
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Mapping, Optional
+
+from price_monitor.io.excel import jsonl_to_excel
+from price_monitor.io.files import JsonlWriter
+from price_monitor.runs import RunManifest, manifest_path
+from price_monitor.sampling import sample_path
+from price_monitor.scheduler import run_key
+
+
+# Sharding estático: `price-monitor --shard i/N` se queda con los escenarios cuyo hash
+# cae en la porción i (1..N). El hash es del punto (alquiler, expensas, meses,
+# tipo_garantia) y no del scenario_id: escenarios con el mismo payload caen en el mismo
+# shard y se siguen coalesciendo. Cada shard escribe <run>_<ts>_shard<i>of<N>.jsonl y
+# `price-monitor merge` los junta en una sola corrida.
+
+_SHARD_RE = re.compile(r"_shard(\d+)of(\d+)$")
+_TS_RE = re.compile(r"(\d{4}-\d{2}-\d{2}T\d{6}Z)")
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """ "2/4" -> (2, 4). i va de 1 a N."""
+    m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec or "")
+    if not m:
+        raise ValueError(f"--shard inválido: {spec!r} (esperado i/N, ej. 1/4)")
+    i, n = int(m.group(1)), int(m.group(2))
+    if n < 1 or not 1 <= i <= n:
+        raise ValueError(f"--shard inválido: {spec!r} (i tiene que estar entre 1 y N)")
+    return i, n
+
+
+def shard_tag(shard: Optional[tuple[int, int]]) -> str:
+    return "" if shard is None else f"_shard{shard[0]}of{shard[1]}"
+
+
+def shard_of(s: Mapping[str, Any], n: int) -> int:
+    """Shard (1..n) de un escenario: estable entre procesos, máquinas y versiones de Python."""
+    key = f"{int(s['alquiler'])}|{int(s['expensas'])}|{int(s['meses'])}|{int(bool(s.get('tipo_garantia', False)))}"
+    h = int.from_bytes(hashlib.blake2b(key.encode("ascii"), digest_size=8).digest(), "big")
+    return h % n + 1
+
+
+def in_shard(s: Mapping[str, Any], shard: Optional[tuple[int, int]]) -> bool:
+    return shard is None or shard[1] == 1 or shard_of(s, shard[1]) == shard[0]
+
+
+# ---------------- merge ----------------
+def _expand(patterns: Iterable[str]) -> list[Path]:
+    out: list[Path] = []
+    for pat in patterns:
+        matches = sorted(glob.glob(pat)) or [pat]
+        out.extend(Path(m) for m in matches if not m.endswith((".errors.jsonl", ".changes.json", ".manifest.json", ".sample.json")))
+    return sorted(set(out))
+
+
+def _run_of(path: Path) -> tuple[str, str]:
+    """finaer_2026-02-09T133914Z_shard1of4.jsonl -> ("finaer", "2026-02-09T133914Z")."""
+    stem = _SHARD_RE.sub("", path.name.split(".", 1)[0])
+    m = _TS_RE.search(stem)
+    if not m:
+        raise SystemExit(f"No puedo sacar el timestamp de la corrida de {path.name}")
+    return stem[: m.start()].rstrip("_"), m.group(1)
+
+
+def _read(path: Path) -> Iterator[dict]:
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            # una última línea cortada (shard que murió) se ignora
+            if not line.endswith("\n") or not line.strip():
+                continue
+            yield json.loads(line)
+
+
+def _rec_key(rec: Mapping[str, Any]) -> tuple[str, str]:
+    return str(rec.get("competitor")), str(rec.get("scenario_id"))
+
+
+def merge(
+    paths: list[Path],
+    out_dir: Optional[Path] = None,
+    ts: Optional[str] = None,
+) -> tuple[Path, int, int]:
+    """
+    Junta los JSONL de los shards (y sus .errors.jsonl) en <run>_<ts>.jsonl. Todos los
+    registros quedan con el mismo ts_utc (el del shard más viejo, o `ts`); el original
+    se guarda en shard_ts_utc. Dedup por (competitor, scenario_id): gana el registro del
+    shard más nuevo. Devuelve (path, registros, duplicados descartados).
+    """
+    if not paths:
+        raise SystemExit("Nada para mergear")
+    runs = {p: _run_of(p) for p in paths}
+    names = {name for name, _ in runs.values()}
+    if len(names) > 1:
+        raise SystemExit(f"Los shards son de corridas distintas: {sorted(names)}")
+    name = names.pop()
+    ts = ts or min(t for _, t in runs.values())
+    out_dir = out_dir or paths[0].parent
+    out_path = out_dir / f"{name}_{ts}.jsonl"
+    err_path = out_dir / f"{name}_{ts}.errors.jsonl"
+    if out_path in paths:
+        raise SystemExit(f"{out_path} es uno de los inputs")
+
+    # del más nuevo al más viejo: el primero que aparece para una key es el que queda
+    ordered = sorted(paths, key=lambda p: runs[p][1], reverse=True)
+    seen: set[tuple[str, str]] = set()
+    dups = 0
+    manifest = RunManifest(manifest_path(out_path), ts=ts, provider=name)
+    with JsonlWriter(out_path) as w:
+        for p in ordered:
+            for rec in _read(p):
+                k = _rec_key(rec)
+                if k in seen:
+                    dups += 1
+                    continue
+                seen.add(k)
+                w.write(rec | {"ts_utc": ts, "shard_ts_utc": rec.get("ts_utc")})
+                # mismo formato de keys que el manifest de cli: proveedor:scenario_id si son varios
+                manifest.completed.add(run_key(*k) if name == "quotes" else k[1])
+        n = w.count
+
+    n_err = 0
+    with JsonlWriter(err_path) as we:
+        for p in ordered:
+            ep = p.with_name(p.name.replace(".jsonl", ".errors.jsonl"))
+            if not ep.exists():
+                continue
+            for rec in _read(ep):
+                k = _rec_key(rec)
+                if k in seen:
+                    continue
+                seen.add(k)
+                we.write(rec | {"ts_utc": ts, "shard_ts_utc": rec.get("ts_utc")})
+        n_err = we.count
+    if not n_err:
+        err_path.unlink()
+
+    manifest.total = n + n_err
+    manifest.finish(n_err == 0)
+
+    # corrida muestreada (--sample): todos los shards llevan el mismo plan
+    plans = [sample_path(p) for p in ordered if sample_path(p).exists()]
+    if plans:
+        shutil.copyfile(plans[0], sample_path(out_path))
+    return out_path, n, dups
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="price-monitor merge",
+        description="Junta los JSONL de una corrida partida con --shard i/N en una sola corrida",
+    )
+    p.add_argument("inputs", nargs="+", help="JSONL de los shards (acepta globs, ej. 'output/finaer_*_shard*.jsonl')")
+    p.add_argument("--out-dir", type=Path, default=None, help="carpeta de salida (default: la del primer shard)")
+    p.add_argument("--ts", default=None, help="ts_utc de la corrida mergeada (default: el del shard más viejo)")
+    p.add_argument("--no-excel", action="store_true", help="no exportar a Excel")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _parse_args(argv)
+    paths = _expand(args.inputs)
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        raise SystemExit(f"No existen: {', '.join(map(str, missing))}")
+
+    shards = sorted({m.group(0) for p in paths if (m := _SHARD_RE.search(p.name.split(".", 1)[0]))})
+    print(f"Merge: {len(paths)} archivos ({', '.join(s.lstrip('_') for s in shards) or 'sin tag de shard'})")
+
+    out_path, n, dups = merge(paths, args.out_dir, args.ts)
+    print(f"Wrote JSONL ({n} registros, {dups} duplicados descartados) -> {out_path}")
+
+    if not args.no_excel and n:
+        xlsx_path = out_path.with_suffix(".xlsx")
+        jsonl_to_excel(out_path, xlsx_path)
+        print(f"Wrote Excel -> {xlsx_path}")
+
+
+if __name__ == "__main__":
+    main()
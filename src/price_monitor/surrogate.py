@@ -0,0 +1,520 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+import csv
+import json
+import math
+import random
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+import numpy as np
+
+from price_monitor.breakpoints import DEFAULT_OUT as BREAKPOINTS_JSON, load_breakpoints
+from price_monitor.clients.finaer import FinaerClient
+from price_monitor.clients.hoggax import MESES_TO_PLAZO, HoggaxClient, rows_12m, rows_from_response
+from price_monitor.fingerprints import resolved_records
+from price_monitor.normalize.finaer import normalize_finaer
+from price_monitor.scenarios import load_scenarios
+
+
+DEFAULT_MODEL = Path("output") / "surrogate.json"
+
+# qué se modela por proveedor (columnas de normalized.planes / filas Hoggax)
+TARGETS = {
+    "finaer": ("monto_final", "honorario_sin_descuentos"),
+    "hoggax": ("hoggax_total_web", "hoggax_sin_desc"),
+}
+
+
+@dataclass
+class Segment:
+    """Tramo lineal: y = slope * alq_exp + intercept para alq_exp en [lo, hi] (rango observado)."""
+
+    lo: float
+    hi: float
+    slope: float
+    intercept: float
+    n: int
+
+
+@dataclass
+class PiecewiseModel:
+    """
+    Modelo lineal por tramos de un target en función de alq_exp, para un
+    (provider, meses, tipo_garantia, cuotas). `bounds[i]` es donde empieza el tramo i (el 0 arranca en -inf):
+    un corte conocido (breakpoints.json) si lo hay; si no, el primer valor observado del tramo.
+    """
+
+    provider: str
+    meses: int
+    cuotas: int
+    target: str
+    segments: list[Segment]
+    bounds: list[float]
+    known_bounds: list[bool] = field(default_factory=list)
+    n: int = 0
+    max_rel_err: float = 0.0
+    rmse: float = 0.0
+    tipo_garantia: bool = False
+
+    @property
+    def lo(self) -> float:
+        return self.segments[0].lo
+
+    @property
+    def hi(self) -> float:
+        return self.segments[-1].hi
+
+    def segment_for(self, alq_exp: float) -> Segment:
+        return self.segments[max(0, bisect.bisect_right(self.bounds, alq_exp) - 1)]
+
+    def predict(self, alq_exp: float) -> float:
+        s = self.segment_for(alq_exp)
+        return s.slope * alq_exp + s.intercept
+
+    def predict_many(self, alq_exp: np.ndarray) -> np.ndarray:
+        x = np.asarray(alq_exp, dtype=float)
+        idx = np.clip(np.searchsorted(np.asarray(self.bounds), x, side="right") - 1, 0, len(self.segments) - 1)
+        slope = np.array([s.slope for s in self.segments])[idx]
+        intercept = np.array([s.intercept for s in self.segments])[idx]
+        return slope * x + intercept
+
+    def certain(self, alq_exp: float) -> bool:
+        """False fuera del rango observado o en un hueco entre tramos sin corte conocido."""
+        for i, s in enumerate(self.segments):
+            if s.lo <= alq_exp <= s.hi:
+                return True
+            if i + 1 < len(self.segments) and s.hi < alq_exp < self.segments[i + 1].lo:
+                return self.known_bounds[i + 1]
+        return False
+
+
+def _fit_line(x: np.ndarray, y: np.ndarray) -> tuple[float, float]:
+    if len(x) == 1 or np.ptp(x) == 0:
+        # un solo punto: proporcional (tasa * alq_exp), que es la forma de las tarifas
+        return float(y.mean() / x.mean()) if x.mean() else 0.0, 0.0
+    slope, intercept = np.polyfit(x, y, 1)
+    return float(slope), float(intercept)
+
+
+def _split_segments(x: np.ndarray, y: np.ndarray, rel_tol: float) -> list[tuple[int, int]]:
+    """
+    Cortes greedy sobre puntos ordenados por x: un punto sigue en el tramo si la recta del
+    tramo (o la tasa y/x, si el tramo tiene un solo punto) lo predice dentro de `rel_tol`.
+    """
+    spans: list[tuple[int, int]] = []
+    start = 0
+    slope, intercept = _fit_line(x[:1], y[:1])
+    for i in range(1, len(x)):
+        pred = slope * x[i] + intercept
+        if math.isclose(pred, y[i], rel_tol=rel_tol, abs_tol=1.0):
+            slope, intercept = _fit_line(x[start : i + 1], y[start : i + 1])
+            continue
+        spans.append((start, i))
+        start = i
+        slope, intercept = _fit_line(x[i : i + 1], y[i : i + 1])
+    spans.append((start, len(x)))
+    return spans
+
+
+def fit_piecewise(
+    provider: str,
+    meses: int,
+    cuotas: int,
+    target: str,
+    alq_exp: Iterable[float],
+    values: Iterable[float],
+    *,
+    known_breaks: Iterable[float] = (),
+    rel_tol: float = 1e-3,
+    tipo_garantia: bool = False,
+) -> PiecewiseModel:
+    xs = np.asarray(list(alq_exp), dtype=float)
+    ys = np.asarray(list(values), dtype=float)
+    order = np.argsort(xs, kind="stable")
+    xs, ys = xs[order], ys[order]
+    # mismo alq_exp repetido (varias corridas): promedio
+    ux, inv = np.unique(xs, return_inverse=True)
+    uy = np.bincount(inv, weights=ys) / np.bincount(inv)
+
+    segments: list[Segment] = []
+    for a, b in _split_segments(ux, uy, rel_tol):
+        slope, intercept = _fit_line(ux[a:b], uy[a:b])
+        segments.append(Segment(float(ux[a]), float(ux[b - 1]), slope, intercept, int(b - a)))
+
+    breaks = sorted(known_breaks)
+    bounds, known = [-math.inf], [True]
+    for prev, seg in zip(segments, segments[1:]):
+        inside = [k for k in breaks if prev.hi < k <= seg.lo]
+        bounds.append(float(inside[-1]) if inside else seg.lo)
+        known.append(bool(inside))
+
+    m = PiecewiseModel(provider, meses, cuotas, target, segments, bounds, known, n=len(xs), tipo_garantia=tipo_garantia)
+    pred = m.predict_many(xs)
+    rel = np.abs(pred - ys) / np.maximum(np.abs(ys), 1.0)
+    m.max_rel_err = float(rel.max()) if len(rel) else 0.0
+    m.rmse = float(np.sqrt(np.mean((pred - ys) ** 2))) if len(ys) else 0.0
+    return m
+
+
+# ---------------- datos ----------------
+Key = tuple[str, int, bool, int, str]  # (provider, meses, tipo_garantia, cuotas, target)
+
+
+def _tipo_garantia(provider: str, value: Any) -> bool:
+    # Hoggax no cotiza distinto según tipo_garantia: un solo modelo (False) para los dos
+    return bool(value) if provider == "finaer" else False
+
+
+def _output_jsonl(paths: Iterable[Path]) -> Iterator[Path]:
+    for p in paths:
+        if p.is_dir():
+            for f in sorted(p.glob("*.jsonl")):
+                # finaer_<ts>.jsonl / hoggax_<ts>.jsonl / quotes_<ts>.jsonl (no .errors.jsonl)
+                if f.name.count(".") == 1 and f.name.split("_", 1)[0] in {*TARGETS, "quotes"}:
+                    yield f
+        else:
+            yield p
+
+
+def observations(paths: Iterable[Path]) -> dict[Key, list[tuple[float, float]]]:
+    """(alq_exp, valor) por (provider, meses, tipo_garantia, cuotas, target) desde los JSONL de output."""
+    obs: dict[Key, list[tuple[float, float]]] = {}
+
+    def add(provider: str, meses: Any, tg: Any, cuotas: Any, alq_exp: Any, row: dict) -> None:
+        if not meses or cuotas is None or not alq_exp:
+            return
+        tg = _tipo_garantia(provider, tg)
+        for t in TARGETS[provider]:
+            v = row.get(t)
+            if v is not None:
+                obs.setdefault((provider, int(meses), tg, int(cuotas), t), []).append((float(alq_exp), float(v)))
+
+    for path in _output_jsonl(paths):
+        # --skip-unchanged: los unchanged_record vienen completos (su última corrida)
+        for rec in resolved_records(path):
+            comp = rec.get("competitor")
+            tg = (rec.get("scenario") or rec).get("tipo_garantia", False)
+            if rec.get("quotes") is not None and comp in TARGETS:
+                # schema unificado (price_monitor.providers): total_final / lista
+                total_t, lista_t = TARGETS[comp]
+                for q in rec["quotes"]:
+                    row = {total_t: q.get("total_final"), lista_t: q.get("lista")}
+                    add(comp, q.get("meses"), tg, q.get("cuotas"), q.get("alq_exp"), row)
+            elif comp == "finaer":
+                # los JSONL viejos no traen normalized.alq_exp: sale del escenario
+                norm = rec.get("normalized") or {}
+                s = rec.get("scenario") or {}
+                meses = norm.get("meses") or s.get("meses")
+                alq_exp = norm.get("alq_exp")
+                if alq_exp is None and s.get("alquiler") is not None:
+                    alq_exp = float(s["alquiler"]) + float(s.get("expensas") or 0)
+                for p in norm.get("planes") or []:
+                    add("finaer", meses, tg, p.get("cuotas"), alq_exp, p)
+            elif comp == "hoggax":
+                add("hoggax", rec.get("meses"), tg, rec.get("cuotas"), rec.get("alq_exp"), rec)
+    return obs
+
+
+# ---------------- surrogate ----------------
+@dataclass
+class Surrogate:
+    models: dict[Key, PiecewiseModel] = field(default_factory=dict)
+    fitted: Optional[str] = None
+
+    @classmethod
+    def fit(
+        cls,
+        obs: dict[Key, list[tuple[float, float]]],
+        *,
+        breakpoints: Optional[dict] = None,
+        rel_tol: float = 1e-3,
+    ) -> "Surrogate":
+        bps = (breakpoints or {}).get("breakpoints") or []
+        s = cls(fitted=datetime.now(timezone.utc).isoformat())
+        for key, pts in sorted(obs.items()):
+            provider, meses, tg, cuotas, target = key
+            # los cortes de breakpoints.json se buscan con tipo_garantia=False
+            known = [
+                float(bp["alq_exp"])
+                for bp in bps
+                if not tg and bp["provider"] == provider and int(bp["meses"]) == meses and int(bp["cuotas"]) == cuotas
+            ]
+            xs, ys = zip(*pts)
+            s.models[key] = fit_piecewise(
+                provider, meses, cuotas, target, xs, ys, known_breaks=known, rel_tol=rel_tol, tipo_garantia=tg
+            )
+        return s
+
+    def model(
+        self,
+        provider: str,
+        meses: int,
+        cuotas: int,
+        target: Optional[str] = None,
+        tipo_garantia: bool = False,
+    ) -> PiecewiseModel:
+        target = target or TARGETS[provider][0]
+        tg = _tipo_garantia(provider, tipo_garantia)
+        try:
+            return self.models[(provider, int(meses), tg, int(cuotas), target)]
+        except KeyError:
+            raise KeyError(f"sin modelo para {provider} {meses}m tg={int(tg)} {cuotas} cuota(s) {target}") from None
+
+    def predict(
+        self,
+        provider: str,
+        alquiler: float,
+        expensas: float,
+        meses: int,
+        cuotas: int,
+        target: Optional[str] = None,
+        tipo_garantia: bool = False,
+    ) -> float:
+        m = self.model(provider, meses, cuotas, target, tipo_garantia)
+        return m.predict(float(alquiler) + float(expensas))
+
+    def save(self, path: Path) -> Path:
+        data = {
+            "fitted": self.fitted,
+            "models": [
+                asdict(m) | {"bounds": [None if math.isinf(b) else b for b in m.bounds]} for m in self.models.values()
+            ],
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "Surrogate":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        s = cls(fitted=data.get("fitted"))
+        for d in data["models"]:
+            d = dict(d)
+            d["segments"] = [Segment(**seg) for seg in d["segments"]]
+            d["bounds"] = [-math.inf if b is None else float(b) for b in d["bounds"]]
+            m = PiecewiseModel(**d)
+            s.models[(m.provider, m.meses, m.tipo_garantia, m.cuotas, m.target)] = m
+        return s
+
+
+# ---------------- verify ----------------
+async def _fetch_actual(
+    provider: str, s: dict, fc: FinaerClient, hc: HoggaxClient
+) -> dict[tuple[int, str], float]:
+    """(cuotas, target) -> valor real para un escenario."""
+    out: dict[tuple[int, str], float] = {}
+    if provider == "finaer":
+        norm = normalize_finaer(await fc.aquote(s["alquiler"], s["expensas"], s["meses"], s["tipo_garantia"]))
+        for p in norm["planes"]:
+            for t in TARGETS["finaer"]:
+                if p.get(t) is not None:
+                    out[(int(p["cuotas"]), t)] = float(p[t])
+    else:
+        rows = (
+            rows_12m(s)
+            if s["meses"] == 12
+            else rows_from_response(await hc.aquote(s["alquiler"], s["expensas"], s["meses"]), s)
+        )
+        for r in rows:
+            for t in TARGETS["hoggax"]:
+                if r.get(t) is not None:
+                    out[(int(r["cuotas"]), t)] = float(r[t])
+    return out
+
+
+async def verify(
+    surrogate: Surrogate,
+    *,
+    sample: int = 20,
+    seed: Optional[int] = None,
+    providers: Iterable[str] = ("finaer", "hoggax"),
+    concurrency: int = 4,
+) -> list[dict]:
+    """
+    Cotiza `sample` escenarios al azar dentro del rango de cada modelo (sin cache:
+    es para confirmar contra la API de hoy) y compara con lo predicho.
+    """
+    rng = random.Random(seed)
+    combos = sorted({(p, m, tg) for (p, m, tg, _, _) in surrogate.models if p in set(providers)})
+    if not combos:
+        return []
+
+    scenarios = []
+    for i in range(sample):
+        provider, meses, tg = combos[i % len(combos)]
+        if provider == "hoggax" and meses != 12 and meses not in MESES_TO_PLAZO:
+            continue
+        lo = min(m.lo for k, m in surrogate.models.items() if k[:3] == (provider, meses, tg))
+        hi = max(m.hi for k, m in surrogate.models.items() if k[:3] == (provider, meses, tg))
+        a = int(rng.uniform(lo, hi))
+        s = {"scenario_id": f"V{i}", "alquiler": a, "expensas": 0, "meses": meses, "tipo_garantia": tg}
+        scenarios.append((provider, s))
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    results: list[dict] = []
+
+    async with FinaerClient(max_connections=concurrency) as fc, HoggaxClient(max_connections=concurrency) as hc:
+
+        async def one(provider: str, s: dict) -> None:
+            async with sem:
+                try:
+                    actual = await _fetch_actual(provider, s, fc, hc)
+                except Exception as e:
+                    print(f"ERROR {provider} {s['alquiler']} {s['meses']}m: {e}")
+                    return
+            for (cuotas, target), real in sorted(actual.items()):
+                key = (provider, s["meses"], s["tipo_garantia"], cuotas, target)
+                if key not in surrogate.models:
+                    continue
+                m = surrogate.models[key]
+                pred = m.predict(s["alquiler"] + s["expensas"])
+                results.append(
+                    {
+                        "provider": provider,
+                        "meses": s["meses"],
+                        "tipo_garantia": s["tipo_garantia"],
+                        "cuotas": cuotas,
+                        "target": target,
+                        "alq_exp": s["alquiler"] + s["expensas"],
+                        "real": real,
+                        "pred": round(pred, 2),
+                        "rel_err": abs(pred - real) / max(abs(real), 1.0),
+                        "certain": m.certain(s["alquiler"] + s["expensas"]),
+                    }
+                )
+
+        await asyncio.gather(*(one(p, s) for p, s in scenarios))
+    return results
+
+
+# ---------------- CLI ----------------
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="price-monitor surrogate",
+        description="Modelo lineal por tramos de las tarifas (fit desde output/, predict local, verify contra la API)",
+    )
+    p.add_argument("--model", type=Path, default=DEFAULT_MODEL, help=f"JSON del modelo (default: {DEFAULT_MODEL})")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    f = sub.add_parser("fit", help="ajustar desde los JSONL de output")
+    f.add_argument("inputs", nargs="*", type=Path, default=[Path("output")], help="JSONL o carpetas (default: output)")
+    f.add_argument("--breakpoints", type=Path, default=BREAKPOINTS_JSON, help="cortes conocidos (si existe)")
+    f.add_argument("--rel-tol", type=float, default=1e-3, help="error relativo tolerado dentro de un tramo (default: 1e-3)")
+
+    pr = sub.add_parser("predict", help="predecir sin API")
+    pr.add_argument("--scenarios", type=Path, default=None, help="CSV de escenarios (formato data/scenarios.csv)")
+    pr.add_argument("--alquiler", type=int, default=None)
+    pr.add_argument("--expensas", type=int, default=0)
+    pr.add_argument("--meses", type=int, default=None)
+    pr.add_argument("--tipo-garantia", action="store_true", help="escenario con tipo_garantia (solo cambia Finaer)")
+    pr.add_argument("--out", type=Path, default=None, help="CSV de salida (con --scenarios)")
+
+    v = sub.add_parser("verify", help="cotizar una muestra al azar y comparar con el modelo")
+    v.add_argument("--sample", type=int, default=20, help="escenarios a cotizar (default: 20)")
+    v.add_argument("--seed", type=int, default=None)
+    v.add_argument("--provider", nargs="+", choices=sorted(TARGETS), default=sorted(TARGETS))
+    v.add_argument("--tol", type=float, default=0.005, help="error relativo máximo aceptado (default: 0.005)")
+    v.add_argument("--concurrency", type=int, default=4)
+    return p.parse_args(argv)
+
+
+def _predict_rows(surrogate: Surrogate, scenarios: Iterable[dict]) -> Iterator[dict]:
+    for s in scenarios:
+        alq_exp = int(s["alquiler"]) + int(s.get("expensas") or 0)
+        tipo_garantia = bool(s.get("tipo_garantia", False))
+        for (provider, meses, tg, cuotas, target), m in sorted(surrogate.models.items()):
+            if meses != int(s["meses"]) or tg != _tipo_garantia(provider, tipo_garantia):
+                continue
+            yield {
+                "scenario_id": s.get("scenario_id", ""),
+                "provider": provider,
+                "alquiler": int(s["alquiler"]),
+                "expensas": int(s.get("expensas") or 0),
+                "alq_exp": alq_exp,
+                "meses": meses,
+                "tipo_garantia": tipo_garantia,
+                "cuotas": cuotas,
+                "target": target,
+                "pred": round(m.predict(alq_exp), 2),
+                "certain": m.certain(alq_exp),
+            }
+
+
+def main(argv: list[str] | None = None):
+    args = _parse_args(argv)
+
+    if args.cmd == "fit":
+        obs = observations(args.inputs)
+        if not obs:
+            raise SystemExit("No encontré cotizaciones en los inputs (output/finaer_*.jsonl, output/hoggax_*.jsonl)")
+        bps = load_breakpoints(args.breakpoints) if args.breakpoints.exists() else None
+        s = Surrogate.fit(obs, breakpoints=bps, rel_tol=args.rel_tol)
+        for m in s.models.values():
+            print(
+                f"OK {m.provider} {m.meses}m tg={int(m.tipo_garantia)} {m.cuotas}c {m.target}: n={m.n} tramos={len(m.segments)} "
+                f"max_rel_err={m.max_rel_err:.2e} rmse={m.rmse:.2f}"
+            )
+        print(f"Wrote model ({len(s.models)} modelos) -> {s.save(args.model)}")
+        return
+
+    if not args.model.exists():
+        raise SystemExit(f"No existe {args.model}. Corré: price-monitor surrogate fit")
+    s = Surrogate.load(args.model)
+
+    if args.cmd == "predict":
+        if args.scenarios is not None:
+            df = load_scenarios(args.scenarios)
+            rows = list(_predict_rows(s, df.to_dict("records")))
+        elif args.alquiler is not None and args.meses is not None:
+            one = {
+                "alquiler": args.alquiler,
+                "expensas": args.expensas,
+                "meses": args.meses,
+                "tipo_garantia": args.tipo_garantia,
+            }
+            rows = list(_predict_rows(s, [one]))
+        else:
+            raise SystemExit("Indicá --scenarios o --alquiler y --meses")
+
+        if args.out is not None:
+            args.out.parent.mkdir(parents=True, exist_ok=True)
+            with args.out.open("w", newline="", encoding="utf-8") as f:
+                w = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["scenario_id"])
+                w.writeheader()
+                w.writerows(rows)
+            print(f"Wrote predictions ({len(rows)}) -> {args.out}")
+        else:
+            for r in rows:
+                flag = "" if r["certain"] else "  (fuera de rango / tramo incierto)"
+                print(f"{r['provider']} {r['meses']}m {r['cuotas']}c {r['target']}: {r['pred']:,.2f}{flag}")
+        return
+
+    results = asyncio.run(
+        verify(s, sample=args.sample, seed=args.seed, providers=args.provider, concurrency=args.concurrency)
+    )
+    if not results:
+        raise SystemExit("No se pudo verificar ningún escenario")
+    bad = [r for r in results if r["rel_err"] > args.tol]
+    worst = max(results, key=lambda r: r["rel_err"])
+    print(
+        f"Verificados {len(results)} valores: max_rel_err={worst['rel_err']:.2e} "
+        f"({worst['provider']} {worst['meses']}m {worst['cuotas']}c alq_exp={worst['alq_exp']:,})"
+    )
+    for r in bad:
+        print(
+            f"DRIFT {r['provider']} {r['meses']}m tg={int(r['tipo_garantia'])} {r['cuotas']}c {r['target']} alq_exp={r['alq_exp']:,}: "
+            f"real={r['real']:,.2f} pred={r['pred']:,.2f} ({r['rel_err']:.2%})"
+        )
+    if bad:
+        raise SystemExit(f"El modelo no se sostiene en {len(bad)}/{len(results)} valores: re-ajustar con más datos")
+    print("OK: el modelo se sostiene")
+
+
+if __name__ == "__main__":
+    main()
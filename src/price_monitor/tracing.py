@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Iterator, Optional
+
+import httpx
+
+
+# Tracer opt-in: spans en formato Chrome trace-event (se abre en https://ui.perfetto.dev
+# o chrome://tracing). Desactivado, span() devuelve un nullcontext compartido y los
+# clientes HTTP no llevan hooks: costo ~0.
+#
+# ts en µs de reloj de pared (epoch) para poder juntar trazas de varios procesos
+# (ver price_monitor.pipeline) en una sola línea de tiempo.
+
+ENV_VAR = "PRICE_MONITOR_TRACE"
+
+_NULL = nullcontext()
+
+# fases de httpcore (extensión "trace" del request) -> nombre del span
+HTTP_PHASES = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "send_request_headers": "send",
+    "send_request_body": "send",
+    "receive_response_headers": "ttfb",
+    "receive_response_body": "body",
+}
+
+
+class Tracer:
+    def __init__(self, path: Optional[Path] = None, process_name: str = "price-monitor"):
+        self.path = path
+        self.pid = os.getpid()
+        self.events: list[dict] = []
+        self._epoch = time.time() - time.perf_counter()
+        self._lanes: dict[Any, int] = {}
+        self._lock = threading.Lock()
+        self.events.append({"ph": "M", "name": "process_name", "pid": self.pid, "tid": 0, "args": {"name": process_name}})
+
+    def now(self) -> float:
+        """µs desde epoch (monotónico dentro del proceso)."""
+        return (self._epoch + time.perf_counter()) * 1e6
+
+    def _tid(self) -> int:
+        # una lane por task de asyncio (los workers del engine) o por thread
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key: Any = ("task", id(task)) if task is not None else ("thread", threading.get_ident())
+        tid = self._lanes.get(key)
+        if tid is None:
+            with self._lock:
+                tid = self._lanes.setdefault(key, len(self._lanes) + 1)
+            name = task.get_name() if task is not None else threading.current_thread().name
+            self.events.append({"ph": "M", "name": "thread_name", "pid": self.pid, "tid": tid, "args": {"name": name}})
+        return tid
+
+    def complete(self, name: str, cat: str, start: float, end: float, tid: Optional[int] = None, **args: Any) -> None:
+        ev = {"ph": "X", "name": name, "cat": cat, "ts": start, "dur": max(0.0, end - start), "pid": self.pid}
+        ev["tid"] = self._tid() if tid is None else tid
+        if args:
+            ev["args"] = {k: v if isinstance(v, (int, float, bool, type(None))) else str(v) for k, v in args.items()}
+        self.events.append(ev)
+
+    @contextmanager
+    def span(self, name: str, cat: str = "", **args: Any) -> Iterator[None]:
+        tid = self._tid()
+        start = self.now()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.complete(name, cat, start, self.now(), tid=tid, **args)
+
+    def extend(self, events: list[dict]) -> None:
+        """Agrega eventos de otra traza (otro proceso: mantiene su pid)."""
+        self.events.extend(events)
+
+    def save(self, path: Optional[Path] = None) -> Path:
+        path = path or self.path
+        if path is None:
+            raise ValueError("Tracer sin path")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"}), encoding="utf-8")
+        return path
+
+    # ---- httpx ----
+    def _http_start(self, request: httpx.Request) -> dict:
+        state = {"tid": self._tid(), "start": self.now(), "open": {}, "first": None}
+
+        def on_phase(event: str, info: dict) -> None:
+            phase, _, edge = event.rpartition(".")
+            name = HTTP_PHASES.get(phase.rsplit(".", 1)[-1])
+            if name is None:
+                return
+            now = self.now()
+            if state["first"] is None:
+                # esperando una conexión libre del pool
+                state["first"] = now
+                self.complete("queue", "http", state["start"], now, tid=state["tid"])
+            if edge == "started":
+                state["open"][phase] = now
+            elif phase in state["open"]:
+                extra = {"error": type(info.get("exception")).__name__} if edge == "failed" else {}
+                self.complete(name, "http", state["open"].pop(phase), now, tid=state["tid"], **extra)
+
+        state["on_phase"] = on_phase
+        return state
+
+    def event_hooks(self, async_: bool) -> dict[str, list]:
+        """event_hooks para httpx.Client / AsyncClient: un span por request y uno por fase (queue/connect/ttfb/body)."""
+
+        def on_request(request: httpx.Request) -> None:
+            state = self._http_start(request)
+            request.extensions["_pm_trace"] = state
+            if async_:
+
+                async def trace(event: str, info: dict) -> None:
+                    state["on_phase"](event, info)
+
+                request.extensions["trace"] = trace
+            else:
+                request.extensions["trace"] = state["on_phase"]
+
+        def on_response(response: httpx.Response) -> None:
+            state = response.request.extensions.get("_pm_trace")
+            if state is None:
+                return
+            req = response.request
+            self.complete(
+                f"{req.method} {req.url.host}",
+                "http",
+                state["start"],
+                self.now(),
+                tid=state["tid"],
+                status=response.status_code,
+                path=req.url.path,
+            )
+
+        if not async_:
+            return {"request": [on_request], "response": [on_response]}
+
+        async def aon_request(request: httpx.Request) -> None:
+            on_request(request)
+
+        async def aon_response(response: httpx.Response) -> None:
+            on_response(response)
+
+        return {"request": [aon_request], "response": [aon_response]}
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable(path: Optional[Path] = None, process_name: str = "price-monitor") -> Tracer:
+    global _tracer
+    _tracer = Tracer(path, process_name)
+    return _tracer
+
+
+def enable_from_env(process_name: str = "price-monitor") -> Optional[Tracer]:
+    """Si PRICE_MONITOR_TRACE tiene un path (lo setea el pipeline para sus stages), traza a ese archivo."""
+    path = os.environ.get(ENV_VAR)
+    if not path or _tracer is not None:
+        return _tracer
+    return enable(Path(path), process_name)
+
+
+def active() -> Optional[Tracer]:
+    return _tracer
+
+
+def span(name: str, cat: str = "", **args: Any) -> ContextManager[None]:
+    if _tracer is None:
+        return _NULL
+    return _tracer.span(name, cat, **args)
+
+
+def event_hooks(async_: bool = True) -> dict[str, list]:
+    return _tracer.event_hooks(async_) if _tracer is not None else {}
+
+
+def finish() -> Optional[Path]:
+    """Guarda la traza activa (si hay una con path) y la desactiva."""
+    global _tracer
+    t, _tracer = _tracer, None
+    if t is None or t.path is None:
+        return None
+    return t.save()
@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import itertools
+import time
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from price_monitor import rules
+from price_monitor.io.files import utc_stamp
+from price_monitor.records import Quote, from_cents, iter_quotes
+
+
+# What-if de reglas: ¿cómo queda la comparativa Finaer vs Hoggax si la transferencia pasa
+# de 15% a 20%, o si los bordes de segmento se mueven? En vez de editar constantes y
+# re-correr los scripts, se arma una sola vez la tabla comparable (Finaer y Hoggax por
+# escenario y cuotas, desde la historia guardada) y cada variante se evalúa vectorizada
+# sobre toda la tabla, promediando por celda (segmento x meses x cuotas).
+#
+# Mismas cuentas que compare_prices_discount: en 1 pago el total por transferencia es
+# la lista con el % OFF de la variante, en cuotas es el total de la web.
+
+METRICS = ["finaer_total_transfer", "hoggax_total_transfer", "dif_lista_$", "dif_total_transfer_$"]
+
+
+@dataclass(frozen=True)
+class Variant:
+    """Un juego de reglas. Los defaults son las reglas vigentes (price_monitor.rules)."""
+
+    finaer_transfer_pct: float = rules.TRANSFER_DESC_PCT
+    hoggax_transfer_pct: float = rules.TRANSFER_DESC_PCT
+    borders: tuple[float, ...] = tuple(rules.SEGMENT_BORDERS)
+    name: str = ""
+
+    @property
+    def label(self) -> str:
+        """El nombre, o lo que cambia respecto de las reglas vigentes ("base" si nada)."""
+        if self.name:
+            return self.name
+        base = Variant()
+        diff = []
+        for f in fields(self):
+            v = getattr(self, f.name)
+            if f.name == "name" or v == getattr(base, f.name):
+                continue
+            diff.append(f"borders={'/'.join(f'{b:g}' for b in v)}" if f.name == "borders" else f"{f.name}={v:g}")
+        return " ".join(diff) or "base"
+
+    def with_(self, key: str, value: str) -> "Variant":
+        """Variante con `key` pisado; `transfer_pct` pisa el de los dos proveedores."""
+        if key == "transfer_pct":
+            return replace(self, finaer_transfer_pct=float(value), hoggax_transfer_pct=float(value))
+        if key == "borders":
+            borders = tuple(float(b) for b in value.split("/"))
+            if list(borders) != sorted(set(borders)):
+                raise ValueError(f"Bordes inválidos: {value!r} (crecientes, separados por /)")
+            return replace(self, borders=borders)
+        if key in ("finaer_transfer_pct", "hoggax_transfer_pct"):
+            return replace(self, **{key: float(value)})
+        if key == "name":
+            return replace(self, name=value)
+        raise ValueError(f"Regla desconocida: {key!r} (finaer_transfer_pct, hoggax_transfer_pct, transfer_pct, borders, name)")
+
+    @classmethod
+    def parse(cls, spec: str) -> "Variant":
+        """ "transfer_pct=20,borders=450000/800000" -> Variant."""
+        v = cls()
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            key, sep, value = part.partition("=")
+            if not sep:
+                raise ValueError(f"Variante inválida: {part!r} (esperado regla=valor)")
+            v = v.with_(key.strip(), value.strip())
+        return v
+
+
+def sweep(specs: Sequence[str], base: Optional[Variant] = None) -> list[Variant]:
+    """Producto cartesiano: ["transfer_pct=15,20", "borders=500000/800000,450000/800000"] -> 4 variantes."""
+    axes = []
+    for spec in specs:
+        key, sep, values = spec.partition("=")
+        if not sep:
+            raise ValueError(f"--sweep inválido: {spec!r} (esperado regla=v1,v2,...)")
+        axes.append([(key.strip(), v.strip()) for v in values.split(",") if v.strip()])
+    out = []
+    for combo in itertools.product(*axes):
+        v = base or Variant()
+        for key, value in combo:
+            v = v.with_(key, value)
+        out.append(v)
+    return out
+
+
+@dataclass
+class CompareTable:
+    """
+    Filas comparables Finaer vs Hoggax, columnar: una por (escenario Finaer, cuotas) con la
+    cotización Hoggax del mismo alquiler/expensas/meses/cuotas. Montos en pesos, NaN si falta.
+    """
+
+    alq_exp: np.ndarray
+    meses: np.ndarray
+    cuotas: np.ndarray
+    finaer_lista: np.ndarray
+    finaer_total: np.ndarray
+    hoggax_lista: np.ndarray
+    hoggax_total: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.alq_exp)
+
+    @classmethod
+    def from_quotes(cls, quotes: Iterable[Quote]) -> "CompareTable":
+        """
+        De cada (proveedor, escenario, cuotas) queda la cotización más nueva (y si una
+        corrida trae varios planes con las mismas cuotas, el último). Hoggax no depende
+        de tipo_garantia: su cotización vale para los dos escenarios Finaer.
+        """
+        df = pd.DataFrame(
+            [
+                (
+                    q.ts_utc,
+                    q.plan.competitor,
+                    q.scenario.alquiler,
+                    q.scenario.expensas,
+                    q.scenario.meses,
+                    q.scenario.tipo_garantia,
+                    q.plan.cuotas,
+                    from_cents(q.plan.lista),
+                    from_cents(q.plan.total_final),
+                )
+                for q in quotes
+                if q.plan.competitor in ("finaer", "hoggax") and q.plan.cuotas
+            ],
+            columns=["ts_utc", "competitor", "alquiler", "expensas", "meses", "tipo_garantia", "cuotas", "lista", "total"],
+        )
+        key = ["alquiler", "expensas", "meses", "cuotas"]
+        df = df.sort_values("ts_utc", kind="stable")
+        f = df[df["competitor"] == "finaer"].drop_duplicates(key + ["tipo_garantia"], keep="last")
+        h = df[df["competitor"] == "hoggax"].drop_duplicates(key, keep="last")
+        m = f[key + ["lista", "total"]].merge(h[key + ["lista", "total"]], on=key, suffixes=("_f", "_h"))
+        m = m.sort_values(key, kind="stable")
+        return cls(
+            alq_exp=(m["alquiler"] + m["expensas"]).to_numpy(float),
+            meses=m["meses"].to_numpy(np.int64),
+            cuotas=m["cuotas"].to_numpy(np.int64),
+            finaer_lista=m["lista_f"].to_numpy(float, na_value=np.nan),
+            finaer_total=m["total_f"].to_numpy(float, na_value=np.nan),
+            hoggax_lista=m["lista_h"].to_numpy(float, na_value=np.nan),
+            hoggax_total=m["total_h"].to_numpy(float, na_value=np.nan),
+        )
+
+    @classmethod
+    def load(cls, paths: Iterable[Path], *, validate: bool = True) -> "CompareTable":
+        return cls.from_quotes(iter_quotes(paths, validate=validate))
+
+
+def _cell_sums(table: CompareTable, cell: np.ndarray, n_cells: int) -> dict[str, np.ndarray]:
+    """
+    Sumas y cuentas por celda que no dependen de los % de la variante. "base" es lo que
+    el % escala: la lista en 1 pago y el total web en cuotas (ahí el factor es 1).
+    """
+    uno = table.cuotas == 1
+    f = np.where(uno, table.finaer_lista, table.finaer_total)
+    h = np.where(uno, table.hoggax_lista, table.hoggax_total)
+    dl = table.finaer_lista - table.hoggax_lista
+    f_ok, h_ok, dl_ok = ~np.isnan(f), ~np.isnan(h), ~np.isnan(dl)
+    both = f_ok & h_ok
+
+    def total(ok: np.ndarray, v: Optional[np.ndarray] = None) -> np.ndarray:
+        return np.bincount(cell[ok], None if v is None else v[ok], minlength=n_cells)
+
+    return {
+        "n": np.bincount(cell, minlength=n_cells),
+        "f": total(f_ok, f),
+        "n_f": total(f_ok),
+        "h": total(h_ok, h),
+        "n_h": total(h_ok),
+        "f_both": total(both, f),
+        "h_both": total(both, h),
+        "n_both": total(both),
+        "dl": total(dl_ok, dl),
+        "n_dl": total(dl_ok),
+    }
+
+
+def _mean(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / np.maximum(den, 1), np.nan)
+
+
+def simulate(table: CompareTable, variants: Sequence[Variant]) -> pd.DataFrame:
+    """
+    Promedio de METRICS por celda (segmento x meses x cuotas) para cada variante, en
+    formato largo: variant, segmento, meses, cuotas, n, <METRICS>.
+
+    Una celda es toda de 1 pago o toda en cuotas, así que el % OFF es un factor por celda
+    y todas las métricas son lineales en él: las filas se recorren una vez por juego de
+    bordes distinto (sumas por celda con bincount) y las variantes de % salen de esas
+    sumas, con las variantes en el eje 0.
+    """
+    if not variants:
+        raise ValueError("Sin variantes")
+    meses_u, mi = np.unique(table.meses, return_inverse=True)
+    cuotas_u, ci = np.unique(table.cuotas, return_inverse=True)
+    per_seg = len(meses_u) * len(cuotas_u)
+    # por celda (dentro de un segmento): meses y cuotas
+    cell_meses = np.repeat(meses_u, len(cuotas_u))
+    cell_cuotas = np.tile(cuotas_u, len(meses_u))
+
+    by_borders: dict[tuple[float, ...], list[int]] = {}
+    for i, v in enumerate(variants):
+        by_borders.setdefault(v.borders, []).append(i)
+
+    frames: list[Optional[pd.DataFrame]] = [None] * len(variants)
+    for borders, idx in by_borders.items():
+        labels = rules.segment_labels(borders)
+        n_cells = len(labels) * per_seg
+        seg = rules.segment_index(table.alq_exp, borders)
+        sums = _cell_sums(table, seg * per_seg + mi * len(cuotas_u) + ci, n_cells)
+
+        keep = sums["n"] > 0
+        uno = np.tile(cell_cuotas == 1, len(labels))[keep]
+        chunk = [variants[i] for i in idx]
+        # (variantes, celdas): factor del % OFF, 1 en las celdas en cuotas
+        f_scale = np.where(uno, 1.0 - np.array([[v.finaer_transfer_pct] for v in chunk]) / 100.0, 1.0)
+        h_scale = np.where(uno, 1.0 - np.array([[v.hoggax_transfer_pct] for v in chunk]) / 100.0, 1.0)
+        s = {k: a[keep] for k, a in sums.items()}
+        metrics = {
+            "finaer_total_transfer": f_scale * _mean(s["f"], s["n_f"]),
+            "hoggax_total_transfer": h_scale * _mean(s["h"], s["n_h"]),
+            "dif_lista_$": np.broadcast_to(_mean(s["dl"], s["n_dl"]), f_scale.shape),
+            "dif_total_transfer_$": _mean(f_scale * s["f_both"] - h_scale * s["h_both"], s["n_both"]),
+        }
+
+        seg_idx = np.repeat(np.arange(len(labels)), per_seg)[keep]
+        base = pd.DataFrame(
+            {
+                "segmento": np.array(labels, dtype=object)[seg_idx],
+                "seg_idx": seg_idx,
+                "meses": np.tile(cell_meses, len(labels))[keep],
+                "cuotas": np.tile(cell_cuotas, len(labels))[keep],
+                "n": s["n"],
+            }
+        )
+        for j, i in enumerate(idx):
+            frames[i] = base.assign(**{name: m[j] for name, m in metrics.items()})
+    return pd.concat(
+        [f.assign(variant=v.label) for v, f in zip(variants, frames)], ignore_index=True
+    )[["variant", "segmento", "seg_idx", "meses", "cuotas", "n"] + METRICS]
+
+
+def matrices(cells: pd.DataFrame, metric: str = "dif_total_transfer_$") -> pd.DataFrame:
+    """
+    Matrices de `metric` de todas las variantes apiladas: filas (variant, segmento),
+    columnas "<meses>m/<cuotas>c". Mismo orden de variantes y segmentos que `cells`.
+    """
+    d = cells.assign(col=[f"{m}m/{c}c" for m, c in zip(cells["meses"], cells["cuotas"])])
+    order = {v: i for i, v in enumerate(dict.fromkeys(d["variant"]))}
+    d = d.assign(_v=d["variant"].map(order)).sort_values(["_v", "seg_idx", "meses", "cuotas"])
+    cols = list(dict.fromkeys(d.sort_values(["meses", "cuotas"])["col"]))
+    out = d.pivot_table(index=["_v", "seg_idx", "variant", "segmento"], columns="col", values=metric, aggfunc="first")
+    return out.reindex(columns=cols).droplevel([0, 1]).reset_index()
+
+
+def _expand(patterns: Iterable[str]) -> list[Path]:
+    out: list[Path] = []
+    for pat in patterns:
+        p = Path(pat)
+        matches = sorted(p.glob("*.jsonl")) if p.is_dir() else [Path(m) for m in sorted(glob.glob(pat)) or [pat]]
+        out.extend(m for m in matches if not m.name.endswith(".errors.jsonl"))
+    return sorted(set(out))
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="price-monitor whatif",
+        description="Re-evalúa la comparativa Finaer vs Hoggax bajo otras reglas (descuentos, bordes de segmento)",
+        epilog="Delta_vs_base solo trae las variantes con los bordes de la base: con otros bordes los segmentos no son comparables.",
+    )
+    p.add_argument("inputs", nargs="*", default=["output"], help="JSONL o carpetas con la historia (acepta globs; default: output)")
+    p.add_argument(
+        "--variant",
+        action="append",
+        default=[],
+        metavar="SPEC",
+        help='una variante, ej. "transfer_pct=20" o "name=bordes,borders=450000/800000" (repetible)',
+    )
+    p.add_argument(
+        "--sweep",
+        action="append",
+        default=[],
+        metavar="REGLA=V1,V2",
+        help='barrido: producto cartesiano de los --sweep, ej. --sweep finaer_transfer_pct=10,15,20,25',
+    )
+    p.add_argument("--metric", choices=METRICS, default="dif_total_transfer_$", help="métrica de las matrices")
+    p.add_argument("--out", type=Path, default=None, help="Excel de salida (default: output/whatif_<ts>.xlsx)")
+    p.add_argument("--no-validate", action="store_true", help="no validar el schema de los JSONL al cargar")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _parse_args(argv)
+    paths = _expand(args.inputs)
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        raise SystemExit(f"No existen: {', '.join(map(str, missing))}")
+    try:
+        variants = [Variant()] + [Variant.parse(s) for s in args.variant] + (sweep(args.sweep) if args.sweep else [])
+    except ValueError as e:
+        raise SystemExit(str(e))
+    variants = list(dict.fromkeys(variants))
+
+    t0 = time.perf_counter()
+    table = CompareTable.load(paths, validate=not args.no_validate)
+    if not len(table):
+        raise SystemExit("No hay filas comparables Finaer vs Hoggax (mismo alquiler/expensas/meses/cuotas)")
+    t1 = time.perf_counter()
+    cells = simulate(table, variants)
+    t2 = time.perf_counter()
+    print(f"Tabla: {len(table)} filas comparables de {len(paths)} archivos ({t1 - t0:.2f}s)")
+    print(f"What-if: {len(variants)} variantes en {t2 - t1:.2f}s")
+
+    # variación de la métrica contra la base, en las celdas que existen en las dos. Solo
+    # variantes con los bordes de la base: con otros bordes los segmentos son otros y no
+    # hay celda contra qué comparar
+    same = [v.label for v in variants if v.borders == variants[0].borders]
+    if len(same) < len(variants):
+        print(f"SKIP Delta_vs_base: {len(variants) - len(same)} variantes con otros bordes (segmentos no comparables)")
+    base = cells[cells["variant"] == variants[0].label].set_index(["segmento", "meses", "cuotas"])[args.metric]
+    delta = cells[cells["variant"].isin(same)].join(base.rename("_base"), on=["segmento", "meses", "cuotas"])
+    delta[args.metric] = delta[args.metric] - delta["_base"]
+
+    out = args.out or Path("output") / f"whatif_{utc_stamp()}.xlsx"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with pd.ExcelWriter(out) as xw:
+        matrices(cells, args.metric).to_excel(xw, sheet_name="Matrices", index=False)
+        matrices(delta, args.metric).to_excel(xw, sheet_name="Delta_vs_base", index=False)
+        cells.drop(columns="seg_idx").to_excel(xw, sheet_name="Celdas", index=False)
+    print(f"Wrote Excel -> {out}")
+
+
+if __name__ == "__main__":
+    main()